@@ -1,22 +1,22 @@
-# --- Hot-patch for sqlite3 version issues in ChromaDB ---
-# This must be at the very top of the file, before any other imports
-__import__('pysqlite3')
-import sys
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-# --- End of hot-patch ---
+# O relógio da partida começa no primeiro import do `aquecimento`, antes de qualquer outro.
+from aquecimento import Aquecimento, ms_desde_inicio_da_partida, usar_sqlite_recente
+
+# A troca pelo `pysqlite3` acontece aqui, antes de qualquer thread do aquecimento: as threads do
+# modelo de embedding e do índice importam torch, transformers e langchain, que podem importar o
+# sqlite3 do sistema primeiro.
+usar_sqlite_recente()
 
 import streamlit as st
-import json
-import pandas as pd
 import os
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_together import ChatTogether
-from langchain_core.messages import SystemMessage, HumanMessage
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
 # --- Import your modules ---
-from csv_query_engine import load_csv_data, execute_sql_on_dfs
-from populacao_rag import criar_documentos_de_conhecimento, criar_base_de_conhecimento_rag
+# Só módulos leves no topo: o que puxa numpy, pandas, langchain_core ou o SQLite (motor, cache,
+# RAG, LLM) é importado dentro das funções, nas threads do aquecimento ou depois dele, para que a
+# primeira tela não espere por esses imports.
+from telemetria import obter_telemetria
 
 # --- App Configuration ---
 st.set_page_config(
@@ -25,180 +25,446 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- LLM and Prompt Configuration ---
-TOGETHER_MODEL_NAME = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
-PROMPT_SISTEMA = """
-Você é um assistente especialista em traduzir perguntas em linguagem natural (português) para consultas SQL. 
-Sua única função é gerar um código SQL funcional e otimizado com base no esquema das tabelas e no contexto fornecido. 
-UTILIZE AS INFORMAÇÕES PRESENTES NO CONTEXTO PARA MONTAR A QUERY.
-Siga estas regras estritamente:
-1.  **Formato de Saída Obrigatório:** Sua única resposta deve ser um objeto JSON. O JSON deve conter duas chaves:
-    * `"query"`: Uma string contendo o código SQL gerado.
-    * `"descricao"`: Uma string com uma breve explicação em português do que o código SQL faz.
-    * Exemplo de output: `{"query": "SELECT * FROM Clientes;", "descricao": "Este comando seleciona todas as colunas e registros da tabela 'Clientes'."}`
-    NÃO ADICIONE MAIS NADA além do output definido.
-2.  Use apenas as tabelas e colunas definidas no contexto. Os nomes das tabelas (`ot_consolidada`, `nx_org_group_classified_v2`) são os nomes a serem usados na query.
-3.  **Ignore qualquer `Caminho` ou `Path` (ex: `iceberg.landing_trusted`) mencionado no contexto; use apenas o nome da tabela diretamente na query.**
-4.  Analise a pergunta do usuário para identificar as colunas corretas, filtros (WHERE), agregações (COUNT, GROUP BY) e ordenações (ORDER BY).
-5.  Se a pergunta for ambígua ou se for impossível gerar a consulta com o contexto fornecido, sua única resposta deve ser: `{"query": "ERRO: Impossível gerar a consulta.", "descricao": "A pergunta é ambígua ou não pode ser respondida com o contexto fornecido."}`
-6.  **Buscas de Texto Robustas:** Gere consultas que sejam robustas a variações de digitação e capitalização. Para todas as cláusulas `WHERE` que filtram uma coluna de texto, aplique a função `LOWER()` à coluna e ao valor de busca. Exemplo: `LOWER(coluna) LIKE LOWER('%valor%')`.
-"""
-PROMPT_SISTEMA_INTERPRETADOR = """
-Você vai receber um dataframe que foi convertido em markdown e a pergunta original que o usuário fez. 
-Seu objetivo é repassar os itens que foram passados para você de uma forma mais limpa.
-Leia esse dataframe ATENTAMENTE, SEM OMITIR DADOS, e responda a pergunta original do usuário com base nesse dataframe
-
-PONTOS IMPORTANTES:
-1. O usuário precisa de todas as informações que vierem dentro do dataframe, não omita infromações.
-2. Você deve responder a pergunta SOMENTE com os dados que foram fornecidos no dataframe, NÃO CRIE NEM SUPONHA NADA.
-3. Responda SEMPRE em português do Brasil
-4. Tome cuidado para não deixar passar informações importantes que estarão no prompt que você receber
-"""
+# --- Caminhos ---
+# Constrói os caminhos absolutos com base na localização do script atual (app.py)
+DADOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_respostas")
+
+# --- Carga dos recursos (em segundo plano, fora da thread do Streamlit) ---
+def carregar_llm(api_key):
+    """
+    O modelo da Together AI atrás de um `PoolLLM` compartilhado por todas as sessões: chamadas
+    simultâneas limitadas, pedidos idênticos em andamento coalescidos e fila com tamanho máximo.
+    """
+    if not api_key:
+        raise RuntimeError("a `TOGETHER_API_KEY` não está configurada nos segredos do aplicativo Streamlit.")
+    from langchain_together import ChatTogether
+    from geracao_sql import TOGETHER_MODEL_NAME
+    from pool_llm import criar_pool_llm
+    return criar_pool_llm(ChatTogether(model=TOGETHER_MODEL_NAME, temperature=0.0, together_api_key=api_key))
+
+def carregar_modelo_embedding():
+    from modelo_embedding import obter_modelo_embedding
+    modelo_embedding = obter_modelo_embedding()
+    modelo_embedding.embed_query("aquecimento")  # A primeira inferência é bem mais lenta que as seguintes.
+    return modelo_embedding
+
+def carregar_indice():
+    # A base deve ser pré-construída com `python populacao_rag.py` (ou `python aquecimento.py`);
+    # criá-la aqui é apenas um fallback.
+    from populacao_rag import (
+        DIRETORIO_BASE_PADRAO, base_de_conhecimento_atualizada, criar_base_de_conhecimento_rag, criar_documentos_por_coluna,
+    )
+    from recuperador_esquema import IndiceVetorial
+    documentos = criar_documentos_por_coluna()
+    if not base_de_conhecimento_atualizada(documentos, DIRETORIO_BASE_PADRAO):
+        if criar_base_de_conhecimento_rag(documentos, nome_diretorio_db=DIRETORIO_BASE_PADRAO) is None:
+            raise RuntimeError("não foi possível criar a base de conhecimento RAG.")
+    return IndiceVetorial.carregar(DIRETORIO_BASE_PADRAO)
+
+def carregar_retriever(indice, modelo_embedding):
+    from recuperador_esquema import RecuperadorEsquema
+    return RecuperadorEsquema(indice, modelo_embedding)
+
+def carregar_backend(configuracao_trino):
+    """
+    Backend de consulta: os CSVs de 'dados' (padrão) ou o Trino, conforme SEBRAE_BACKEND_CONSULTA.
+    Uma consulta trivial já copia as tabelas para o motor residente (índices de texto e cubos).
+    """
+    from backends_consulta import criar_backend
+    backend = criar_backend(DADOS_DIR, configuracao_trino)
+    pronto, mensagem = backend.preparar()
+    if not pronto:
+        raise RuntimeError(mensagem)
+    backend.executar("SELECT 1")
+    return backend
+
+def carregar_cache_respostas(modelo_embedding):
+    """
+    Cache em disco das perguntas, consultas e respostas já processadas.
+    Sobrevive a reinícios do processo e usa o mesmo modelo de embedding do RAG
+    para reconhecer perguntas quase idênticas.
+    """
+    from cache_respostas import CacheRespostas
+    from recuperador_esquema import PREFIXO_CONSULTA
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return CacheRespostas(
+        os.path.join(CACHE_DIR, "respostas.db"),
+        funcao_embedding=lambda pergunta: modelo_embedding.embed_query(PREFIXO_CONSULTA + pergunta),
+    )
 
 # --- Caching ---
 @st.cache_resource
-def inicializar_llm():
+def iniciar_aquecimento():
+    """
+    Dispara, uma vez por processo, a carga em paralelo do LLM, do modelo de embedding, do índice
+    vetorial, dos dados e do cache de respostas. A interface é exibida enquanto isso acontece.
+    """
+    # Os segredos são lidos aqui, na thread do Streamlit.
     try:
         api_key = st.secrets["TOGETHER_API_KEY"]
-        llm = ChatTogether(model=TOGETHER_MODEL_NAME, temperature=0.0, together_api_key=api_key)
-        return llm
-    except Exception as e:
-        st.error(f'Erro ao inicializar o modelo de linguagem da Together AI: {e}')
-        st.warning("Verifique se a `TOGETHER_API_KEY` está configurada nos segredos do seu aplicativo Streamlit Cloud.")
-        return None
+    except Exception:
+        api_key = None
+    try:
+        configuracao_trino = dict(st.secrets["trino"]) if "trino" in st.secrets else None
+    except Exception:
+        configuracao_trino = None  # Sem arquivo de segredos.
+
+    aquecimento = Aquecimento(ao_concluir=lambda ms: obter_telemetria().registrar_partida("partida_interativa", ms))
+    aquecimento.iniciar("llm", lambda: carregar_llm(api_key), descricao="Modelo de linguagem")
+    aquecimento.iniciar("modelo_embedding", carregar_modelo_embedding, descricao="Modelo de embedding")
+    aquecimento.iniciar("indice", carregar_indice, descricao="Índice vetorial")
+    aquecimento.iniciar("retriever", carregar_retriever, ("indice", "modelo_embedding"), descricao="Base de conhecimento")
+    aquecimento.iniciar("dados", lambda: carregar_backend(configuracao_trino), descricao="Dados")
+    aquecimento.iniciar("cache_respostas", carregar_cache_respostas, ("modelo_embedding",),
+                        descricao="Cache de respostas", essencial=False)
+    return aquecimento
 
 @st.cache_resource
-def inicializar_retriever(nome_diretorio_db="base_chroma_db"):
+def registrar_primeira_tela():
+    """Tempo do início da partida (a primeira execução do script) até a primeira tela, medido uma única vez."""
+    obter_telemetria().registrar_partida("partida_primeira_tela", ms_desde_inicio_da_partida())
+
+@st.cache_resource
+def inicializar_executor():
+    """Threads compartilhadas para adiantar etapas do pipeline (ex.: busca de contexto)."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline")
+
+def obter_recursos(aquecimento):
+    """
+    LLM, retriever, backend e cache de respostas (ou None), esperando pelo fim do aquecimento se
+    preciso. Exibe o erro e devolve None se um recurso essencial falhou ou os dados não carregam.
+    """
+    estados = aquecimento.estados()
+    pendentes = [estados[nome]["descricao"].lower() for nome in ("llm", "retriever", "dados") if not aquecimento.pronto(nome)]
     try:
-        st.write("Inicializando a base de conhecimento ChromaDB...")
-        modelo_embedding = HuggingFaceEmbeddings(model_name="intfloat/multilingual-e5-small")
-        db_vetorial = Chroma(persist_directory=nome_diretorio_db, embedding_function=modelo_embedding)
-        retriever = db_vetorial.as_retriever(search_kwargs={"k": 3})
-        st.success("Base de conhecimento pronta.")
-        return retriever
+        with st.spinner(f"Aguardando o carregamento: {', '.join(pendentes)}...") if pendentes else nullcontext():
+            llm, retriever, backend = (aquecimento.obter(nome) for nome in ("llm", "retriever", "dados"))
     except Exception as e:
-        st.error(f"Erro ao inicializar o retriever: {e}")
+        st.error(f"O sistema não está pronto: {e}")
         return None
-
-@st.cache_data
-def carregar_dados_csv():
+    try:
+        cache = aquecimento.obter("cache_respostas")
+    except Exception:
+        cache = None
+
+    # No backend de CSV, os arquivos só são relidos quando algum deles muda. Com o pool de processos,
+    # quem relê é o próprio `executar`, dentro do controle de fila.
+    if backend.preparar_a_cada_pergunta:
+        pronto, mensagem = backend.preparar()
+        if not pronto:
+            st.error(mensagem)
+            return None
+    if cache is not None:
+        cache.definir_versao_dados(backend.versao_dados())
+    return llm, retriever, backend, cache
+
+# --- Pipeline da Pergunta ---
+def buscar_contexto(retriever, pergunta):
+    with obter_telemetria().etapa("busca_contexto") as registro:
+        documentos = retriever.invoke(pergunta)
+        registro["documentos"] = len(documentos)
+    return documentos
+
+def agendar_busca_contexto(retriever, pergunta):
     """
-    Localiza a pasta 'dados' de forma robusta e carrega os arquivos CSV.
+    Dispara a busca de contexto em uma thread e guarda o future na sessão, de modo que
+    reruns com a mesma pergunta reaproveitem a busca já iniciada.
     """
-    # --- CORREÇÃO PRINCIPAL ---
-    # Constrói o caminho absoluto para a pasta 'dados'
-    # com base na localização do script atual (app.py)
-    script_dir = os.path.dirname(__file__)
-    folder_path = os.path.join(script_dir, "dados")
-
-    dataframes, message = load_csv_data(folder_path)
-
-    if dataframes is None:
-        st.error(message) # Exibe a mensagem de erro detalhada do load_csv_data
-        return None
+    buscas = st.session_state.setdefault("buscas_contexto", {})
+    if pergunta not in buscas:
+        if len(buscas) >= 8:
+            buscas.clear()
+        buscas[pergunta] = inicializar_executor().submit(buscar_contexto, retriever, pergunta)
+    return buscas[pergunta]
+
+def transmitir_llm(llm, mensagens, tempos, etapa, ao_aguardar=None):
+    """
+    Gera os trechos de texto de `llm.stream` e registra na telemetria (e em `tempos[etapa]`)
+    o tempo até o primeiro token (ttft_ms), a latência total e os tokens da chamada. Sem
+    `usage_metadata` do provedor, os tokens são estimados pelo tamanho do texto.
+    `ao_aguardar` recebe a posição na fila do pool enquanto a chamada espera vaga.
+    """
+    from interpretacao_resultados import estimar_tokens
+    with obter_telemetria().etapa(etapa, tempos) as registro:
+        inicio = time.perf_counter()
+        resposta = ""
+        uso = None
+        for trecho in llm.stream(mensagens, ao_aguardar=ao_aguardar):
+            if "ttft_ms" not in registro:
+                registro["ttft_ms"] = (time.perf_counter() - inicio) * 1000
+            if getattr(trecho, "usage_metadata", None):
+                uso = trecho.usage_metadata
+            if trecho.content:
+                resposta += trecho.content
+                yield trecho.content
+        if uso is not None:
+            registro["tokens_prompt"] = uso.get("input_tokens", 0)
+            registro["tokens_resposta"] = uso.get("output_tokens", 0)
+        else:
+            registro["tokens_prompt"] = sum(estimar_tokens(m.content) for m in mensagens)
+            registro["tokens_resposta"] = estimar_tokens(resposta)
+
+def exibir_painel_telemetria():
+    """Percentis de latência por etapa e taxa de acerto dos caches e cubos, acumulados desde o início do processo."""
+    telemetria = obter_telemetria()
+    with st.expander("Desempenho por etapa"):
+        if not telemetria.possui_registros():
+            st.caption("Nenhuma pergunta processada ainda.")
+            return
+        resumo = telemetria.resumo_por_etapa()
+        st.dataframe(resumo, hide_index=True)
+        cache = telemetria.resumo_cache()
+        if not cache.empty:
+            st.dataframe(cache, hide_index=True)
+        p50 = resumo.set_index("etapa")["p50 (ms)"]
+        if "execucao_sql_cubo" in p50:
+            texto = f"Execução SQL respondida por agregados pré-calculados: p50 de {p50['execucao_sql_cubo']:,} ms"
+            if "execucao_sql_tabela" in p50:
+                texto += f" (nas demais consultas, lidas da tabela: p50 de {p50['execucao_sql_tabela']:,} ms)"
+            st.caption(texto + ".")
+        custo_evitado = resumo["custo_evitado_estimado_cubo"].sum()
+        if custo_evitado:
+            st.caption(f"Custo evitado pelos agregados, estimado pelos planos das consultas: {custo_evitado:,} linhas (estimativa, não tempo).")
+        if telemetria.exportador != "nenhum":
+            st.caption(f"Spans e métricas exportados via OpenTelemetry ({telemetria.exportador}).")
+
+ICONES_PRONTIDAO = {"aguardando": "⏸️", "carregando": "⏳", "pronto": "✅", "erro": "❌"}
+
+def exibir_prontidao(aquecimento):
+    """
+    Estado de cada recurso da partida, atualizado a cada segundo enquanto o aquecimento não termina.
+    Ao terminar, o app é executado de novo para liberar o que dependia dos recursos.
+    """
+    sondando = not aquecimento.concluido()
+
+    @st.fragment(run_every=1 if sondando else None)
+    def painel():
+        st.subheader("Prontidão")
+        for estado in aquecimento.estados().values():
+            duracao = f" ({estado['duracao_ms'] / 1000:.1f} s)" if estado["duracao_ms"] is not None else ""
+            st.markdown(f"{ICONES_PRONTIDAO[estado['estado']]} {estado['descricao']}{duracao}")
+            if estado["erro"]:
+                st.caption(estado["erro"])
+        if aquecimento.tempo_interativo_ms is not None:
+            st.caption(f"Pronto para perguntas {aquecimento.tempo_interativo_ms / 1000:.1f} s após a primeira execução do app.")
+        if sondando and aquecimento.concluido():
+            st.rerun()
+
+    painel()
+
+def exibir_ocupacao(llm, backend):
+    """Chamadas ao LLM e consultas em execução e na fila, somando todas as sessões."""
+    with st.expander("Ocupação do servidor"):
+        estado_llm = llm.estado()
+        st.markdown(
+            f"**Modelo de linguagem:** {estado_llm['em_execucao']}/{estado_llm['capacidade']} em execução, "
+            f"{estado_llm['na_fila']} na fila · {estado_llm['coalescidos']} pedidos reaproveitaram uma chamada idêntica"
+        )
+        estado_consultas = backend.estado()
+        if estado_consultas is not None:
+            st.markdown(
+                f"**Consultas SQL:** {estado_consultas['em_execucao']}/{estado_consultas['capacidade']} em execução, "
+                f"{estado_consultas['na_fila']} na fila"
+            )
+
+def aviso_de_fila(area, recurso):
+    """Callback para `ao_aguardar`: mostra a posição na fila em `area` e a limpa quando a vez chega."""
+    def avisar(posicao):
+        if posicao:
+            area.info(f"⏳ Aguardando vaga no {recurso}: posição {posicao} na fila.")
+        else:
+            area.empty()
+    return avisar
+
+def exibir_tempos(tempos):
+    import pandas as pd
+    with st.expander("Tempos por etapa"):
+        linhas = [
+            {
+                "etapa": etapa,
+                "primeiro token (ms)": round(registro["ttft_ms"], 1) if "ttft_ms" in registro else None,
+                "latência (ms)": round(registro.get("latencia_ms", 0.0), 1),
+            }
+            for etapa, registro in tempos.items()
+        ]
+        st.dataframe(pd.DataFrame(linhas), hide_index=True)
+
+def responder_pergunta(pergunta_usuario, llm, futuro_contexto, backend, cache, tempos):
+    # Imports do pipeline: a esta altura o aquecimento já carregou esses módulos.
+    import json
+    from geracao_sql import ler_resposta_sql, montar_mensagens_sql
+    from interpretacao_resultados import preparar_interpretacao
+    from recuperador_esquema import formatar_contexto
+
+    telemetria = obter_telemetria()
+    entrada_cache = cache.buscar_sql(pergunta_usuario) if cache is not None else None
+    if cache is not None:
+        telemetria.registrar_cache("sql", entrada_cache is not None)
+
+    if entrada_cache is not None:
+        sql_gerado = entrada_cache["sql"]
+        descricao = entrada_cache["descricao"]
+        st.subheader("1. Consulta Recuperada do Cache")
+        if entrada_cache["tipo"] == "exata":
+            st.caption("Esta pergunta já foi respondida recentemente; contexto e geração de SQL foram reaproveitados.")
+        else:
+            st.caption(f"Pergunta semelhante encontrada no cache (similaridade {entrada_cache['similaridade']:.3f}).")
+        st.code(sql_gerado, language='sql')
+        st.info(f"**Descrição:** {descricao}")
+    else:
+        # 1. Buscando Contexto (RAG)
+        st.subheader("1. Buscando Contexto (RAG)")
+        # Só o tempo de espera: a busca em si é medida na etapa 'busca_contexto'.
+        with telemetria.etapa("contexto_rag", tempos):
+            documentos_relevantes = futuro_contexto.result()
+        contexto_rag = formatar_contexto(documentos_relevantes)
+        with st.expander("Ver Contexto Encontrado"):
+            st.text(contexto_rag)
+
+        # 2. Gerando Consulta SQL com LLM
+        st.subheader("2. Gerando Consulta SQL com LLM")
+        mensagens_sql = montar_mensagens_sql(contexto_rag, pergunta_usuario)
+
+        # O JSON é exibido enquanto chega; só é interpretado quando a resposta termina.
+        area_streaming = st.empty()
+        resposta_json_str = ""
+        for trecho in transmitir_llm(llm, mensagens_sql, tempos, "geracao_sql", aviso_de_fila(area_streaming, "modelo de linguagem")):
+            resposta_json_str += trecho
+            area_streaming.code(resposta_json_str, language='json')
+        area_streaming.empty()
+
+        if not resposta_json_str:
+            st.error("O modelo não retornou uma resposta.")
+            return
+
+        try:
+            with telemetria.etapa("leitura_json", tempos):
+                sql_gerado, descricao = ler_resposta_sql(resposta_json_str)
+
+            st.code(sql_gerado, language='sql')
+            st.info(f"**Descrição:** {descricao}")
+
+            if not sql_gerado or "ERRO:" in sql_gerado:
+                st.error("O modelo não conseguiu gerar uma consulta SQL válida para a sua pergunta.")
+                return
 
-    st.success(message) # Exibe a mensagem de sucesso
-    return dataframes
+        except (json.JSONDecodeError, AttributeError):
+            st.error(f"O LLM retornou uma resposta em formato inválido. Resposta recebida:")
+            st.code(resposta_json_str)
+            return
+
+    # 3. Executando Consulta
+    st.subheader("3. Executando Consulta nos Arquivos CSV" if backend.nome == "csv" else "3. Executando Consulta no Trino")
+    if sql_gerado.strip().endswith(";"):
+        sql_gerado = sql_gerado.strip()[:-1]
+
+    estado_consultas = backend.estado()
+    if estado_consultas is not None and estado_consultas["na_fila"] > 0:
+        st.info(f"⏳ {estado_consultas['na_fila']} consultas aguardam à frente desta; ela será executada em seguida.")
+    respondida_por_cubo = None
+    with telemetria.etapa("execucao_sql", tempos, backend=backend.nome) as registro:
+        df_resultado = cache.buscar_resultado(sql_gerado) if cache is not None else None
+        if cache is not None:
+            telemetria.registrar_cache("resultado", df_resultado is not None)
+        if df_resultado is not None:
+            mensagem = f"Resultado recuperado do cache. Foram encontrados {len(df_resultado)} registros."
+        else:
+            df_resultado, mensagem = backend.executar(sql_gerado)
+            estatisticas = df_resultado.attrs.get("estatisticas_execucao", {}) if df_resultado is not None else {}
+            if "custo_estimado" in estatisticas:
+                registro["custo_estimado"] = estatisticas["custo_estimado"]
+            if "cubo" in estatisticas:
+                respondida_por_cubo = estatisticas["cubo"] is not None
+                telemetria.registrar_cache("cubo", respondida_por_cubo)
+                registro["custo_evitado_estimado_cubo"] = estatisticas["custo_evitado"]
+        registro["linhas_retornadas"] = len(df_resultado) if df_resultado is not None else 0
+    if respondida_por_cubo is not None:
+        # A duração medida da etapa, separada pela rota, é o que o painel compara em ms.
+        telemetria.registrar_duracao("execucao_sql_cubo" if respondida_por_cubo else "execucao_sql_tabela", registro["latencia_ms"])
+
+    if df_resultado is not None and not df_resultado.empty:
+        st.success(mensagem)
+        st.dataframe(df_resultado)
+        if cache is not None and entrada_cache is None:
+            # Só guardamos SQL que executou e trouxe resultados.
+            cache.salvar_sql(pergunta_usuario, sql_gerado, descricao)
+            cache.salvar_resultado(sql_gerado, df_resultado)
+
+        # 4. Interpretando os Resultados
+        st.subheader("4. Interpretando os Resultados")
+        resposta_final = cache.buscar_interpretacao(pergunta_usuario, df_resultado) if cache is not None else None
+        if cache is not None:
+            telemetria.registrar_cache("interpretacao", resposta_final is not None)
+        if resposta_final is not None:
+            st.markdown(resposta_final)
+            return
+
+        # Resultados grandes são resumidos localmente antes de ir para o LLM.
+        with telemetria.etapa("preparo_interpretacao", tempos) as registro:
+            mensagens_interpretacao, modo, tokens_prompt = preparar_interpretacao(llm, pergunta_usuario, df_resultado)
+            registro["modo"] = modo
+        if modo != "completo":
+            st.caption(f"Resultado com {len(df_resultado)} registros: a interpretação usa um resumo ({modo}, ~{tokens_prompt} tokens).")
+
+        # A tabela acima já está visível enquanto a resposta é transmitida token a token.
+        aviso_fila = st.empty()
+        resposta_final = st.write_stream(transmitir_llm(
+            llm, mensagens_interpretacao, tempos, "interpretacao", aviso_de_fila(aviso_fila, "modelo de linguagem")
+        ))
+        if cache is not None and resposta_final:
+            cache.salvar_interpretacao(pergunta_usuario, df_resultado, resposta_final)
+    else:
+        st.warning(f"A consulta não retornou resultados. Mensagem do sistema: {mensagem}")
 
 # --- Main App Logic ---
 def main():
     st.title("🤖 ChatBot do DPO - faça perguntas com base nos dados do One Trust - versão BETA")
     st.markdown("Faça uma pergunta em português sobre os dados dos arquivos CSV e o sistema irá gerar e executar uma consulta SQL para encontrar a resposta.")
 
-    DB_DIR = "base_chroma_db"
-    if not os.path.exists(DB_DIR):
-        st.info("Base de conhecimento não encontrada. Criando pela primeira vez...")
-        with st.spinner("Lendo o dicionário de dados e populando o ChromaDB..."):
-            try:
-                documentos = criar_documentos_de_conhecimento()
-                criar_base_de_conhecimento_rag(documentos, nome_diretorio_db=DB_DIR)
-                st.success("Base de conhecimento RAG criada com sucesso!")
-            except Exception as e:
-                st.error(f"Erro crítico ao criar a base de conhecimento RAG: {e}")
-                return
+    # --- Initialization ---
+    # Modelos, índice e dados carregam em segundo plano; a tela é exibida sem esperar por eles.
+    aquecimento = iniciar_aquecimento()
 
     with st.sidebar:
         st.header("Sobre")
         st.markdown("Os dados carregados para base de conhecimento do chat, são as perguntas e respostas das Avaliações realizadas e que estão com o Status de 'Concluída' e 'Em Revisão'. Faça busca por Unidade do Sebrae, Unidade Organizacional, entre outras buscas possível. O foco do chat na versão BETA é fazer consultas básicas de quantidade de Avaliações.")
-        st.markdown("A base de conhecimento (RAG) é criada automaticamente na primeira execução.")
+        st.markdown("A base de conhecimento (RAG) é pré-construída com `python populacao_rag.py` (ou `python aquecimento.py`, que também baixa o modelo e prepara os dados) e, se ausente, criada automaticamente na primeira execução.")
+        exibir_prontidao(aquecimento)
+        exibir_painel_telemetria()
+        if aquecimento.pronto("llm") and aquecimento.pronto("dados"):
+            exibir_ocupacao(aquecimento.obter("llm"), aquecimento.obter("dados"))
 
-    # --- Initialization ---
-    llm = inicializar_llm()
-    retriever = inicializar_retriever(nome_diretorio_db=DB_DIR)
-    dataframes = carregar_dados_csv()
-
-    if not all([llm, retriever, dataframes]):
-        st.warning("O sistema não está totalmente pronto. Verifique as mensagens de erro acima e a configuração.")
-        return
+    if any(estado["erro"] and estado["essencial"] for estado in aquecimento.estados().values()):
+        st.warning("O sistema não está totalmente pronto. Verifique as mensagens de erro na barra lateral e a configuração.")
 
     pergunta_usuario = st.text_input(
         "Qual informação você gostaria de consultar?",
         placeholder="Ex: Quantos formularios do tipo RAT existem em cada unidade organizacional no estado de São Paulo?"
     )
+    registrar_primeira_tela()
 
-    if st.button("Gerar Resposta", type="primary") and pergunta_usuario:
-        with st.spinner("Processando sua pergunta..."):
+    # Assim que a pergunta é confirmada (Enter), a busca de contexto começa em segundo plano,
+    # antes mesmo do clique em "Gerar Resposta" (se a base de conhecimento já estiver pronta).
+    futuro_contexto = None
+    if pergunta_usuario and aquecimento.pronto("retriever"):
+        futuro_contexto = agendar_busca_contexto(aquecimento.obter("retriever"), pergunta_usuario)
 
-            # 1. Buscando Contexto (RAG)
-            st.subheader("1. Buscando Contexto (RAG)")
-            documentos_relevantes = retriever.invoke(pergunta_usuario)
-            contexto_rag = "".join(f"---\nFonte: {doc.metadata.get('fonte', 'desconhecida')}\nConteúdo:\n{doc.page_content}\n" for doc in documentos_relevantes)
-            with st.expander("Ver Contexto Encontrado"):
-                st.text(contexto_rag)
-
-            # 2. Gerando Consulta SQL com LLM
-            st.subheader("2. Gerando Consulta SQL com LLM")
-            prompt_final = f"Contexto das Tabelas:\n{contexto_rag}\n\nCom base SOMENTE no contexto acima, traduza a seguinte pergunta para SQL.\n\nPergunta do Usuário:\n{pergunta_usuario}"
-
-            response = llm.invoke([SystemMessage(content=PROMPT_SISTEMA), HumanMessage(content=prompt_final)])
-            resposta_json_str = response.content
-
-            if not resposta_json_str:
-                st.error("O modelo não retornou uma resposta.")
-                return
-
-            try:
-                clean_response = resposta_json_str.strip().replace("```json", "").replace("```", "")
-                resposta_obj = json.loads(clean_response)
-                sql_gerado = resposta_obj.get("query")
-                descricao = resposta_obj.get("descricao")
-
-                st.code(sql_gerado, language='sql')
-                st.info(f"**Descrição:** {descricao}")
-
-                if not sql_gerado or "ERRO:" in sql_gerado:
-                    st.error("O modelo não conseguiu gerar uma consulta SQL válida para a sua pergunta.")
-                    return
-
-            except (json.JSONDecodeError, AttributeError):
-                st.error(f"O LLM retornou uma resposta em formato inválido. Resposta recebida:")
-                st.code(resposta_json_str)
-                return
-
-            # 3. Executando Consulta nos Arquivos CSV
-            st.subheader("3. Executando Consulta nos Arquivos CSV")
-            if sql_gerado.strip().endswith(";"):
-                sql_gerado = sql_gerado.strip()[:-1]
-
-            df_resultado, mensagem = execute_sql_on_dfs(sql_gerado, dataframes)
-
-            if df_resultado is not None and not df_resultado.empty:
-                st.success(mensagem)
-                st.dataframe(df_resultado)
-
-                # 4. Interpretando os Resultados
-                st.subheader("4. Interpretando os Resultados")
-                with st.spinner("Gerando resposta final em linguagem natural..."):
-                    dados_markdown = df_resultado.to_markdown()
-                    interpretador_prompt = f"""**PERGUNTA ORIGINAL DO USUÁRIO:**\n{pergunta_usuario}\n\n**DADOS DA CONSULTA:**\n{dados_markdown}\n\n
-                    Com base apenas nos dados acima, responda à pergunta original do usuário.
-                    Fique atento para não deixar de listar TODOS os registros em dados da consulta.
-                    Não crie informações que não estão dentro dos dados da consulta."""
-
-                    resposta_final_obj = llm.invoke([SystemMessage(content=PROMPT_SISTEMA_INTERPRETADOR), HumanMessage(content=interpretador_prompt)])
-                    st.markdown(resposta_final_obj.content)
-            else:
-                st.warning(f"A consulta não retornou resultados. Mensagem do sistema: {mensagem}")
+    if st.button("Gerar Resposta", type="primary") and pergunta_usuario:
+        recursos = obter_recursos(aquecimento)
+        if recursos is None:
+            return
+        from pool_llm import FilaCheia
+        llm, retriever, backend, cache = recursos
+        if futuro_contexto is None:
+            futuro_contexto = agendar_busca_contexto(retriever, pergunta_usuario)
+        tempos = {}
+        try:
+            with st.spinner("Processando sua pergunta..."), obter_telemetria().pergunta(pergunta_usuario, tempos):
+                responder_pergunta(pergunta_usuario, llm, futuro_contexto, backend, cache, tempos)
+        except FilaCheia:
+            st.warning("Há muitas perguntas sendo processadas no momento. Aguarde alguns instantes e tente novamente.")
+        exibir_tempos(tempos)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+Aquecimento dos recursos pesados do app em segundo plano, para que a interface apareça antes de o
+modelo de embedding, o índice vetorial, os dados e o LLM estarem carregados.
+
+Cada recurso é uma tarefa com nome, executada em sua própria thread assim que suas dependências
+terminam; `estados()` alimenta o painel de prontidão da barra lateral e `obter(nome)` espera pelo
+recurso quando uma pergunta precisa dele antes do fim do aquecimento.
+
+Executado como script, pré-aquece o que pode ser gravado em disco (ex.: no build do container):
+pesos do modelo de embedding, índice vetorial e cache tipado dos CSVs.
+
+    python aquecimento.py [--dados dados] [--diretorio-base base_vetorial_esquema]
+"""
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+# Referência para os tempos de partida: o primeiro import deste módulo. No app, isso acontece na
+# primeira execução do script (a primeira sessão), e não quando o servidor sobe: o tempo em que o
+# servidor ficou ocioso, antes de alguém abrir o app, não entra nas medidas.
+INICIO_PARTIDA = time.perf_counter()
+
+_lock_sqlite = threading.Lock()
+_aviso_sqlite_emitido = False
+
+logger = logging.getLogger(__name__)
+
+
+def ms_desde_inicio_da_partida() -> float:
+    return (time.perf_counter() - INICIO_PARTIDA) * 1000
+
+
+def usar_sqlite_recente():
+    """
+    Troca o `sqlite3` pelo `pysqlite3` (SQLite mais recente, com o FTS5 de trigramas do índice de
+    texto), se instalado. Deve ser chamado antes do primeiro import do sqlite3, no topo do ponto de
+    entrada (app, trabalhadores de consulta, modo em lote) e antes de qualquer thread. Se o sqlite3
+    do sistema já tiver sido importado, nada é alterado e um aviso é registrado uma vez.
+    """
+    global _aviso_sqlite_emitido
+    with _lock_sqlite:
+        atual = sys.modules.get("sqlite3")
+        if atual is not None:
+            if (not atual.__name__.startswith("pysqlite3") and not _aviso_sqlite_emitido
+                    and importlib.util.find_spec("pysqlite3") is not None):
+                logger.warning(
+                    "O sqlite3 do sistema foi importado antes de usar_sqlite_recente(); o pysqlite3 não será usado "
+                    "e a busca de texto pode ficar sem o FTS5 de trigramas."
+                )
+                _aviso_sqlite_emitido = True
+            return
+        try:
+            __import__("pysqlite3")
+            sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
+        except ImportError:
+            pass
+
+
+class Aquecimento:
+    """
+    Tarefas de carga executadas em paralelo, cada uma em uma thread, com estado consultável.
+
+    `ao_concluir(tempo_ms)` é chamado uma vez, quando todas as tarefas essenciais terminam com
+    sucesso, com o tempo desde o início da partida (tempo até a interatividade).
+    """
+
+    def __init__(self, ao_concluir=None):
+        self._tarefas = {}
+        self._estados = {}
+        self._lock = threading.Lock()
+        self._ao_concluir = ao_concluir
+        self.tempo_interativo_ms = None
+
+    def iniciar(self, nome: str, funcao, dependencias=(), descricao: str = None, essencial: bool = True):
+        """
+        Agenda `funcao(*resultados das dependências)`. Tarefas já agendadas com o mesmo nome são
+        mantidas. Se uma dependência falhar, a tarefa falha com o mesmo erro. Tarefas não essenciais
+        (ex.: um cache) não contam para o tempo até a interatividade.
+        """
+        with self._lock:
+            if nome in self._tarefas:
+                return self._tarefas[nome]
+            futuro = Future()
+            self._tarefas[nome] = futuro
+            self._estados[nome] = {
+                "descricao": descricao or nome, "estado": "aguardando", "duracao_ms": None, "erro": None, "essencial": essencial,
+            }
+            dependencias = [self._tarefas[dependencia] for dependencia in dependencias]
+        threading.Thread(
+            target=self._executar, args=(nome, funcao, dependencias, futuro), name=f"aquecimento-{nome}", daemon=True
+        ).start()
+        return futuro
+
+    def _atualizar(self, nome, **campos):
+        with self._lock:
+            self._estados[nome].update(campos)
+
+    def _executar(self, nome, funcao, dependencias, futuro):
+        try:
+            valores = [dependencia.result() for dependencia in dependencias]
+            self._atualizar(nome, estado="carregando")
+            inicio = time.perf_counter()
+            valor = funcao(*valores)
+        except Exception as e:
+            self._atualizar(nome, estado="erro", erro=str(e) or type(e).__name__)
+            futuro.set_exception(e)
+            return
+        self._atualizar(nome, estado="pronto", duracao_ms=(time.perf_counter() - inicio) * 1000)
+        futuro.set_result(valor)
+        self._verificar_conclusao()
+
+    def _verificar_conclusao(self):
+        with self._lock:
+            essenciais = [e for e in self._estados.values() if e["essencial"]]
+            if self.tempo_interativo_ms is not None or any(e["estado"] != "pronto" for e in essenciais):
+                return
+            self.tempo_interativo_ms = ms_desde_inicio_da_partida()
+        if self._ao_concluir is not None:
+            self._ao_concluir(self.tempo_interativo_ms)
+
+    def obter(self, nome: str, timeout: float = None):
+        """O resultado da tarefa, esperando por ele se necessário; levanta o erro da tarefa, se houver."""
+        return self._tarefas[nome].result(timeout)
+
+    def pronto(self, nome: str) -> bool:
+        futuro = self._tarefas.get(nome)
+        return futuro is not None and futuro.done() and futuro.exception() is None
+
+    def concluido(self) -> bool:
+        """Todas as tarefas terminaram, com sucesso ou erro."""
+        with self._lock:
+            return all(e["estado"] in ("pronto", "erro") for e in self._estados.values())
+
+    def estados(self) -> dict:
+        with self._lock:
+            return {nome: dict(estado) for nome, estado in self._estados.items()}
+
+
+def pre_aquecer(pasta_dados: str, diretorio_base: str, informar=print):
+    """
+    Deixa em disco o que a partida do app reaproveita: os pesos do modelo de embedding (no cache do
+    Hugging Face), o índice vetorial do RAG e o cache tipado dos CSVs em `dados/.cache`.
+
+    Returns:
+        Um dict etapa -> duração em ms.
+    """
+    from csv_query_engine import load_csv_data
+    from modelo_embedding import obter_modelo_embedding
+    from populacao_rag import base_de_conhecimento_atualizada, criar_base_de_conhecimento_rag, criar_documentos_por_coluna
+
+    duracoes = {}
+
+    def medir(etapa, funcao):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        duracoes[etapa] = (time.perf_counter() - inicio) * 1000
+        informar(f"{etapa}: {duracoes[etapa]:.0f} ms")
+        return resultado
+
+    medir("modelo_embedding", lambda: obter_modelo_embedding().embed_query("aquecimento"))
+    documentos = criar_documentos_por_coluna()
+    if not base_de_conhecimento_atualizada(documentos, diretorio_base):
+        if medir("base_vetorial", lambda: criar_base_de_conhecimento_rag(documentos, nome_diretorio_db=diretorio_base)) is None:
+            raise RuntimeError("não foi possível criar a base de conhecimento RAG.")
+    dataframes, mensagem = medir("dados", lambda: load_csv_data(pasta_dados))
+    if dataframes is None:
+        raise RuntimeError(mensagem)
+    return duracoes
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from populacao_rag import DIRETORIO_BASE_PADRAO
+
+    parser = argparse.ArgumentParser(description="Pré-aquece modelo de embedding, índice vetorial e cache dos CSVs.")
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados"))
+    parser.add_argument("--diretorio-base", default=DIRETORIO_BASE_PADRAO)
+    args = parser.parse_args()
+    try:
+        pre_aquecer(args.dados, args.diretorio_base)
+    except Exception as e:
+        raise SystemExit(f"Falha no pré-aquecimento: {e}")
+    print("Pré-aquecimento concluído.")
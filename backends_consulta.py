@@ -0,0 +1,392 @@
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import pandas as pd
+
+from csv_query_engine import execute_sql_on_dfs, load_csv_data, versao_dos_dados
+from guardrails_sql import (
+    LIMITE_LINHAS_PADRAO, TIMEOUT_PADRAO_SEGUNDOS, ConsultaInterrompida, ConsultaRejeitada,
+    aplicar_limite, validar_sql,
+)
+
+# "csv" (padrão) consulta os arquivos em dados/; "trino" consulta o warehouse diretamente.
+VARIAVEL_BACKEND = "SEBRAE_BACKEND_CONSULTA"
+# Com valor > 0, as consultas aos CSVs rodam em tantos processos separados (BackendCSVProcessos).
+VARIAVEL_PROCESSOS = "SEBRAE_PROCESSOS_CONSULTA"
+# Consultas aguardando um processo livre antes que novas sejam recusadas.
+MAX_FILA_CONSULTAS_PADRAO = 16
+TAMANHO_POOL_PADRAO = 4
+TAMANHO_PAGINA_PADRAO = 1000
+# Sem forma barata de detectar mudanças no warehouse, a versão dos dados remotos muda a cada intervalo.
+INTERVALO_VERSAO_REMOTA_SEGUNDOS = 3600
+
+
+class BackendConsulta:
+    """
+    Interface comum dos backends de consulta usados pelo app.
+
+    Todo backend expõe `preparar` (carrega ou verifica os dados), `versao_dados` (assinatura usada
+    para invalidar caches) e `executar`, que mantém o contrato `(result_df, message)` de
+    `execute_sql_on_dfs`.
+
+    `preparar_a_cada_pergunta` diz se o app deve chamar `preparar` antes de cada pergunta (para
+    recarregar dados alterados e falhar cedo) ou se `executar` já faz isso por conta própria.
+    """
+
+    nome = "base"
+    preparar_a_cada_pergunta = True
+
+    def preparar(self):
+        """Returns: Uma tupla (pronto, mensagem)."""
+        raise NotImplementedError
+
+    def versao_dados(self) -> str:
+        raise NotImplementedError
+
+    def executar(self, query: str, limite_linhas: int = LIMITE_LINHAS_PADRAO,
+                 timeout_segundos: float = TIMEOUT_PADRAO_SEGUNDOS):
+        raise NotImplementedError
+
+    def estado(self):
+        """Ocupação do backend ({'em_execucao', 'na_fila', 'capacidade'}), ou None se não houver fila."""
+        return None
+
+
+class BackendCSVLocal(BackendConsulta):
+    """Os CSVs da pasta `dados/`, carregados com `load_csv_data` e consultados pelo motor SQLite residente."""
+
+    nome = "csv"
+
+    def __init__(self, pasta_dados: str):
+        self.pasta_dados = pasta_dados
+        self._dataframes = None
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def versao_dados(self) -> str:
+        return versao_dos_dados(self.pasta_dados)
+
+    def preparar(self):
+        versao = self.versao_dados()
+        with self._lock:
+            if self._dataframes is not None and versao == self._versao:
+                return True, f"Tabelas carregadas com sucesso: {list(self._dataframes.keys())}"
+            dataframes, mensagem = load_csv_data(self.pasta_dados)
+            if dataframes is None:
+                return False, mensagem
+            self._dataframes, self._versao = dataframes, versao
+            return True, mensagem
+
+    @property
+    def dataframes(self):
+        return self._dataframes
+
+    def executar(self, query: str, limite_linhas: int = LIMITE_LINHAS_PADRAO,
+                 timeout_segundos: float = TIMEOUT_PADRAO_SEGUNDOS):
+        pronto, mensagem = self.preparar()
+        if not pronto:
+            return None, mensagem
+        return execute_sql_on_dfs(query, self._dataframes, limite_linhas=limite_linhas, timeout_segundos=timeout_segundos)
+
+
+class BackendCSVProcessos(BackendConsulta):
+    """
+    Os mesmos CSVs de `BackendCSVLocal`, com as consultas executadas em um pool de `processos`
+    processos (spawn). Cada processo carrega os dados (do cache em `dados/.cache`) e mantém seu
+    próprio motor residente, então consultas de sessões diferentes rodam em paralelo em vez de
+    se revezarem no GIL e na conexão compartilhada. O processo do app não carrega os dados.
+
+    Com `processos + max_fila` consultas em andamento, novas consultas são recusadas com uma
+    mensagem de servidor ocupado, mantendo o contrato `(result_df, message)`. Se um processo
+    morrer (falta de memória, falha no SQLite), o pool é recriado e as consultas que estavam
+    nele recebem uma mensagem de erro.
+
+    Os processos recarregam os CSVs alterados em cada `executar`, então o app não chama `preparar`
+    a cada pergunta: seria uma tarefa a mais no pool, fora do controle de `max_fila`.
+    """
+
+    nome = "csv"
+    preparar_a_cada_pergunta = False
+
+    def __init__(self, pasta_dados: str, processos: int, max_fila: int = MAX_FILA_CONSULTAS_PADRAO):
+        self.pasta_dados = pasta_dados
+        self.processos = processos
+        self.max_fila = max_fila
+        self._pendentes = 0
+        self._lock_pendentes = threading.Lock()
+        self._lock_pool = threading.Lock()
+        self._pool = self._criar_pool()
+
+    def _criar_pool(self):
+        from trabalhador_consultas import inicializar
+
+        return ProcessPoolExecutor(
+            max_workers=self.processos, mp_context=multiprocessing.get_context("spawn"),
+            initializer=inicializar, initargs=(self.pasta_dados,),
+        )
+
+    def _recriar_pool(self, pool_quebrado):
+        """Troca o pool quebrado por um novo; chamadas concorrentes com o mesmo pool recriam uma vez só."""
+        with self._lock_pool:
+            if self._pool is pool_quebrado:
+                pool_quebrado.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._criar_pool()
+
+    def _executar_no_pool(self, funcao, *args):
+        with self._lock_pool:
+            pool = self._pool
+        try:
+            return pool.submit(funcao, *args).result()
+        except BrokenProcessPool:
+            self._recriar_pool(pool)
+            raise
+
+    def versao_dados(self) -> str:
+        return versao_dos_dados(self.pasta_dados)
+
+    def preparar(self):
+        from trabalhador_consultas import preparar
+
+        try:
+            return self._executar_no_pool(preparar)
+        except BrokenProcessPool:
+            return False, "Erro ao carregar os dados: um processo de consulta foi encerrado inesperadamente."
+        except Exception as e:
+            return False, f"Erro ao carregar os dados: {e}"
+
+    def estado(self):
+        with self._lock_pendentes:
+            return {
+                "em_execucao": min(self._pendentes, self.processos),
+                "na_fila": max(0, self._pendentes - self.processos),
+                "capacidade": self.processos,
+            }
+
+    def executar(self, query: str, limite_linhas: int = LIMITE_LINHAS_PADRAO,
+                 timeout_segundos: float = TIMEOUT_PADRAO_SEGUNDOS):
+        from trabalhador_consultas import executar_consulta
+
+        with self._lock_pendentes:
+            if self._pendentes >= self.processos + self.max_fila:
+                return None, (
+                    f"Consulta rejeitada: o servidor está ocupado ({self._pendentes} consultas em andamento). "
+                    "Tente novamente em instantes."
+                )
+            self._pendentes += 1
+        try:
+            return self._executar_no_pool(executar_consulta, query, limite_linhas, timeout_segundos)
+        except BrokenProcessPool:
+            return None, (
+                "Erro ao executar a consulta SQL: o processo de consulta foi encerrado inesperadamente "
+                "(possivelmente por falta de memória). Tente novamente ou simplifique a consulta."
+            )
+        except Exception as e:
+            return None, f"Erro ao executar a consulta SQL: {e}"
+        finally:
+            with self._lock_pendentes:
+                self._pendentes -= 1
+
+    def fechar(self):
+        with self._lock_pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class PoolConexoes:
+    """
+    Pool simples de conexões DB-API: até `tamanho` conexões criadas sob demanda por `fabrica`
+    e reaproveitadas entre consultas. Conexões que falham durante o uso são descartadas.
+    """
+
+    def __init__(self, fabrica, tamanho: int = TAMANHO_POOL_PADRAO):
+        self._fabrica = fabrica
+        self._livres = queue.LifoQueue()
+        self._semaforo = threading.BoundedSemaphore(tamanho)
+
+    @contextmanager
+    def conexao(self):
+        self._semaforo.acquire()
+        try:
+            try:
+                conexao = self._livres.get_nowait()
+            except queue.Empty:
+                conexao = self._fabrica()
+            try:
+                yield conexao
+            except Exception:
+                _fechar(conexao)
+                raise
+            self._livres.put(conexao)
+        finally:
+            self._semaforo.release()
+
+    def fechar(self):
+        while True:
+            try:
+                _fechar(self._livres.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _fechar(conexao):
+    try:
+        conexao.close()
+    except Exception:
+        pass
+
+
+class BackendSQLRemoto(BackendConsulta):
+    """
+    Backend para um banco acessado por DB-API (Trino em produção), com pool de conexões.
+
+    As tabelas permanecem no servidor; apenas o resultado trafega, lido página a página com
+    `fetchmany(tamanho_pagina)`. O SQL passa por `validar_sql` e recebe o LIMIT automático; o
+    timeout é verificado entre páginas e cancela a consulta no servidor (`cursor.cancel`, quando
+    disponível). As linhas chegam como tuplas do driver; com `tipos_arrow=True`, as colunas do
+    DataFrame resultante são convertidas para tipos Arrow (inteiros e textos com nulos, sem `object`).
+
+    Para testes, `fabrica_conexao` pode devolver conexões de um SQLite que emula o catálogo
+    (`criar_catalogo_sqlite_emulado`).
+    """
+
+    nome = "sql_remoto"
+
+    def __init__(self, fabrica_conexao, tamanho_pool: int = TAMANHO_POOL_PADRAO,
+                 tamanho_pagina: int = TAMANHO_PAGINA_PADRAO, tipos_arrow: bool = True,
+                 descricao: str = "banco remoto"):
+        self.pool = PoolConexoes(fabrica_conexao, tamanho_pool)
+        self.tamanho_pagina = tamanho_pagina
+        self.tipos_arrow = tipos_arrow
+        self.descricao = descricao
+
+    def versao_dados(self) -> str:
+        return f"{self.nome}-{int(time.time() // INTERVALO_VERSAO_REMOTA_SEGUNDOS)}"
+
+    def preparar(self):
+        try:
+            with self.pool.conexao() as conexao:
+                cursor = conexao.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            return True, f"Conectado a {self.descricao}."
+        except Exception as e:
+            return False, f"Erro ao conectar a {self.descricao}: {e}"
+
+    def executar(self, query: str, limite_linhas: int = LIMITE_LINHAS_PADRAO,
+                 timeout_segundos: float = TIMEOUT_PADRAO_SEGUNDOS):
+        try:
+            result_df, estatisticas = self._executar(query, limite_linhas, timeout_segundos)
+        except ConsultaRejeitada as e:
+            return None, f"Consulta rejeitada: {e}"
+        except ConsultaInterrompida as e:
+            return None, f"Consulta interrompida: {e}"
+        except Exception as e:
+            return None, f"Erro ao executar a consulta SQL: {e}"
+
+        message = f"Consulta executada com sucesso. Foram encontrados {len(result_df)} registros."
+        if estatisticas["truncado"]:
+            message += f" Resultado limitado aos primeiros {limite_linhas} registros."
+        message += f" (tempo: {estatisticas['tempo_ms']} ms · páginas: {estatisticas['paginas']} · {self.descricao})"
+        return result_df, message
+
+    def _executar(self, query, limite_linhas, timeout_segundos):
+        query = aplicar_limite(validar_sql(query), limite_linhas)
+        inicio = time.perf_counter()
+        prazo = inicio + timeout_segundos
+        with self.pool.conexao() as conexao:
+            cursor = conexao.cursor()
+            try:
+                cursor.execute(query)
+                colunas = [descricao[0] for descricao in cursor.description]
+                linhas = []
+                paginas = 0
+                while len(linhas) <= limite_linhas:
+                    if time.perf_counter() > prazo:
+                        cancelar = getattr(cursor, "cancel", None)
+                        if cancelar is not None:
+                            cancelar()
+                        raise ConsultaInterrompida(
+                            f"a consulta excedeu o tempo limite de {timeout_segundos:g} s e foi cancelada."
+                        )
+                    pagina = cursor.fetchmany(self.tamanho_pagina)
+                    if not pagina:
+                        break
+                    paginas += 1
+                    linhas.extend(pagina)
+            finally:
+                _fechar(cursor)
+
+        truncado = len(linhas) > limite_linhas
+        result_df = pd.DataFrame.from_records(linhas[:limite_linhas], columns=colunas)
+        if self.tipos_arrow:
+            result_df = result_df.convert_dtypes(dtype_backend="pyarrow")
+        estatisticas = {
+            "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "linhas": len(result_df),
+            "truncado": truncado,
+            "paginas": paginas,
+        }
+        result_df.attrs["estatisticas_execucao"] = estatisticas
+        return result_df, estatisticas
+
+
+class BackendTrino(BackendSQLRemoto):
+    """
+    Consulta `iceberg.landing_trusted` no Trino. Os nomes de tabela usados pelo LLM
+    (`ot_consolidada`, `nx_org_group_classified_v2`) são resolvidos pelo catálogo/schema da sessão.
+    O timeout também é repassado ao servidor pela propriedade `query_max_execution_time`.
+    """
+
+    nome = "trino"
+
+    def __init__(self, host: str, port: int = 443, user: str = "sebrae", password: str = None,
+                 catalog: str = "iceberg", schema: str = "landing_trusted", http_scheme: str = "https",
+                 timeout_segundos: float = TIMEOUT_PADRAO_SEGUNDOS, **kwargs):
+        import trino
+
+        def fabrica():
+            auth = trino.auth.BasicAuthentication(user, password) if password else None
+            return trino.dbapi.connect(
+                host=host, port=int(port), user=user, catalog=catalog, schema=schema,
+                http_scheme=http_scheme, auth=auth,
+                session_properties={"query_max_execution_time": f"{int(timeout_segundos)}s"},
+            )
+
+        super().__init__(fabrica, descricao=f"Trino {catalog}.{schema}", **kwargs)
+
+
+def criar_catalogo_sqlite_emulado(dataframes: dict, caminho_db: str):
+    """
+    Grava os DataFrames em um arquivo SQLite que faz o papel do catálogo remoto nos testes do
+    `BackendSQLRemoto` (tests/test_backends_consulta.py).
+
+    Returns:
+        Uma fábrica de conexões para passar como `fabrica_conexao`.
+    """
+    with sqlite3.connect(caminho_db) as conexao:
+        for nome, df in dataframes.items():
+            df.to_sql(nome, conexao, if_exists="replace", index=False)
+    return lambda: sqlite3.connect(caminho_db, check_same_thread=False)
+
+
+def criar_backend(pasta_dados: str, configuracao_trino: dict = None) -> BackendConsulta:
+    """
+    Cria o backend definido pela variável de ambiente SEBRAE_BACKEND_CONSULTA ('csv' ou 'trino').
+    Para 'trino', `configuracao_trino` traz host, port, user, password, catalog e schema.
+    Para 'csv', SEBRAE_PROCESSOS_CONSULTA > 0 executa as consultas em um pool de processos.
+    """
+    tipo = os.environ.get(VARIAVEL_BACKEND, "csv").strip().lower()
+    if tipo == "trino":
+        return BackendTrino(**(configuracao_trino or {}))
+    if tipo != "csv":
+        raise ValueError(f"Backend de consulta desconhecido: '{tipo}'. Use 'csv' ou 'trino'.")
+    processos = int(os.environ.get(VARIAVEL_PROCESSOS, "0") or 0)
+    if processos > 0:
+        return BackendCSVProcessos(pasta_dados, processos)
+    return BackendCSVLocal(pasta_dados)
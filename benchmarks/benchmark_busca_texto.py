@@ -0,0 +1,70 @@
+"""
+Benchmark de consultas com `LOWER(coluna) LIKE LOWER('%termo%')`: motor sem índice de texto
+(varredura com LOWER em todas as linhas) vs motor com índice FTS5 de trigramas e reescrita
+automática dos filtros.
+
+Para simular exportações maiores, a tabela pode ser replicada com --escala.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_busca_texto [--escala 10] [--repeticoes 5]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import pandas as pd
+
+from csv_query_engine import MotorConsultaSQL, load_csv_data
+
+TABELA = "nx_org_group_classified_v2"
+CONSULTAS = [
+    f"SELECT COUNT(*) AS total FROM {TABELA} WHERE LOWER(forms_name) LIKE LOWER('%folha de pagamento%')",
+    f"SELECT forms_uf, COUNT(*) AS total FROM {TABELA} WHERE LOWER(description_org) LIKE LOWER('%finanças%') GROUP BY forms_uf",
+    f"SELECT COUNT(*) AS total FROM {TABELA} WHERE LOWER(primary_record_name) LIKE LOWER('%evento%') "
+    f"AND LOWER(forms_status) LIKE LOWER('%completed%')",
+    f"SELECT forms_name FROM {TABELA} WHERE LOWER(forms_name) LIKE LOWER('%contrat%') "
+    f"OR LOWER(primary_record_name) LIKE LOWER('%contrat%')",
+]
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    parser.add_argument("--escala", type=int, default=1)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    dataframes, mensagem = load_csv_data(args.dados)
+    if dataframes is None:
+        raise SystemExit(mensagem)
+    if args.escala > 1:
+        dataframes[TABELA] = pd.concat([dataframes[TABELA]] * args.escala, ignore_index=True)
+
+    motores = {}
+    for nome, indexar in (("sem índice", False), ("com índice", True)):
+        motor = MotorConsultaSQL(indexar_texto=indexar)
+        inicio = time.perf_counter()
+        motor.sincronizar(dataframes)
+        print(f"Carga do motor {nome}: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+        motores[nome] = motor
+    print(f"\nLinhas em {TABELA}: {len(dataframes[TABELA])}\n")
+
+    print(f"{'consulta':<10}{'sem índice (ms)':>18}{'com índice (ms)':>18}{'ganho':>10}")
+    for i, consulta in enumerate(CONSULTAS, start=1):
+        antes = _medir(lambda: motores["sem índice"].executar(consulta, dataframes), args.repeticoes)
+        depois = _medir(lambda: motores["com índice"].executar(consulta, dataframes), args.repeticoes)
+        print(f"{'#' + str(i):<10}{antes:>18.1f}{depois:>18.1f}{antes / depois:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
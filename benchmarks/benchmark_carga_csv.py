@@ -0,0 +1,81 @@
+"""
+Benchmark da carga dos CSVs: leitura sem tipos (comportamento original), leitura tipada
+a partir do CSV e leitura a partir do cache binário. Cada modo roda em um subprocesso
+separado para que o pico de memória (RSS) seja medido de forma isolada.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_carga_csv [--dados dados]
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+MODOS = ["sem_tipos", "tipado_csv", "tipado_cache"]
+
+
+def _pico_rss_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KiB, macOS em bytes.
+    return pico / 1024 if sys.platform != "darwin" else pico / (1024 * 1024)
+
+
+def _executar_modo(modo, pasta):
+    import pandas as pd
+    from csv_query_engine import load_csv_data
+
+    tabelas = {}
+    inicio = time.perf_counter()
+    if modo == "sem_tipos":
+        for filename in sorted(os.listdir(pasta)):
+            if filename.endswith(".csv"):
+                t0 = time.perf_counter()
+                df = pd.read_csv(os.path.join(pasta, filename), sep=";")
+                tabelas[os.path.splitext(filename)[0]] = {
+                    "tempo_ms": round((time.perf_counter() - t0) * 1000, 1),
+                    "memoria_mb": round(float(df.memory_usage(deep=True).sum()) / 1e6, 2),
+                }
+    else:
+        dataframes, mensagem = load_csv_data(pasta)
+        if dataframes is None:
+            raise SystemExit(mensagem)
+        tabelas = {nome: df.attrs["estatisticas_carga"] for nome, df in dataframes.items()}
+    total_ms = (time.perf_counter() - inicio) * 1000
+    print(json.dumps({
+        "total_ms": round(total_ms, 1),
+        "pico_rss_mb": round(_pico_rss_mb(), 1),
+        "tabelas": tabelas,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        _executar_modo(args.modo, args.dados)
+        return
+
+    from csv_query_engine import NOME_PASTA_CACHE
+    shutil.rmtree(os.path.join(args.dados, NOME_PASTA_CACHE), ignore_errors=True)
+
+    print(f"{'modo':<15}{'tabela':<32}{'carga (ms)':>12}{'memória (MB)':>14}{'pico RSS (MB)':>15}")
+    for modo in MODOS:
+        saida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.benchmark_carga_csv", "--dados", args.dados, "--modo", modo],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        resultado = json.loads(saida.strip().splitlines()[-1])
+        for nome, estatisticas in resultado["tabelas"].items():
+            print(f"{modo:<15}{nome:<32}{estatisticas['tempo_ms']:>12.1f}"
+                  f"{estatisticas['memoria_mb']:>14.2f}{resultado['pico_rss_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark dos agregados pré-calculados: as consultas do corpus (`benchmarks/corpus_perguntas.py`)
+executadas no MotorConsultaSQL com e sem cubos, em várias escalas dos dados.
+
+Relata, por consulta, a latência mediana nos dois motores, se foi respondida por um cubo e se os
+resultados coincidem; ao final, a taxa de acerto dos cubos, a economia medida contra a tabela
+original (o motor só a estima pelo custo dos planos) e o tempo de atualização completa vs
+incremental (após acrescentar 1% de linhas novas à tabela).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_cubos [--escalas 1 10] [--repeticoes 5]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import pandas as pd
+
+from benchmarks.benchmark_pipeline import comparar_resultado, escalar_dados
+from benchmarks.corpus_perguntas import CORPUS, TABELA
+from csv_query_engine import MotorConsultaSQL, load_csv_data
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), resultado
+
+
+def _medir_atualizacao(dataframes):
+    """Tempo da carga completa do motor e da atualização após acrescentar 1% de linhas."""
+    motor = MotorConsultaSQL()
+    inicio = time.perf_counter()
+    motor.sincronizar(dataframes)
+    completa_ms = (time.perf_counter() - inicio) * 1000
+
+    tabela = dataframes[TABELA]
+    acrescimo = tabela.sample(max(1, len(tabela) // 100), random_state=42)
+    ampliada = pd.concat([tabela, acrescimo], ignore_index=True)
+    ampliada.attrs = {"versao_dados": ("acrescimo", tabela.attrs.get("versao_dados"))}
+    cubo = motor._cubos[TABELA]
+    inicio = time.perf_counter()
+    cubo.atualizar(motor._conexao, ampliada)
+    incremental_ms = (time.perf_counter() - inicio) * 1000
+    inicio = time.perf_counter()
+    cubo._base = None
+    cubo.atualizar(motor._conexao, ampliada)
+    recalculo_ms = (time.perf_counter() - inicio) * 1000
+    return completa_ms, incremental_ms, recalculo_ms
+
+
+def executar_escala(fator, dataframes_base, repeticoes):
+    dataframes = escalar_dados(dataframes_base, fator)
+    sem_cubos, com_cubos = MotorConsultaSQL(usar_cubos=False), MotorConsultaSQL()
+    sem_cubos.sincronizar(dataframes)
+    com_cubos.sincronizar(dataframes)
+
+    print(f"\n=== Escala {fator}x ({len(dataframes[TABELA]):,} linhas) ===")
+    print(f"{'consulta':<10}{'sem cubos (ms)':>16}{'com cubos (ms)':>16}{'ganho':>9}  {'cubo':<6}{'iguais':<7}")
+    totais = [0.0, 0.0]
+    for i, item in enumerate(CORPUS, start=1):
+        antes, (esperado, _) = _medir(lambda: sem_cubos.executar(item["sql"], dataframes), repeticoes)
+        depois, (obtido, estatisticas) = _medir(lambda: com_cubos.executar(item["sql"], dataframes), repeticoes)
+        iguais, _ = comparar_resultado(obtido, esperado)
+        totais[0] += antes
+        totais[1] += depois
+        print(f"{'#' + str(i):<10}{antes:>16.2f}{depois:>16.2f}{antes / depois:>8.1f}x  "
+              f"{'sim' if estatisticas['cubo'] else 'não':<6}{'sim' if iguais else 'NÃO':<7}")
+    print(f"{'total':<10}{totais[0]:>16.2f}{totais[1]:>16.2f}{totais[0] / totais[1]:>8.1f}x")
+
+    estatisticas = com_cubos.estatisticas_cubos()
+    print(f"Taxa de acerto dos cubos: {estatisticas['taxa_acerto']:.1%} · economia medida: {totais[0] - totais[1]:.1f} ms"
+          f" · custo evitado acumulado: {estatisticas['custo_evitado']:,} linhas"
+          f" · rollups: {len(com_cubos._cubos[TABELA].tabelas_rollup)}")
+    completa_ms, incremental_ms, recalculo_ms = _medir_atualizacao(dataframes)
+    print(f"Carga completa do motor: {completa_ms:.1f} ms · cubo após +1% de linhas: "
+          f"{incremental_ms:.1f} ms incremental vs {recalculo_ms:.1f} ms recalculado do zero")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    dataframes, mensagem = load_csv_data(args.dados)
+    if dataframes is None:
+        raise SystemExit(mensagem)
+    for fator in args.escalas:
+        executar_escala(fator, dataframes, args.repeticoes)
+
+
+if __name__ == "__main__":
+    main()
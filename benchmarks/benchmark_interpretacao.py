@@ -0,0 +1,80 @@
+"""
+Benchmark do preparo da interpretação: tokens do prompt e latência local em função do
+número de linhas do resultado, comparando o envio do DataFrame inteiro em markdown
+(comportamento original) com `preparar_interpretacao`.
+
+O LLM é substituído por um stub que responde instantaneamente, de modo que a latência
+medida é apenas a do preparo local (inclui as chamadas de mapeamento no modo map_reduce).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_interpretacao
+"""
+import argparse
+import os
+import time
+
+from csv_query_engine import execute_sql_on_dfs, load_csv_data
+from interpretacao_resultados import estimar_tokens, preparar_interpretacao
+
+CONSULTAS = {
+    "contagem_por_grupo": "SELECT forms_org_grupo_name, forms_uf, COUNT(*) AS total "
+                          "FROM nx_org_group_classified_v2 GROUP BY forms_org_grupo_name, forms_uf",
+    "select_estrela": "SELECT * FROM nx_org_group_classified_v2",
+}
+
+
+class _RespostaStub:
+    def __init__(self, content):
+        self.content = content
+
+
+class LLMStub:
+    """Responde cada chamada de mapeamento com um texto curto e fixo."""
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def invoke(self, mensagens):
+        self.chamadas += 1
+        return _RespostaStub("Resumo parcial do bloco.")
+
+    def batch(self, lista_mensagens):
+        return [self.invoke(mensagens) for mensagens in lista_mensagens]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    parser.add_argument("--linhas", default="10,100,1000,4000")
+    args = parser.parse_args()
+
+    dataframes, mensagem = load_csv_data(args.dados)
+    if dataframes is None:
+        raise SystemExit(mensagem)
+
+    print(f"{'consulta':<20}{'linhas':>8}{'tokens orig.':>14}{'ms orig.':>10}"
+          f"{'modo':>12}{'tokens novo':>13}{'ms novo':>10}{'chamadas':>10}")
+    for nome, consulta in CONSULTAS.items():
+        resultado, mensagem = execute_sql_on_dfs(consulta, dataframes)
+        if resultado is None:
+            raise SystemExit(mensagem)
+        for linhas in map(int, args.linhas.split(",")):
+            df = resultado.head(linhas)
+            if len(df) < linhas:
+                continue
+
+            inicio = time.perf_counter()
+            tokens_originais = estimar_tokens(df.to_markdown())
+            ms_original = (time.perf_counter() - inicio) * 1000
+
+            llm = LLMStub()
+            inicio = time.perf_counter()
+            _, modo, tokens_novos = preparar_interpretacao(llm, "Quantas avaliações existem?", df)
+            ms_novo = (time.perf_counter() - inicio) * 1000
+
+            print(f"{nome:<20}{linhas:>8}{tokens_originais:>14}{ms_original:>10.1f}"
+                  f"{modo:>12}{tokens_novos:>13}{ms_novo:>10.1f}{llm.chamadas:>10}")
+
+
+if __name__ == "__main__":
+    main()
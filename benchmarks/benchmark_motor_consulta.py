@@ -0,0 +1,67 @@
+"""
+Benchmark de latência: pandasql.sqldf (banco recriado a cada consulta) vs MotorConsultaSQL
+(tabelas residentes em uma conexão SQLite compartilhada).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_motor_consulta [--repeticoes 5]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from pandasql import sqldf
+
+from csv_query_engine import MotorConsultaSQL, load_csv_data
+
+# Consultas representativas do que o LLM gera a partir do PROMPT_SISTEMA.
+CONSULTAS = [
+    "SELECT forms_uf, COUNT(*) AS total FROM nx_org_group_classified_v2 GROUP BY forms_uf ORDER BY total DESC",
+    "SELECT forms_org_grupo_name, COUNT(*) AS total FROM nx_org_group_classified_v2 "
+    "WHERE LOWER(forms_uf) LIKE LOWER('%sp%') GROUP BY forms_org_grupo_name",
+    "SELECT flag_ropa_rat, forms_status, COUNT(*) AS total FROM nx_org_group_classified_v2 "
+    "GROUP BY flag_ropa_rat, forms_status",
+    "SELECT COUNT(*) AS total FROM nx_org_group_classified_v2 WHERE LOWER(forms_name) LIKE LOWER('%evento%')",
+    "SELECT end_date_year, end_date_month, COUNT(*) AS total FROM nx_org_group_classified_v2 "
+    "GROUP BY end_date_year, end_date_month ORDER BY end_date_year, end_date_month",
+    "SELECT * FROM nx_org_group_classified_v2 WHERE assessment_risk_level_name = 'HIGH'",
+]
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    args = parser.parse_args()
+
+    dataframes, mensagem = load_csv_data(args.dados)
+    if dataframes is None:
+        raise SystemExit(mensagem)
+
+    motor = MotorConsultaSQL()
+    inicio = time.perf_counter()
+    motor.sincronizar(dataframes)
+    print(f"Carga inicial do motor: {(time.perf_counter() - inicio) * 1000:.1f} ms\n")
+
+    print(f"{'consulta':<10}{'sqldf (ms)':>14}{'motor (ms)':>14}{'ganho':>10}")
+    totais = [0.0, 0.0]
+    for i, consulta in enumerate(CONSULTAS, start=1):
+        antes = _medir(lambda: sqldf(consulta, dataframes), args.repeticoes)
+        depois = _medir(lambda: motor.executar(consulta, dataframes), args.repeticoes)
+        totais[0] += antes
+        totais[1] += depois
+        print(f"{'#' + str(i):<10}{antes:>14.1f}{depois:>14.1f}{antes / depois:>9.1f}x")
+    print(f"{'total':<10}{totais[0]:>14.1f}{totais[1]:>14.1f}{totais[0] / totais[1]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark de partida a frio da camada RAG, cada cenário em um subprocesso novo:
+
+- antes: dois `HuggingFaceEmbeddings` independentes (populacao_rag + app) e o índice vetorial
+  construído no caminho da requisição;
+- depois: modelo compartilhado (`obter_modelo_embedding`) e abertura (memory-map) da base
+  pré-construída por `python populacao_rag.py`.
+
+E da partida completa do app (modelo de embedding, índice vetorial e dados no motor residente),
+relatando o tempo até a interatividade (tti_s, desde o import do `aquecimento`, como no app):
+
+- sequencial: os recursos carregados um após o outro, como nos antigos `st.cache_resource`;
+- paralelo: os mesmos recursos em threads pelo `Aquecimento` do app.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_partida_fria [--diretorio base_vetorial_esquema] [--dados dados]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+CENARIOS = ["antes", "depois"]
+CENARIOS_PARTIDA = ["sequencial", "paralelo"]
+
+
+def _executar_partida(cenario, diretorio, pasta_dados):
+    from aquecimento import Aquecimento, ms_desde_inicio_da_partida
+    from backends_consulta import BackendCSVLocal
+    from modelo_embedding import obter_modelo_embedding
+    from recuperador_esquema import IndiceVetorial, RecuperadorEsquema
+
+    def carregar_modelo():
+        modelo = obter_modelo_embedding()
+        modelo.embed_query("aquecimento")
+        return modelo
+
+    def carregar_dados():
+        backend = BackendCSVLocal(pasta_dados)
+        backend.preparar()
+        backend.executar("SELECT 1")
+        return backend
+
+    if cenario == "sequencial":
+        RecuperadorEsquema(IndiceVetorial.carregar(diretorio), carregar_modelo())
+        carregar_dados()
+        tti_ms = ms_desde_inicio_da_partida()
+    else:
+        aquecimento = Aquecimento()
+        aquecimento.iniciar("modelo_embedding", carregar_modelo)
+        aquecimento.iniciar("indice", lambda: IndiceVetorial.carregar(diretorio))
+        aquecimento.iniciar("retriever", RecuperadorEsquema, ("indice", "modelo_embedding"))
+        aquecimento.iniciar("dados", carregar_dados)
+        for nome in ("retriever", "dados"):
+            aquecimento.obter(nome)
+        tti_ms = ms_desde_inicio_da_partida()
+    print(json.dumps({"tti_s": tti_ms / 1000}))
+
+
+def _executar_cenario(cenario, diretorio):
+    inicio = time.perf_counter()
+    from populacao_rag import criar_documentos_por_coluna
+    from recuperador_esquema import IndiceVetorial, RecuperadorEsquema
+    tempos = {"imports_s": time.perf_counter() - inicio}
+
+    if cenario == "antes":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        from modelo_embedding import NOME_MODELO_EMBEDDING
+
+        t0 = time.perf_counter()
+        modelo_populacao = HuggingFaceEmbeddings(model_name=NOME_MODELO_EMBEDDING)
+        IndiceVetorial.construir(criar_documentos_por_coluna(), modelo_populacao).salvar(diretorio)
+        tempos["criar_base_s"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        modelo_app = HuggingFaceEmbeddings(model_name=NOME_MODELO_EMBEDDING)
+        retriever = RecuperadorEsquema(IndiceVetorial.carregar(diretorio), modelo_app)
+        tempos["abrir_base_s"] = time.perf_counter() - t0
+    else:
+        from modelo_embedding import obter_modelo_embedding
+
+        t0 = time.perf_counter()
+        retriever = RecuperadorEsquema(IndiceVetorial.carregar(diretorio), obter_modelo_embedding())
+        tempos["abrir_base_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    retriever.invoke("Quantas avaliações existem por UF?")
+    tempos["primeira_busca_s"] = time.perf_counter() - t0
+    tempos["total_s"] = time.perf_counter() - inicio
+    print(json.dumps(tempos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--diretorio", help="Base pré-construída usada no cenário 'depois'.")
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    parser.add_argument("--cenario", choices=CENARIOS + CENARIOS_PARTIDA, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cenario in CENARIOS_PARTIDA:
+        _executar_partida(args.cenario, args.diretorio, args.dados)
+        return
+    if args.cenario:
+        _executar_cenario(args.cenario, args.diretorio)
+        return
+
+    pasta_temporaria = tempfile.mkdtemp(prefix="bench_rag_")
+    try:
+        diretorio_antes = os.path.join(pasta_temporaria, "antes")
+        diretorio_depois = args.diretorio or os.path.join(pasta_temporaria, "depois")
+        if not args.diretorio:
+            # A base do cenário "depois" é criada fora da medição, como faria o build do container.
+            subprocess.run([sys.executable, "populacao_rag.py", "--diretorio", diretorio_depois],
+                           check=True, capture_output=True)
+
+        cenarios = [("antes", diretorio_antes), ("depois", diretorio_depois)]
+        cenarios += [(cenario, diretorio_depois) for cenario in CENARIOS_PARTIDA]
+        for cenario, diretorio in cenarios:
+            saida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.benchmark_partida_fria", "--cenario", cenario,
+                 "--diretorio", diretorio, "--dados", args.dados],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            tempos = json.loads(saida.strip().splitlines()[-1])
+            print(f"{cenario:<12}" + "  ".join(f"{etapa}={valor:.2f}" for etapa, valor in tempos.items()))
+    finally:
+        shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Benchmark e teste de regressão do pipeline completo, sem interface e sem rede: cada pergunta do
+corpus (`benchmarks/corpus_perguntas.py`) passa pela busca de contexto, pela geração de SQL com um
+LLM simulado determinístico, pela execução em `execute_sql_on_dfs` e pelo preparo e chamada da
+interpretação.
+
+Relata, para cada escala dos dados: vazão (perguntas/s), p50/p95 por etapa, pico de memória do
+processo e a correção dos resultados SQL contra gabaritos calculados no pandas. As escalas replicam
+`nx_org_group_classified_v2` (10x, 100x...) para revelar degradações antes da produção.
+
+Com --relatorio o resultado é gravado em JSON; com --comparar, um relatório anterior serve de
+linha de base e p95 acima de LIMIAR_REGRESSAO vezes o anterior é apontado como regressão.
+O processo termina com código 1 se houver respostas incorretas ou regressões.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_pipeline [--escalas 1 10 100] [--repeticoes 3]
+        [--embedding simulado|real] [--latencia-llm-ms 0] [--relatorio saida.json] [--comparar base.json]
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.corpus_perguntas import CORPUS, TABELA
+from benchmarks.simulacoes import EmbeddingSimulado, LLMSimulado
+from csv_query_engine import execute_sql_on_dfs, load_csv_data
+from geracao_sql import ler_resposta_sql, montar_mensagens_sql
+from interpretacao_resultados import preparar_interpretacao
+from populacao_rag import criar_documentos_por_coluna
+from recuperador_esquema import IndiceVetorial, RecuperadorEsquema, formatar_contexto
+from telemetria import Telemetria
+
+LIMIAR_REGRESSAO = 1.2
+# Latências abaixo deste valor oscilam demais para indicar regressão.
+P95_MINIMO_REGRESSAO_MS = 1.0
+CASAS_DECIMAIS = 6
+
+
+def escalar_dados(dataframes: dict, fator: int) -> dict:
+    """Replica a tabela principal `fator` vezes, com `forms_assessment_id` único em cada cópia."""
+    if fator <= 1:
+        return dataframes
+    original = dataframes[TABELA]
+    escalado = pd.concat([original] * fator, ignore_index=True)
+    copia = np.repeat(np.arange(fator), len(original)).astype(str)
+    escalado["forms_assessment_id"] = escalado["forms_assessment_id"].astype(str) + np.where(copia == "0", "", "-" + copia)
+    escalado.attrs = {"versao_dados": ("sintetico", fator, original.attrs.get("versao_dados"))}
+    return {**dataframes, TABELA: escalado}
+
+
+def _normalizar_valor(valor):
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)) or valor is pd.NA:
+        return None
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        return round(float(valor), CASAS_DECIMAIS)
+    return str(valor)
+
+
+def _linhas_normalizadas(df: pd.DataFrame):
+    linhas = [tuple(_normalizar_valor(v) for v in linha) for linha in df.itertuples(index=False, name=None)]
+    return sorted(linhas, key=repr)
+
+
+def comparar_resultado(obtido: pd.DataFrame, esperado: pd.DataFrame):
+    """Compara os valores linha a linha, sem considerar nomes de colunas nem a ordem das linhas."""
+    if obtido is None:
+        return False, "a consulta não retornou resultado"
+    if obtido.shape[1] != esperado.shape[1]:
+        return False, f"{obtido.shape[1]} colunas, esperado {esperado.shape[1]}"
+    linhas_obtidas, linhas_esperadas = _linhas_normalizadas(obtido), _linhas_normalizadas(esperado)
+    if linhas_obtidas != linhas_esperadas:
+        diferentes = len(set(linhas_obtidas) ^ set(linhas_esperadas))
+        return False, f"{len(linhas_obtidas)} linhas, esperado {len(linhas_esperadas)} ({diferentes} diferentes)"
+    return True, ""
+
+
+def _pico_memoria_mb() -> float:
+    # ru_maxrss é informado em KB no Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _registrar_tokens(registro, resposta):
+    uso = resposta.usage_metadata or {}
+    registro["tokens_prompt"] = uso.get("input_tokens", 0)
+    registro["tokens_resposta"] = uso.get("output_tokens", 0)
+
+
+def responder(pergunta, retriever, llm, executar_sql, telemetria):
+    """
+    O mesmo fluxo de `app.responder_pergunta`, sem Streamlit e sem o cache de respostas.
+    `executar_sql(query)` devolve `(result_df, message)`, como `execute_sql_on_dfs` e os backends.
+    """
+    with telemetria.pergunta(pergunta):
+        with telemetria.etapa("busca_contexto") as registro:
+            documentos = retriever.invoke(pergunta)
+            registro["documentos"] = len(documentos)
+
+        with telemetria.etapa("geracao_sql") as registro:
+            resposta = llm.invoke(montar_mensagens_sql(formatar_contexto(documentos), pergunta))
+            _registrar_tokens(registro, resposta)
+
+        with telemetria.etapa("leitura_json"):
+            sql_gerado, _ = ler_resposta_sql(resposta.content)
+
+        with telemetria.etapa("execucao_sql") as registro:
+            df_resultado, mensagem = executar_sql(sql_gerado)
+            if df_resultado is not None:
+                registro["custo_estimado"] = df_resultado.attrs.get("estatisticas_execucao", {}).get("custo_estimado", 0)
+                registro["linhas_retornadas"] = len(df_resultado)
+
+        if df_resultado is not None and not df_resultado.empty:
+            with telemetria.etapa("preparo_interpretacao") as registro:
+                mensagens, registro["modo"], _ = preparar_interpretacao(llm, pergunta, df_resultado)
+            with telemetria.etapa("interpretacao") as registro:
+                resposta = llm.invoke(mensagens)
+                _registrar_tokens(registro, resposta)
+    return df_resultado, mensagem
+
+
+def executar_escala(fator, dataframes_base, retriever, llm, repeticoes):
+    dataframes = escalar_dados(dataframes_base, fator)
+    gabaritos = [item["gabarito"](dataframes) for item in CORPUS]
+    telemetria = Telemetria()
+
+    # A primeira consulta copia a tabela para o motor residente; medida à parte, como carga.
+    inicio = time.perf_counter()
+    execute_sql_on_dfs(f"SELECT COUNT(*) FROM {TABELA}", dataframes)
+    carga_ms = (time.perf_counter() - inicio) * 1000
+
+    falhas = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for item, gabarito in zip(CORPUS, gabaritos):
+            df_resultado, mensagem = responder(
+                item["pergunta"], retriever, llm, lambda query: execute_sql_on_dfs(query, dataframes), telemetria
+            )
+            correto, motivo = comparar_resultado(df_resultado, gabarito)
+            if not correto:
+                falhas.append({"pergunta": item["pergunta"], "motivo": motivo or mensagem})
+    duracao_s = time.perf_counter() - inicio
+
+    total = repeticoes * len(CORPUS)
+    return {
+        "escala": fator,
+        "linhas": len(dataframes[TABELA]),
+        "perguntas": total,
+        "vazao_perguntas_s": round(total / duracao_s, 2),
+        "carga_motor_ms": round(carga_ms, 1),
+        "pico_memoria_mb": round(_pico_memoria_mb(), 1),
+        "corretas": total - len(falhas),
+        "falhas": falhas,
+        "etapas": telemetria.resumo_por_etapa().to_dict(orient="records"),
+    }
+
+
+def imprimir(resultado):
+    print(f"\n=== Escala {resultado['escala']}x ({resultado['linhas']:,} linhas) ===")
+    print(f"Vazão: {resultado['vazao_perguntas_s']} perguntas/s · carga do motor: {resultado['carga_motor_ms']} ms"
+          f" · pico de memória do processo: {resultado['pico_memoria_mb']} MB")
+    print(f"Corretas: {resultado['corretas']}/{resultado['perguntas']}")
+    for falha in resultado["falhas"]:
+        print(f"  FALHA: {falha['pergunta']} — {falha['motivo']}")
+    print(f"{'etapa':<24}{'chamadas':>10}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for etapa in resultado["etapas"]:
+        print(f"{etapa['etapa']:<24}{etapa['chamadas']:>10}{etapa['p50 (ms)']:>12.2f}{etapa['p95 (ms)']:>12.2f}")
+
+
+def encontrar_regressoes(resultados, linha_de_base):
+    anteriores = {
+        (r["escala"], e["etapa"]): e["p95 (ms)"] for r in linha_de_base["resultados"] for e in r["etapas"]
+    }
+    regressoes = []
+    for resultado in resultados:
+        for etapa in resultado["etapas"]:
+            anterior = anteriores.get((resultado["escala"], etapa["etapa"]))
+            if anterior and etapa["p95 (ms)"] >= P95_MINIMO_REGRESSAO_MS and etapa["p95 (ms)"] > anterior * LIMIAR_REGRESSAO:
+                regressoes.append(
+                    f"{resultado['escala']}x / {etapa['etapa']}: p95 {anterior:.2f} -> {etapa['p95 (ms)']:.2f} ms"
+                )
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--embedding", choices=["simulado", "real"], default="simulado")
+    parser.add_argument("--latencia-llm-ms", type=float, default=0.0, help="latência fixa simulada por chamada ao LLM")
+    parser.add_argument("--relatorio")
+    parser.add_argument("--comparar")
+    args = parser.parse_args()
+
+    dataframes, mensagem = load_csv_data(args.dados)
+    if dataframes is None:
+        raise SystemExit(mensagem)
+
+    if args.embedding == "real":
+        from modelo_embedding import obter_modelo_embedding
+        modelo_embedding = obter_modelo_embedding()
+    else:
+        modelo_embedding = EmbeddingSimulado()
+    retriever = RecuperadorEsquema(IndiceVetorial.construir(criar_documentos_por_coluna(), modelo_embedding), modelo_embedding)
+    llm = LLMSimulado(
+        {item["pergunta"]: json.dumps({"query": item["sql"], "descricao": "SQL do corpus."}, ensure_ascii=False) for item in CORPUS},
+        latencia_base_ms=args.latencia_llm_ms,
+    )
+
+    resultados = []
+    for fator in args.escalas:
+        resultados.append(executar_escala(fator, dataframes, retriever, llm, args.repeticoes))
+        imprimir(resultados[-1])
+
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump({"embedding": args.embedding, "resultados": resultados}, f, ensure_ascii=False, indent=2)
+
+    regressoes = []
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regressoes = encontrar_regressoes(resultados, json.load(f))
+        print(f"\nRegressões de p95 (> {LIMIAR_REGRESSAO:g}x a linha de base): {len(regressoes)}")
+        for regressao in regressoes:
+            print(f"  {regressao}")
+
+    if regressoes or any(r["falhas"] for r in resultados):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
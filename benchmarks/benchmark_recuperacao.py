@@ -0,0 +1,75 @@
+"""
+Benchmark da recuperação de contexto: tokens do contexto enviado ao LLM e latência da busca,
+comparando os esquemas inteiros (comportamento original, k=3 sobre dois documentos) com a
+recuperação por coluna do `RecuperadorEsquema`.
+
+Usa a base pré-construída por `python populacao_rag.py` (ou a constrói em um diretório temporário).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_recuperacao [--diretorio base_vetorial_esquema]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from interpretacao_resultados import estimar_tokens
+from modelo_embedding import obter_modelo_embedding
+from populacao_rag import (
+    base_de_conhecimento_atualizada, criar_base_de_conhecimento_rag, criar_documentos_de_conhecimento,
+    criar_documentos_por_coluna,
+)
+from recuperador_esquema import IndiceVetorial, RecuperadorEsquema, formatar_contexto
+
+PERGUNTAS = [
+    "Quantas avaliações existem em cada UF?",
+    "Quantos formulários do tipo RAT existem em cada unidade organizacional no estado de São Paulo?",
+    "Quais atividades têm risco residual alto?",
+    "Quantas avaliações foram concluídas em 2024 por mês?",
+    "Qual a média de dias trabalhados por unidade organizacional?",
+    "Quantas perguntas com pontuação de risco existem por tema?",
+    "Quais avaliações estão em revisão na Unidade Nacional?",
+    "Liste os inventários de dados relacionados à folha de pagamento.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--diretorio")
+    args = parser.parse_args()
+
+    documentos = criar_documentos_por_coluna()
+    diretorio = args.diretorio or tempfile.mkdtemp(prefix="bench_recuperacao_")
+    if not base_de_conhecimento_atualizada(documentos, diretorio):
+        criar_base_de_conhecimento_rag(documentos, nome_diretorio_db=diretorio)
+
+    modelo = obter_modelo_embedding()
+    retriever = RecuperadorEsquema(IndiceVetorial.carregar(diretorio), modelo)
+    retriever.invoke("aquecimento")
+
+    # Antes: os dois esquemas completos iam para todo prompt.
+    contexto_original = "".join(
+        f"---\nFonte: {doc.metadata.get('fonte', 'desconhecida')}\nConteúdo:\n{doc.page_content}\n"
+        for doc in criar_documentos_de_conhecimento()
+    )
+    tokens_originais = estimar_tokens(contexto_original)
+
+    print(f"{'pergunta':<70}{'tokens antes':>14}{'tokens depois':>15}{'busca (ms)':>12}")
+    latencias, tokens_novos = [], []
+    for pergunta in PERGUNTAS:
+        inicio = time.perf_counter()
+        contexto = formatar_contexto(retriever.invoke(pergunta))
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        tokens_novos.append(estimar_tokens(contexto))
+        print(f"{pergunta[:68]:<70}{tokens_originais:>14}{tokens_novos[-1]:>15}{latencias[-1]:>12.1f}")
+
+    inicio = time.perf_counter()
+    retriever.invoke_lote(PERGUNTAS)
+    lote_ms = (time.perf_counter() - inicio) * 1000
+    print(f"\nTokens de contexto: {tokens_originais} -> mediana {statistics.median(tokens_novos):.0f}")
+    print(f"Latência da busca: mediana {statistics.median(latencias):.1f} ms por pergunta; "
+          f"lote de {len(PERGUNTAS)} perguntas em {lote_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
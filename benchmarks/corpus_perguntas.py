@@ -0,0 +1,107 @@
+"""
+Corpus de perguntas do benchmark do pipeline: para cada pergunta, o SQL que o LLM simulado devolve
+e o gabarito calculado diretamente no pandas, independente do motor SQL.
+
+Os gabaritos recebem o dicionário de DataFrames (já escalado) e devolvem um DataFrame com as
+mesmas colunas, na mesma ordem, do resultado esperado do SQL; a comparação ignora a ordem das linhas.
+"""
+import pandas as pd
+
+TABELA = "nx_org_group_classified_v2"
+
+
+def _contagem(df, colunas):
+    return df.groupby(colunas, dropna=False, observed=True).size().reset_index(name="total")
+
+
+def _escalar(valor):
+    return pd.DataFrame({"total": [valor]})
+
+
+CORPUS = [
+    {
+        "pergunta": "Quantas avaliações existem em cada Unidade do Sebrae (UF)?",
+        "sql": f"SELECT forms_uf, COUNT(*) AS total FROM {TABELA} GROUP BY forms_uf ORDER BY total DESC",
+        "gabarito": lambda d: _contagem(d[TABELA], ["forms_uf"]),
+    },
+    {
+        "pergunta": "Quantas avaliações existem por unidade organizacional?",
+        "sql": f"SELECT forms_org_grupo_name, COUNT(*) AS total FROM {TABELA} GROUP BY forms_org_grupo_name",
+        "gabarito": lambda d: _contagem(d[TABELA], ["forms_org_grupo_name"]),
+    },
+    {
+        "pergunta": "Quantos formulários são RAT e quantos são ROPA?",
+        "sql": f"SELECT flag_ropa_rat, COUNT(*) AS total FROM {TABELA} GROUP BY flag_ropa_rat",
+        "gabarito": lambda d: _contagem(d[TABELA], ["flag_ropa_rat"]),
+    },
+    {
+        "pergunta": "Quantos formulários do tipo RAT existem em cada unidade organizacional no estado de São Paulo?",
+        "sql": f"SELECT forms_org_grupo_name, COUNT(*) AS total FROM {TABELA} "
+               "WHERE LOWER(flag_ropa_rat) LIKE LOWER('%rat%') AND LOWER(forms_uf) LIKE LOWER('%sp%') "
+               "GROUP BY forms_org_grupo_name",
+        "gabarito": lambda d: _contagem(
+            d[TABELA][(d[TABELA]["flag_ropa_rat"] == "RAT") & (d[TABELA]["forms_uf"] == "SP")], ["forms_org_grupo_name"]
+        ),
+    },
+    {
+        "pergunta": "Quantas avaliações estão concluídas?",
+        "sql": f"SELECT COUNT(*) AS total FROM {TABELA} WHERE forms_status = 'COMPLETED'",
+        "gabarito": lambda d: _escalar(int((d[TABELA]["forms_status"] == "COMPLETED").sum())),
+    },
+    {
+        "pergunta": "Quantas avaliações existem por status?",
+        "sql": f"SELECT forms_status, COUNT(*) AS total FROM {TABELA} GROUP BY forms_status",
+        "gabarito": lambda d: _contagem(d[TABELA], ["forms_status"]),
+    },
+    {
+        "pergunta": "Quantas avaliações existem por tipo de formulário?",
+        "sql": f"SELECT forms_template_name, COUNT(*) AS total FROM {TABELA} GROUP BY forms_template_name",
+        "gabarito": lambda d: _contagem(d[TABELA], ["forms_template_name"]),
+    },
+    {
+        "pergunta": "Quantas avaliações existem por nível de risco residual?",
+        "sql": f"SELECT assessment_risk_level_name, COUNT(*) AS total FROM {TABELA} GROUP BY assessment_risk_level_name",
+        "gabarito": lambda d: _contagem(d[TABELA], ["assessment_risk_level_name"]),
+    },
+    {
+        "pergunta": "Em cada UF, quantas avaliações tiveram o risco residual menor que o inerente?",
+        "sql": f"SELECT forms_uf, COUNT(*) AS total FROM {TABELA} "
+               "WHERE LOWER(mitigacao_risco) LIKE LOWER('%residual menor%') GROUP BY forms_uf",
+        "gabarito": lambda d: _contagem(
+            d[TABELA][d[TABELA]["mitigacao_risco"] == "Risco residual menor que inerente"], ["forms_uf"]
+        ),
+    },
+    {
+        "pergunta": "Quantas avaliações foram finalizadas em cada ano e mês?",
+        "sql": f"SELECT end_date_year, end_date_month, COUNT(*) AS total FROM {TABELA} "
+               "GROUP BY end_date_year, end_date_month ORDER BY end_date_year, end_date_month",
+        "gabarito": lambda d: _contagem(d[TABELA], ["end_date_year", "end_date_month"]),
+    },
+    {
+        "pergunta": "Quantas avaliações com risco residual muito alto existem em cada UF em 2024?",
+        "sql": f"SELECT forms_uf, COUNT(*) AS total FROM {TABELA} "
+               "WHERE assessment_risk_level_name = 'VERY_HIGH' AND end_date_year = 2024 GROUP BY forms_uf",
+        "gabarito": lambda d: _contagem(
+            d[TABELA][(d[TABELA]["assessment_risk_level_name"] == "VERY_HIGH") & (d[TABELA]["end_date_year"] == 2024)],
+            ["forms_uf"],
+        ),
+    },
+    {
+        "pergunta": "Qual a média de dias trabalhados por status da avaliação?",
+        "sql": f"SELECT forms_status, AVG(worked_days) AS media_dias FROM {TABELA} GROUP BY forms_status",
+        "gabarito": lambda d: d[TABELA].groupby("forms_status", observed=True)["worked_days"].mean().reset_index(),
+    },
+    {
+        "pergunta": "Quantas avaliações mencionam folha de pagamento no nome?",
+        "sql": f"SELECT COUNT(*) AS total FROM {TABELA} WHERE LOWER(forms_name) LIKE LOWER('%folha de pagamento%')",
+        "gabarito": lambda d: _escalar(int(
+            d[TABELA]["forms_name"].str.lower().str.contains("folha de pagamento", regex=False, na=False).sum()
+        )),
+    },
+    {
+        "pergunta": "Quantas avaliações do Ceará existem por categoria de processo?",
+        "sql": f"SELECT hybrid_category, COUNT(*) AS total FROM {TABELA} "
+               "WHERE LOWER(forms_uf) LIKE LOWER('%ce%') GROUP BY hybrid_category",
+        "gabarito": lambda d: _contagem(d[TABELA][d[TABELA]["forms_uf"] == "CE"], ["hybrid_category"]),
+    },
+]
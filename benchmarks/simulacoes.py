@@ -0,0 +1,97 @@
+"""
+Substitutos determinísticos do LLM e do modelo de embedding para rodar o pipeline sem rede,
+sem GPU e sem o download dos pesos, com resultados reprodutíveis entre execuções.
+"""
+import asyncio
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from geracao_sql import PROMPT_SISTEMA
+from indice_texto import normalizar_texto
+from interpretacao_resultados import estimar_tokens
+
+MARCADOR_PERGUNTA = "Pergunta do Usuário:\n"
+RESPOSTA_ERRO = '{"query": "ERRO: Impossível gerar a consulta.", "descricao": "Pergunta fora do corpus simulado."}'
+TAMANHO_TRECHO = 16
+DIMENSAO_EMBEDDING = 256
+
+
+class LLMSimulado:
+    """
+    Imita `ChatTogether` (`invoke`, `batch` e `stream`) respondendo por tabela:
+
+    - na geração de SQL (mensagem de sistema igual a `PROMPT_SISTEMA`), devolve o JSON com o SQL
+      cadastrado em `respostas_sql` para a pergunta;
+    - nas chamadas de interpretação, devolve uma frase fixa com o tamanho do prompt.
+
+    A latência simulada é `latencia_base_ms + ms_por_token * tokens` (tokens do prompt e da resposta),
+    e o uso de tokens vem em `usage_metadata`, como nos provedores reais. `astream` espera com
+    `asyncio.sleep`, como um cliente HTTP assíncrono, sem bloquear o event loop.
+    """
+
+    def __init__(self, respostas_sql: dict, latencia_base_ms: float = 0.0, ms_por_token: float = 0.0):
+        self.respostas_sql = {pergunta.strip(): resposta for pergunta, resposta in respostas_sql.items()}
+        self.latencia_base_ms = latencia_base_ms
+        self.ms_por_token = ms_por_token
+
+    def _gerar(self, mensagens):
+        sistema, humana = mensagens[0].content, mensagens[-1].content
+        if sistema == PROMPT_SISTEMA:
+            pergunta = humana.rsplit(MARCADOR_PERGUNTA, 1)[-1].strip()
+            texto = self.respostas_sql.get(pergunta, RESPOSTA_ERRO)
+        else:
+            texto = f"Resposta simulada com base em um prompt de {len(humana)} caracteres."
+        uso = {
+            "input_tokens": sum(estimar_tokens(m.content) for m in mensagens),
+            "output_tokens": estimar_tokens(texto),
+        }
+        uso["total_tokens"] = uso["input_tokens"] + uso["output_tokens"]
+        atraso_s = (self.latencia_base_ms + self.ms_por_token * uso["total_tokens"]) / 1000
+        return texto, uso, atraso_s
+
+    @staticmethod
+    def _trechos(texto, uso):
+        for inicio in range(0, len(texto), TAMANHO_TRECHO):
+            yield AIMessageChunk(content=texto[inicio:inicio + TAMANHO_TRECHO])
+        yield AIMessageChunk(content="", usage_metadata=uso)
+
+    def invoke(self, mensagens):
+        texto, uso, atraso_s = self._gerar(mensagens)
+        time.sleep(atraso_s)
+        return AIMessage(content=texto, usage_metadata=uso)
+
+    def batch(self, lista_mensagens):
+        with ThreadPoolExecutor(max_workers=max(1, len(lista_mensagens))) as executor:
+            return list(executor.map(self.invoke, lista_mensagens))
+
+    def stream(self, mensagens):
+        texto, uso, atraso_s = self._gerar(mensagens)
+        time.sleep(atraso_s)
+        yield from self._trechos(texto, uso)
+
+    async def astream(self, mensagens):
+        texto, uso, atraso_s = self._gerar(mensagens)
+        await asyncio.sleep(atraso_s)
+        for trecho in self._trechos(texto, uso):
+            yield trecho
+
+
+class EmbeddingSimulado:
+    """
+    Embedding por hashing de palavras (sem acentos, em minúsculas) em DIMENSAO_EMBEDDING posições.
+    Mantém a interface `embed_documents`/`embed_query` do `HuggingFaceEmbeddings`.
+    """
+
+    def embed_documents(self, textos):
+        matriz = np.zeros((len(textos), DIMENSAO_EMBEDDING), dtype=np.float32)
+        for linha, texto in enumerate(textos):
+            for palavra in normalizar_texto(texto).split():
+                matriz[linha, zlib.crc32(palavra.encode()) % DIMENSAO_EMBEDDING] += 1.0
+        return matriz.tolist()
+
+    def embed_query(self, texto):
+        return self.embed_documents([texto])[0]
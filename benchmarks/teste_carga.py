@@ -0,0 +1,123 @@
+"""
+Teste de carga do servidor concorrente: várias sessões simultâneas fazendo perguntas do corpus
+através do `PoolLLM` (LLM simulado com latência de rede) e do backend de consultas, em processo
+(`BackendCSVLocal`) ou em um pool de processos (`BackendCSVProcessos`, com --processos).
+
+Para cada nível de concorrência relata a vazão (respostas/s), p50/p95 da latência ponta a ponta,
+pedidos recusados pela fila e pedidos ao LLM coalescidos com uma chamada idêntica em andamento.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.teste_carga [--concorrencias 1 2 4 8 16 32] [--perguntas-por-sessao 5]
+        [--processos 0] [--max-llm 4] [--max-fila 32] [--latencia-llm-ms 300]
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+from backends_consulta import BackendCSVLocal, BackendCSVProcessos
+from benchmarks.benchmark_pipeline import responder
+from benchmarks.corpus_perguntas import CORPUS
+from benchmarks.simulacoes import EmbeddingSimulado, LLMSimulado
+from populacao_rag import criar_documentos_por_coluna
+from pool_llm import FilaCheia, PoolLLM
+from recuperador_esquema import IndiceVetorial, RecuperadorEsquema
+from telemetria import Telemetria
+
+SEMENTE = 42
+
+
+def executar_nivel(concorrencia, perguntas_por_sessao, retriever, llm_simulado, backend, max_llm, max_fila):
+    pool = PoolLLM(llm_simulado, max_concorrentes=max_llm, max_fila=max_fila)
+    telemetria = Telemetria()
+    latencias = []
+    recusadas = []
+    lock = threading.Lock()
+
+    def sessao(numero):
+        sorteio = random.Random(SEMENTE + numero)
+        for _ in range(perguntas_por_sessao):
+            item = sorteio.choice(CORPUS)
+            inicio = time.perf_counter()
+            try:
+                df_resultado, mensagem = responder(item["pergunta"], retriever, pool, backend.executar, telemetria)
+                recusada = df_resultado is None and mensagem.startswith("Consulta rejeitada")
+            except FilaCheia:
+                recusada = True
+            with lock:
+                (recusadas if recusada else latencias).append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    sessoes = [threading.Thread(target=sessao, args=(numero,)) for numero in range(concorrencia)]
+    for thread in sessoes:
+        thread.start()
+    for thread in sessoes:
+        thread.join()
+    duracao_s = time.perf_counter() - inicio
+    estado = pool.estado()
+    pool.fechar()
+
+    p50, p95 = np.percentile(latencias, [50, 95]) if latencias else (float("nan"), float("nan"))
+    return {
+        "concorrencia": concorrencia,
+        "respondidas": len(latencias),
+        "recusadas": len(recusadas),
+        "vazao_respostas_s": round(len(latencias) / duracao_s, 2),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "chamadas_llm": estado["chamadas"],
+        "coalescidas": estado["coalescidos"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dados", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dados"))
+    parser.add_argument("--concorrencias", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--perguntas-por-sessao", type=int, default=5)
+    parser.add_argument("--processos", type=int, default=0, help="processos para o SQL (0 = no próprio processo)")
+    parser.add_argument("--max-llm", type=int, default=4)
+    parser.add_argument("--max-fila", type=int, default=32)
+    parser.add_argument("--latencia-llm-ms", type=float, default=300.0)
+    parser.add_argument("--relatorio")
+    args = parser.parse_args()
+
+    backend = BackendCSVProcessos(args.dados, args.processos) if args.processos > 0 else BackendCSVLocal(args.dados)
+    pronto, mensagem = backend.preparar()
+    if not pronto:
+        raise SystemExit(mensagem)
+    # Aquece o motor (ou os processos) antes da medição.
+    for _ in range(max(1, args.processos)):
+        backend.executar(CORPUS[0]["sql"])
+
+    modelo_embedding = EmbeddingSimulado()
+    retriever = RecuperadorEsquema(IndiceVetorial.construir(criar_documentos_por_coluna(), modelo_embedding), modelo_embedding)
+    llm_simulado = LLMSimulado(
+        {item["pergunta"]: json.dumps({"query": item["sql"], "descricao": "SQL do corpus."}, ensure_ascii=False) for item in CORPUS},
+        latencia_base_ms=args.latencia_llm_ms,
+    )
+
+    print(f"\nSQL: {'%d processos' % args.processos if args.processos else 'no próprio processo'} · "
+          f"LLM: {args.max_llm} chamadas simultâneas, fila de {args.max_fila}, {args.latencia_llm_ms:g} ms por chamada\n")
+    print(f"{'sessões':>8}{'respondidas':>13}{'recusadas':>11}{'vazão (resp/s)':>16}{'p50 (ms)':>11}"
+          f"{'p95 (ms)':>11}{'chamadas LLM':>14}{'coalescidas':>13}")
+    resultados = []
+    for concorrencia in args.concorrencias:
+        r = executar_nivel(concorrencia, args.perguntas_por_sessao, retriever, llm_simulado, backend, args.max_llm, args.max_fila)
+        resultados.append(r)
+        print(f"{r['concorrencia']:>8}{r['respondidas']:>13}{r['recusadas']:>11}{r['vazao_respostas_s']:>16}"
+              f"{r['p50_ms']:>11}{r['p95_ms']:>11}{r['chamadas_llm']:>14}{r['coalescidas']:>13}")
+
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    if isinstance(backend, BackendCSVProcessos):
+        backend.fechar()
+
+
+if __name__ == "__main__":
+    main()
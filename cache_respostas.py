@@ -0,0 +1,272 @@
+import hashlib
+import io
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# --- Configuração padrão do cache ---
+TTL_PADRAO_SEGUNDOS = 7 * 24 * 3600
+MAX_ENTRADAS_POR_NIVEL = 1000
+# Similaridade de cosseno mínima para considerar duas perguntas como quase idênticas.
+LIMIAR_SIMILARIDADE = 0.95
+# Versão dos embeddings gravados; ao mudar (ex.: prefixo "query: " do E5), os antigos são descartados.
+VERSAO_EMBEDDINGS = 1
+# Literais que precisam coincidir para que a busca semântica aceite outra pergunta: textos entre
+# aspas e números (anos, quantidades...). "em 2023" e "em 2024" ficam quase idênticas no embedding.
+_RE_LITERAL = re.compile(r'"([^"]*)"|\'([^\']*)\'|“([^”]*)”|‘([^’]*)’|(\d+(?:[.,]\d+)*)')
+# As demais palavras também precisam coincidir, exceto artigos, preposições e conjunções: "em SP" e
+# "em RJ", ou "risco alto" e "risco baixo", também ficam quase idênticas no embedding. Palavras
+# interrogativas e "nao" ficam de fora desta lista porque mudam o SQL ("quantos" x "quais").
+_PALAVRAS_VAZIAS = frozenset(
+    "a o as os um uma uns umas de do da dos das em no na nos nas num numa ao aos "
+    "por pelo pela pelos pelas para pra com e ou que se".split()
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS perguntas (
+    chave TEXT PRIMARY KEY,
+    pergunta TEXT NOT NULL,
+    embedding BLOB,
+    sql TEXT NOT NULL,
+    descricao TEXT,
+    versao_dados TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    acessado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    chave TEXT PRIMARY KEY,
+    dados BLOB NOT NULL,
+    versao_dados TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    acessado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS interpretacoes (
+    chave TEXT PRIMARY KEY,
+    resposta TEXT NOT NULL,
+    versao_dados TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    acessado_em REAL NOT NULL
+);
+"""
+_NIVEIS = ("perguntas", "resultados", "interpretacoes")
+
+
+def normalizar_pergunta(pergunta: str) -> str:
+    """Minúsculas, sem acentos, sem pontuação final e com espaços colapsados."""
+    texto = unicodedata.normalize("NFKD", pergunta.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return texto.rstrip("?!. ")
+
+
+def extrair_literais(pergunta_normalizada: str) -> list:
+    """Textos entre aspas e números da pergunta normalizada, ordenados."""
+    return sorted(
+        next(grupo for grupo in match.groups() if grupo is not None).strip()
+        for match in _RE_LITERAL.finditer(pergunta_normalizada)
+    )
+
+
+def extrair_termos(pergunta_normalizada: str) -> list:
+    """Palavras da pergunta normalizada, sem repetições nem `_PALAVRAS_VAZIAS`, ordenadas."""
+    return sorted(set(re.findall(r"\w+", pergunta_normalizada)) - _PALAVRAS_VAZIAS)
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """Hash estável do conteúdo (colunas e valores) de um DataFrame."""
+    sha = hashlib.sha256("|".join(map(str, df.columns)).encode())
+    sha.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return sha.hexdigest()
+
+
+def _sha(*partes: str) -> str:
+    return hashlib.sha256("\x1f".join(partes).encode()).hexdigest()
+
+
+class CacheRespostas:
+    """
+    Cache em disco, em três níveis, para o pipeline texto-para-SQL:
+
+    1. pergunta normalizada -> SQL gerado e descrição (com busca semântica opcional
+       por perguntas quase idênticas usando os embeddings do modelo do RAG);
+    2. texto do SQL + versão dos dados -> DataFrame resultante (em Parquet);
+    3. pergunta normalizada + hash do resultado -> resposta interpretada.
+
+    As entradas expiram por TTL, cada nível é limitado a `max_entradas` (LRU) e todas as
+    entradas de uma versão antiga dos dados são descartadas em `definir_versao_dados`.
+    """
+
+    def __init__(self, caminho_db: str, funcao_embedding=None,
+                 ttl_segundos: int = TTL_PADRAO_SEGUNDOS,
+                 max_entradas: int = MAX_ENTRADAS_POR_NIVEL,
+                 limiar_similaridade: float = LIMIAR_SIMILARIDADE):
+        self._conexao = sqlite3.connect(caminho_db, check_same_thread=False)
+        self._conexao.executescript(_ESQUEMA)
+        if self._conexao.execute("PRAGMA user_version").fetchone()[0] < VERSAO_EMBEDDINGS:
+            with self._conexao:
+                self._conexao.execute("UPDATE perguntas SET embedding = NULL")
+                self._conexao.execute(f"PRAGMA user_version = {VERSAO_EMBEDDINGS}")
+        self._lock = threading.Lock()
+        self._funcao_embedding = funcao_embedding
+        self._embeddings_recentes = {}
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.limiar_similaridade = limiar_similaridade
+        self.versao_dados = ""
+
+    # --- Manutenção ---
+    def definir_versao_dados(self, versao_dados: str):
+        """Registra a versão atual dos CSVs e remove entradas de outras versões ou expiradas."""
+        if versao_dados == self.versao_dados:
+            return
+        with self._lock, self._conexao:
+            limite = time.time() - self.ttl_segundos
+            for nivel in _NIVEIS:
+                self._conexao.execute(
+                    f"DELETE FROM {nivel} WHERE versao_dados != ? OR criado_em < ?", (versao_dados, limite)
+                )
+        self.versao_dados = versao_dados
+
+    def limpar(self):
+        with self._lock, self._conexao:
+            for nivel in _NIVEIS:
+                self._conexao.execute(f"DELETE FROM {nivel}")
+
+    def _buscar(self, nivel: str, colunas: str, chave: str):
+        limite = time.time() - self.ttl_segundos
+        linha = self._conexao.execute(
+            f"SELECT {colunas} FROM {nivel} WHERE chave = ? AND versao_dados = ? AND criado_em >= ?",
+            (chave, self.versao_dados, limite),
+        ).fetchone()
+        if linha is not None:
+            with self._conexao:
+                self._conexao.execute(f"UPDATE {nivel} SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+        return linha
+
+    def _gravar(self, nivel: str, valores: dict):
+        agora = time.time()
+        valores = {**valores, "versao_dados": self.versao_dados, "criado_em": agora, "acessado_em": agora}
+        colunas = ", ".join(valores)
+        marcadores = ", ".join("?" for _ in valores)
+        with self._conexao:
+            self._conexao.execute(
+                f"INSERT OR REPLACE INTO {nivel} ({colunas}) VALUES ({marcadores})", tuple(valores.values())
+            )
+            # Despejo LRU: mantém apenas as `max_entradas` acessadas mais recentemente.
+            self._conexao.execute(
+                f"DELETE FROM {nivel} WHERE chave NOT IN "
+                f"(SELECT chave FROM {nivel} ORDER BY acessado_em DESC LIMIT ?)",
+                (self.max_entradas,),
+            )
+
+    def _embedding(self, pergunta_normalizada: str):
+        if self._funcao_embedding is None:
+            return None
+        if pergunta_normalizada not in self._embeddings_recentes:
+            vetor = np.asarray(self._funcao_embedding(pergunta_normalizada), dtype=np.float32)
+            vetor /= np.linalg.norm(vetor) or 1.0
+            if len(self._embeddings_recentes) >= 64:
+                self._embeddings_recentes.clear()
+            self._embeddings_recentes[pergunta_normalizada] = vetor
+        return self._embeddings_recentes[pergunta_normalizada]
+
+    # --- Nível 1: pergunta -> SQL ---
+    def buscar_sql(self, pergunta: str):
+        """
+        Procura o SQL já gerado para a pergunta: primeiro por igualdade da pergunta normalizada,
+        depois por similaridade de embeddings. Na busca semântica, só valem perguntas com os mesmos
+        literais (`extrair_literais`) e as mesmas palavras (`extrair_termos`); a similaridade tolera
+        apenas ordem, pontuação, acentos e palavras vazias. As demais seguem para a geração.
+
+        Returns:
+            Um dicionário com 'sql', 'descricao', 'tipo' ('exata' ou 'semantica') e 'similaridade',
+            ou None se não houver entrada válida.
+        """
+        normalizada = normalizar_pergunta(pergunta)
+        with self._lock:
+            linha = self._buscar("perguntas", "sql, descricao", _sha(normalizada))
+            if linha is not None:
+                return {"sql": linha[0], "descricao": linha[1], "tipo": "exata", "similaridade": 1.0}
+
+            vetor = self._embedding(normalizada)
+            if vetor is None:
+                return None
+            limite = time.time() - self.ttl_segundos
+            linhas = self._conexao.execute(
+                "SELECT chave, embedding, sql, descricao, pergunta FROM perguntas "
+                "WHERE embedding IS NOT NULL AND versao_dados = ? AND criado_em >= ?",
+                (self.versao_dados, limite),
+            ).fetchall()
+            if not linhas:
+                return None
+            matriz = np.vstack([np.frombuffer(l[1], dtype=np.float32) for l in linhas])
+            similaridades = matriz @ vetor
+            literais, termos = extrair_literais(normalizada), extrair_termos(normalizada)
+            candidatas = [
+                i for i in np.argsort(-similaridades)
+                if similaridades[i] >= self.limiar_similaridade
+                and extrair_literais(linhas[i][4]) == literais and extrair_termos(linhas[i][4]) == termos
+            ]
+            if not candidatas:
+                return None
+            melhor = int(candidatas[0])
+            with self._conexao:
+                self._conexao.execute(
+                    "UPDATE perguntas SET acessado_em = ? WHERE chave = ?", (time.time(), linhas[melhor][0])
+                )
+            return {
+                "sql": linhas[melhor][2],
+                "descricao": linhas[melhor][3],
+                "tipo": "semantica",
+                "similaridade": float(similaridades[melhor]),
+            }
+
+    def salvar_sql(self, pergunta: str, sql: str, descricao: str):
+        normalizada = normalizar_pergunta(pergunta)
+        with self._lock:
+            vetor = self._embedding(normalizada)
+            self._gravar("perguntas", {
+                "chave": _sha(normalizada),
+                "pergunta": normalizada,
+                "embedding": vetor.tobytes() if vetor is not None else None,
+                "sql": sql,
+                "descricao": descricao,
+            })
+
+    # --- Nível 2: SQL -> resultado ---
+    def buscar_resultado(self, sql: str):
+        with self._lock:
+            linha = self._buscar("resultados", "dados", _sha(sql.strip(), self.versao_dados))
+        if linha is None:
+            return None
+        try:
+            return pd.read_parquet(io.BytesIO(linha[0]))
+        except Exception:
+            return None  # Entrada corrompida ou gravada em outro formato: vale como ausente.
+
+    def salvar_resultado(self, sql: str, df: pd.DataFrame):
+        """Grava o resultado em Parquet, como o cache das tabelas; resultados que o Arrow não representa não são guardados."""
+        buffer = io.BytesIO()
+        try:
+            df.to_parquet(buffer, index=False)
+        except (ValueError, TypeError):
+            return
+        with self._lock:
+            self._gravar("resultados", {"chave": _sha(sql.strip(), self.versao_dados), "dados": buffer.getvalue()})
+
+    # --- Nível 3: resultado -> resposta interpretada ---
+    def buscar_interpretacao(self, pergunta: str, df: pd.DataFrame):
+        chave = _sha(normalizar_pergunta(pergunta), hash_dataframe(df))
+        with self._lock:
+            linha = self._buscar("interpretacoes", "resposta", chave)
+        return linha[0] if linha is not None else None
+
+    def salvar_interpretacao(self, pergunta: str, df: pd.DataFrame, resposta: str):
+        chave = _sha(normalizar_pergunta(pergunta), hash_dataframe(df))
+        with self._lock:
+            self._gravar("interpretacoes", {"chave": chave, "resposta": resposta})
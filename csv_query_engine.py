@@ -1,14 +1,166 @@
+import hashlib
+import json
 import os
+import sqlite3
+import sys
+import threading
+import time
+import warnings
+import weakref
 import pandas as pd
-from pandasql import sqldf
 
-def load_csv_data(folder_path: str):
+from cubos_agregados import criar_cubo
+from guardrails_sql import (
+    LIMITE_CUSTO_PADRAO, LIMITE_LINHAS_PADRAO, LIMITE_MEMORIA_PADRAO_MB, PASSOS_VERIFICACAO,
+    TIMEOUT_PADRAO_SEGUNDOS, ConsultaInterrompida, ConsultaRejeitada, ControleExecucao,
+    aplicar_limite, estimar_custo, validar_sql, verificar_custo,
+)
+from indice_texto import criar_indice_texto, reescrever_buscas_texto, remover_indice_texto
+
+# --- Esquema de ingestão ---
+# Colunas conhecidas das exportações do OneTrust. As listas valem para qualquer tabela:
+# colunas ausentes em um CSV são simplesmente ignoradas.
+COLUNAS_DATA = [
+    "forms_create_dt", "forms_updated_dt", "deadline", "end_date",
+    "last_updated", "submitted_on", "completed_on", "data_de_criacao",
+]
+COLUNAS_NUMERICAS = [
+    "forms_number", "primary_record_number", "forms_template_version",
+    "risco_inerente_numerico", "risco_residual_numerico",
+    "section_questions_risk_score", "worked_days",
+    "end_date_year", "end_date_month", "end_date_day",
+]
+COLUNAS_CATEGORICAS = [
+    "forms_status", "forms_template_name", "flag_ropa_rat", "forms_uf",
+    "forms_org_grupo_name", "description_org", "stage_name", "hybrid_category",
+    "assessment_risk_level_name", "inherent_risk_level_name", "tratamento_risco",
+    "mitigacao_risco", "inventory_processing_activities_status",
+    "tema_name", "subtema_name", "topico_name", "section_questions_risk_level",
+    "section_questions_risk_probability", "section_questions_risk_impact_level",
+]
+# Demais colunas de texto viram categóricas quando a proporção de valores distintos é baixa.
+LIMITE_CARDINALIDADE_CATEGORICA = 0.5
+
+NOME_PASTA_CACHE = ".cache"
+VERSAO_CACHE = 2
+
+
+def _converter_datas(serie: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        convertida = pd.to_datetime(serie, errors="coerce", format="ISO8601")
+    if convertida.dtype == object:
+        # Offsets diferentes na mesma coluna: normalizamos para UTC.
+        convertida = pd.to_datetime(serie, errors="coerce", format="ISO8601", utc=True)
+    return convertida
+
+
+def aplicar_esquema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as colunas de um DataFrame recém-lido para tipos compactos:
+    datas como datetime64, colunas numéricas com downcast e textos repetitivos como category.
+    """
+    for coluna in df.columns:
+        serie = df[coluna]
+        if coluna in COLUNAS_DATA:
+            df[coluna] = _converter_datas(serie)
+        elif coluna in COLUNAS_NUMERICAS:
+            numerica = pd.to_numeric(serie, errors="coerce")
+            if numerica.notna().sum() == serie.notna().sum():
+                downcast = "integer" if numerica.notna().all() and (numerica % 1 == 0).all() else "float"
+                df[coluna] = pd.to_numeric(numerica, downcast=downcast)
+        elif serie.dtype == object:
+            if coluna in COLUNAS_CATEGORICAS or (
+                len(serie) and serie.nunique() / len(serie) <= LIMITE_CARDINALIDADE_CATEGORICA
+            ):
+                df[coluna] = serie.astype("category")
+    return df
+
+
+def _assinatura_arquivo(file_path: str):
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _hash_arquivo(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _carregar_tabela(file_path: str, pasta_cache: str):
+    """
+    Carrega um CSV usando o cache em Parquet quando ele ainda corresponde ao arquivo. O Parquet
+    preserva os tipos de `aplicar_esquema` (categóricas, datas com fuso, inteiros reduzidos).
+
+    O cache é considerado válido se o mtime/tamanho do CSV forem os mesmos; se apenas o mtime
+    mudou mas o conteúdo (sha256) é idêntico, o cache é reaproveitado e os metadados atualizados.
+
+    Returns:
+        Uma tupla (DataFrame, origem), onde origem é 'cache' ou 'csv'.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    caminho_cache = os.path.join(pasta_cache, f"{table_name}.parquet")
+    caminho_meta = os.path.join(pasta_cache, f"{table_name}.json")
+    assinatura = _assinatura_arquivo(file_path)
+
+    meta = None
+    if os.path.exists(caminho_cache) and os.path.exists(caminho_meta):
+        try:
+            with open(caminho_meta, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+
+    if meta and meta.get("versao_cache") == VERSAO_CACHE:
+        valido = tuple(meta.get("assinatura", ())) == assinatura
+        if not valido and meta.get("sha256") == _hash_arquivo(file_path):
+            valido = True
+            meta["assinatura"] = list(assinatura)
+            _gravar_json(caminho_meta, meta)
+        if valido:
+            try:
+                return pd.read_parquet(caminho_cache), "cache"
+            except Exception:
+                pass  # Cache corrompido: recarregamos a partir do CSV.
+
+    df = aplicar_esquema(pd.read_csv(file_path, sep=';'))
+    try:
+        os.makedirs(pasta_cache, exist_ok=True)
+        df.to_parquet(caminho_cache, index=False)
+        _gravar_json(caminho_meta, {
+            "versao_cache": VERSAO_CACHE,
+            "assinatura": list(assinatura),
+            "sha256": _hash_arquivo(file_path),
+        })
+    except (OSError, ValueError, TypeError):
+        # O cache é apenas uma otimização: pastas somente leitura ou colunas que o Arrow não
+        # consegue representar não impedem a carga.
+        pass
+    return df, "csv"
+
+
+def _gravar_json(caminho: str, conteudo: dict):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(conteudo, f)
+
+
+def load_csv_data(folder_path: str, usar_cache: bool = True):
     """
     Carrega todos os arquivos .csv de uma pasta específica em um dicionário de DataFrames.
     As chaves do dicionário são os nomes dos arquivos sem a extensão .csv.
 
+    As colunas são tipadas por `aplicar_esquema` e o resultado é gravado em um cache Parquet
+    em `<folder_path>/.cache`, de modo que apenas os arquivos alterados sejam relidos do CSV.
+    Cada DataFrame recebe em `df.attrs["versao_dados"]` a assinatura (mtime, tamanho)
+    do arquivo de origem, usada pelo motor de consulta para saber quando recarregar a tabela,
+    e em `df.attrs["estatisticas_carga"]` a origem, o tempo de carga e a memória ocupada.
+
     Args:
         folder_path (str): O caminho absoluto para a pasta contendo os arquivos CSV.
+        usar_cache (bool): Se False, ignora o cache Parquet e lê sempre o CSV.
 
     Returns:
         Um dicionário no formato {'nome_da_tabela': DataFrame}.
@@ -18,12 +170,24 @@ def load_csv_data(folder_path: str):
         # Esta verificação agora retorna um dicionário vazio e uma mensagem de erro clara.
         return None, f"Erro: O diretório especificado não foi encontrado: '{folder_path}'"
 
-    for filename in os.listdir(folder_path):
+    pasta_cache = os.path.join(folder_path, NOME_PASTA_CACHE)
+    for filename in sorted(os.listdir(folder_path)):
         if filename.endswith('.csv'):
             table_name = os.path.splitext(filename)[0]
             file_path = os.path.join(folder_path, filename)
             try:
-                dataframes[table_name] = pd.read_csv(file_path, sep=';')
+                inicio = time.perf_counter()
+                if usar_cache:
+                    df, origem = _carregar_tabela(file_path, pasta_cache)
+                else:
+                    df, origem = aplicar_esquema(pd.read_csv(file_path, sep=';')), "csv"
+                df.attrs["versao_dados"] = _assinatura_arquivo(file_path)
+                df.attrs["estatisticas_carga"] = {
+                    "origem": origem,
+                    "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1),
+                    "memoria_mb": round(float(df.memory_usage(deep=True).sum()) / 1e6, 2),
+                }
+                dataframes[table_name] = df
             except Exception as e:
                 # Se um arquivo específico falhar, retornamos o erro.
                 return None, f"Erro ao carregar o arquivo {filename}: {e}"
@@ -34,29 +198,298 @@ def load_csv_data(folder_path: str):
     return dataframes, f"Tabelas carregadas com sucesso: {list(dataframes.keys())}"
 
 
-def execute_sql_on_dfs(query: str, dataframes: dict):
+class MotorConsultaSQL:
+    """
+    Mantém os DataFrames carregados em uma única conexão SQLite em memória.
+
+    Ao contrário do `pandasql.sqldf`, que cria um banco novo e copia todas as tabelas
+    a cada consulta, aqui cada tabela é copiada uma única vez e só é recarregada quando
+    a sua assinatura muda (arquivo CSV alterado ou DataFrame com outro conteúdo).
+    A conexão é compartilhada entre as sessões do Streamlit e protegida por um lock.
+
+    Antes de executar, cada consulta passa pelas proteções de `guardrails_sql`: validação,
+    estimativa de custo do plano, LIMIT automático, timeout e limite de memória do resultado.
+
+    Com `indexar_texto=True`, cada tabela ganha índices de texto normalizado (`indice_texto`):
+    listas de categorias para colunas categóricas e um índice FTS5 de trigramas para as demais.
+    Filtros `LOWER(coluna) LIKE LOWER('%valor%')` são reescritos para usá-los em vez de varrer e
+    converter a coluna inteira a cada consulta.
+
+    Com `usar_cubos=True`, tabelas configuradas em `cubos_agregados.DIMENSOES_CUBO` ganham rollups
+    de contagem, e consultas COUNT(*) filtradas/agrupadas só por essas dimensões são respondidas por
+    eles. `estatisticas_cubos` traz a taxa de acerto e o custo evitado (linhas do plano na tabela
+    original menos as do plano no rollup, segundo o EXPLAIN QUERY PLAN).
+    """
+
+    TAMANHO_LOTE = 1000
+
+    def __init__(self, indexar_texto: bool = True, usar_cubos: bool = True):
+        self._conexao = sqlite3.connect(":memory:", check_same_thread=False)
+        self._assinaturas = {}
+        self._hashes_conteudo = {}
+        self._linhas = {}
+        self._indices_texto = {}
+        self._indexar_texto = indexar_texto
+        self._cubos = {}
+        self._usar_cubos = usar_cubos
+        self._estatisticas_cubos = {"consultas": 0, "acertos": 0, "custo_evitado": 0}
+        self._lock = threading.Lock()
+
+    def _assinatura(self, df: pd.DataFrame):
+        versao = df.attrs.get("versao_dados")
+        if versao is not None:
+            return ("versao", versao, df.shape)
+        # DataFrames que não vieram do load_csv_data são identificados pelo conteúdo. O hash é
+        # calculado uma vez por objeto; a referência fraca garante que um objeto novo no mesmo
+        # endereço de memória de um já coletado não reaproveite o hash antigo.
+        memorizado = self._hashes_conteudo.get(id(df))
+        if memorizado is None or memorizado[0]() is not df:
+            conteudo = int(pd.util.hash_pandas_object(df, index=False).sum())
+            memorizado = (weakref.ref(df, lambda _, chave=id(df): self._hashes_conteudo.pop(chave, None)), conteudo)
+            self._hashes_conteudo[id(df)] = memorizado
+        return ("conteudo", memorizado[1], tuple(df.columns), df.shape)
+
+    def sincronizar(self, dataframes: dict):
+        """
+        Copia para o SQLite apenas as tabelas novas ou alteradas. O índice de texto e o cubo antigos
+        deixam de valer antes da cópia, e a assinatura só é registrada depois de reconstruí-los: se
+        algo falhar no caminho, a tabela é sincronizada de novo na próxima consulta, sem consultas
+        roteadas para estruturas desatualizadas.
+        """
+        for nome, df in dataframes.items():
+            assinatura = self._assinatura(df)
+            if self._assinaturas.get(nome) != assinatura:
+                self._assinaturas.pop(nome, None)
+                self._indices_texto.pop(nome, None)
+                cubo_anterior = self._cubos.pop(nome, None)
+                df.to_sql(nome, self._conexao, if_exists="replace", index=False)
+                self._linhas[nome] = len(df)
+                if self._indexar_texto:
+                    self._indices_texto[nome] = criar_indice_texto(self._conexao, nome, df)
+                if self._usar_cubos:
+                    self._atualizar_cubo(nome, df, cubo_anterior)
+                self._assinaturas[nome] = assinatura
+
+        for nome in set(self._linhas) - set(dataframes):
+            self._conexao.execute(f'DROP TABLE IF EXISTS "{nome}"')
+            remover_indice_texto(self._conexao, nome)
+            if nome in self._cubos:
+                self._cubos.pop(nome).remover(self._conexao)
+            self._assinaturas.pop(nome, None)
+            del self._linhas[nome]
+            self._indices_texto.pop(nome, None)
+
+    def _atualizar_cubo(self, nome: str, df: pd.DataFrame, cubo_anterior):
+        """
+        Atualiza o cubo da tabela. O cubo anterior só é reaproveitado (e atualizado de forma
+        incremental) se as dimensões configuradas presentes em `df` forem as mesmas; se a
+        atualização falhar, a tabela fica sem cubo e as consultas leem a própria tabela.
+        """
+        cubo = criar_cubo(nome, df)
+        if cubo_anterior is not None:
+            if cubo is not None and cubo.dimensoes == cubo_anterior.dimensoes:
+                cubo = cubo_anterior
+            else:
+                cubo_anterior.remover(self._conexao)
+        if cubo is None:
+            return
+        try:
+            cubo.atualizar(self._conexao, df)
+        except Exception:
+            cubo.remover(self._conexao)
+            raise
+        self._cubos[nome] = cubo
+
+    def estatisticas_cubos(self) -> dict:
+        """Consultas executadas, quantas foram respondidas pelos cubos e o custo evitado acumulado."""
+        with self._lock:
+            estatisticas = dict(self._estatisticas_cubos)
+        estatisticas["taxa_acerto"] = round(estatisticas["acertos"] / max(1, estatisticas["consultas"]), 3)
+        return estatisticas
+
+    def executar(self, query: str, dataframes: dict,
+                 limite_linhas: int = LIMITE_LINHAS_PADRAO,
+                 timeout_segundos: float = TIMEOUT_PADRAO_SEGUNDOS,
+                 limite_memoria_mb: float = LIMITE_MEMORIA_PADRAO_MB,
+                 limite_custo: int = LIMITE_CUSTO_PADRAO):
+        """
+        Executa a consulta com as proteções de `guardrails_sql`, lendo o resultado em lotes.
+
+        Returns:
+            Uma tupla (result_df, estatisticas). estatisticas traz tempo_ms, linhas, truncado,
+            custo_estimado, passos_vm, memoria_mb, cubo (o rollup usado, ou None) e
+            custo_evitado (estimado pelos planos), e também fica em `result_df.attrs["estatisticas_execucao"]`.
+
+        Raises:
+            ConsultaRejeitada: a consulta não é uma leitura válida ou o plano é caro demais.
+            ConsultaInterrompida: a consulta excedeu o timeout ou o limite de memória do resultado.
+        """
+        query = validar_sql(query)
+        limite_bytes = limite_memoria_mb * 1024 * 1024
+        with self._lock:
+            self.sincronizar(dataframes)
+            inicio = time.perf_counter()
+            query, custo, rota = self._planejar(query, limite_custo)
+
+            controle = ControleExecucao(timeout_segundos)
+            self._conexao.set_progress_handler(controle, PASSOS_VERIFICACAO)
+            cursor = self._conexao.cursor()
+            try:
+                cursor.execute(aplicar_limite(query, limite_linhas))
+                colunas = [descricao[0] for descricao in cursor.description]
+                linhas = []
+                bytes_por_linha = None
+                while len(linhas) <= limite_linhas:
+                    lote = cursor.fetchmany(self.TAMANHO_LOTE)
+                    if not lote:
+                        break
+                    if bytes_por_linha is None:
+                        bytes_por_linha = _estimar_bytes_por_linha(lote)
+                    linhas.extend(lote)
+                    if len(linhas) * bytes_por_linha > limite_bytes:
+                        raise ConsultaInterrompida(
+                            f"o resultado excedeu o limite de memória de {limite_memoria_mb} MB e a consulta foi cancelada."
+                        )
+            except sqlite3.OperationalError as e:
+                if controle.excedeu_tempo:
+                    raise ConsultaInterrompida(
+                        f"a consulta excedeu o tempo limite de {timeout_segundos:g} s e foi cancelada."
+                    ) from e
+                raise
+            finally:
+                cursor.close()
+                self._conexao.set_progress_handler(None, 0)
+
+            custo_evitado = max(0, rota["custo_tabela"] - custo) if rota else 0
+            self._estatisticas_cubos["consultas"] += 1
+            if rota:
+                self._estatisticas_cubos["acertos"] += 1
+                self._estatisticas_cubos["custo_evitado"] += custo_evitado
+
+        truncado = len(linhas) > limite_linhas
+        result_df = pd.DataFrame.from_records(linhas[:limite_linhas], columns=colunas)
+        estatisticas = {
+            "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "linhas": len(result_df),
+            "truncado": truncado,
+            "custo_estimado": custo,
+            "passos_vm": controle.passos,
+            "memoria_mb": round(float(result_df.memory_usage(deep=True).sum()) / 1e6, 2),
+            "cubo": rota["cubo"] if rota else None,
+            "custo_evitado": custo_evitado,
+        }
+        result_df.attrs["estatisticas_execucao"] = estatisticas
+        return result_df, estatisticas
+
+    def _planejar(self, query: str, limite_custo: int):
+        """
+        Aplica a reescrita das buscas de texto e verifica o custo do plano resultante.
+        Se a reescrita gerar um SQL inválido (ex.: coluna referenciada fora do escopo da tabela),
+        a consulta original é usada. Consultas que um cubo consegue responder são desviadas para ele.
+
+        Returns:
+            Uma tupla (query, custo, rota); rota é None ou {'cubo', 'custo_tabela'}.
+        """
+        if self._indices_texto:
+            reescrita = reescrever_buscas_texto(query, self._indices_texto)
+            if reescrita != query:
+                try:
+                    verificar_custo(self._conexao, reescrita, self._linhas, limite_custo)
+                    query = reescrita
+                except sqlite3.OperationalError:
+                    pass
+
+        for cubo in self._cubos.values():
+            roteada = cubo.rotear(query)
+            if roteada is None:
+                continue
+            consulta_cubo, nome_rollup = roteada
+            linhas = {**self._linhas, **cubo.linhas_por_tabela()}
+            try:
+                custo = verificar_custo(self._conexao, consulta_cubo, linhas, limite_custo)
+                # Custo que a consulta teria na tabela, base do custo evitado.
+                custo_tabela, _ = estimar_custo(self._conexao, query, self._linhas)
+            except sqlite3.OperationalError:
+                continue
+            return consulta_cubo, custo, {"cubo": nome_rollup, "custo_tabela": custo_tabela}
+        return query, verificar_custo(self._conexao, query, self._linhas, limite_custo), None
+
+
+def _estimar_bytes_por_linha(lote) -> float:
+    """Tamanho médio aproximado, em bytes, das linhas de um lote retornado pelo cursor."""
+    total = sum(sys.getsizeof(valor) for linha in lote for valor in linha)
+    return total / len(lote) + 64
+
+
+_motor_padrao = None
+_motor_lock = threading.Lock()
+
+def obter_motor_consulta() -> MotorConsultaSQL:
+    """Retorna o motor de consulta compartilhado pelo processo, criando-o na primeira chamada."""
+    global _motor_padrao
+    with _motor_lock:
+        if _motor_padrao is None:
+            _motor_padrao = MotorConsultaSQL()
+        return _motor_padrao
+
+
+def execute_sql_on_dfs(query: str, dataframes: dict,
+                       limite_linhas: int = LIMITE_LINHAS_PADRAO,
+                       timeout_segundos: float = TIMEOUT_PADRAO_SEGUNDOS):
     """
     Executa uma consulta SQL em um dicionário de DataFrames Pandas.
 
+    As tabelas ficam residentes no motor compartilhado (`obter_motor_consulta`),
+    então apenas a primeira consulta após uma mudança nos dados paga o custo da cópia.
+    Consultas caras demais são rejeitadas antes de executar, o resultado é limitado a
+    `limite_linhas` registros e a execução é cancelada após `timeout_segundos`.
+
     Args:
         query (str): A consulta SQL a ser executada.
         dataframes (dict): Um dicionário no formato {'nome_da_tabela': DataFrame}.
+        limite_linhas (int): Número máximo de registros retornados.
+        timeout_segundos (float): Tempo máximo de execução da consulta.
 
     Returns:
         Uma tupla (result_df, message).
         result_df é um DataFrame com os resultados ou None em caso de erro.
-        message é uma string de status.
+        message é uma string de status, incluindo as estatísticas de execução.
     """
     if not dataframes:
         return None, "Erro: Não há tabelas (DataFrames) para consultar."
 
-    # A função lambda torna os dataframes no dicionário acessíveis para o pandasql
-    pysqldf = lambda q: sqldf(q, dataframes)
-
     try:
-        result_df = pysqldf(query)
+        result_df, estatisticas = obter_motor_consulta().executar(
+            query, dataframes, limite_linhas=limite_linhas, timeout_segundos=timeout_segundos
+        )
         message = f"Consulta executada com sucesso. Foram encontrados {len(result_df)} registros."
+        if estatisticas["truncado"]:
+            message += f" Resultado limitado aos primeiros {limite_linhas} registros."
+        message += (
+            f" (tempo: {estatisticas['tempo_ms']} ms · custo estimado: {estatisticas['custo_estimado']:,} linhas"
+            f" · passos da VM: {estatisticas['passos_vm']:,} · memória: {estatisticas['memoria_mb']} MB)"
+        )
+        if estatisticas["cubo"]:
+            message += f" Respondida pelo agregado pré-calculado (custo evitado: {estatisticas['custo_evitado']:,} linhas)."
         return result_df, message
+    except ConsultaRejeitada as e:
+        return None, f"Consulta rejeitada: {e}"
+    except ConsultaInterrompida as e:
+        return None, f"Consulta interrompida: {e}"
     except Exception as e:
         error_message = f"Erro ao executar a consulta SQL: {e}"
-        return None, error_message
\ No newline at end of file
+        return None, error_message
+
+
+def versao_dos_dados(folder_path: str) -> str:
+    """
+    Retorna uma assinatura curta do conjunto de CSVs da pasta (nome, mtime e tamanho de cada arquivo).
+    Muda sempre que algum arquivo é adicionado, removido ou alterado.
+    """
+    sha = hashlib.sha256()
+    if os.path.isdir(folder_path):
+        for filename in sorted(os.listdir(folder_path)):
+            if filename.endswith('.csv'):
+                mtime_ns, tamanho = _assinatura_arquivo(os.path.join(folder_path, filename))
+                sha.update(f"{filename}:{mtime_ns}:{tamanho};".encode())
+    return sha.hexdigest()[:16]
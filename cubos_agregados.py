@@ -0,0 +1,202 @@
+import re
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+SUFIXO_CUBO = "__cubo__"
+COLUNA_CONTAGEM = "contagem_cubo"
+# Rollups materializados: todas as combinações de até MAX_DIMENSOES_CUBO dimensões, mais o cubo base
+# (todas as dimensões), que responde às consultas com mais dimensões que isso.
+MAX_DIMENSOES_CUBO = 2
+# Dimensões agrupadas pelas perguntas de contagem mais comuns (as do corpus do benchmark), por tabela.
+DIMENSOES_CUBO = {
+    "nx_org_group_classified_v2": [
+        "forms_uf", "forms_org_grupo_name", "forms_template_name", "flag_ropa_rat", "forms_status",
+        "assessment_risk_level_name", "end_date_year", "end_date_month",
+    ],
+}
+
+_RE_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_RE_CONTAGEM = re.compile(r"\bCOUNT\s*\(\s*(?:\*|1)\s*\)", re.I)
+# Alias logo após um item do SELECT: `COUNT(*) AS total`, `COUNT(*) total`.
+_RE_ALIAS = re.compile(r"\s+(?:as\s+)?(?!from\b)(\w+|\"[^\"]+\")", re.I)
+_RE_FROM = re.compile(r"\bfrom\s+(\w+)(?:\s+(?:as\s+)?(?!where\b|group\b|order\b|limit\b)(\w+))?\s*(,)?", re.I)
+_RE_IDENTIFICADOR = re.compile(r"\"([^\"]+)\"|\b([a-z_]\w*)\b(\s*\()?", re.I)
+_RE_DEFINICAO_ALIAS = re.compile(r"\bas\s+(\w+|\"[^\"]+\")", re.I)
+# Construções que o roteador não tenta reescrever.
+_PALAVRAS_NAO_ROTEAVEIS = {"join", "union", "intersect", "except", "with", "distinct", "over", "window"}
+_PALAVRAS_PERMITIDAS = {
+    "select", "from", "where", "group", "by", "order", "asc", "desc", "limit", "offset", "and", "or", "not",
+    "like", "in", "is", "null", "between", "as", "having", "escape", "case", "when", "then", "else", "end",
+    "collate", "nocase", "glob", "true", "false",
+}
+_FUNCOES_PERMITIDAS = {"lower", "upper", "trim", "coalesce", "ifnull"}
+
+
+def _mascarar_literais(query: str) -> str:
+    """Troca o conteúdo dos literais de texto por 'x', preservando posições."""
+    return _RE_LITERAL.sub(lambda m: "'" + "x" * (len(m.group(0)) - 2) + "'", query)
+
+
+def _contar(df: pd.DataFrame, dimensoes: list) -> pd.DataFrame:
+    return df.groupby(dimensoes, dropna=False, observed=True).size().reset_index(name=COLUNA_CONTAGEM)
+
+
+def _somar(df: pd.DataFrame, dimensoes: list) -> pd.DataFrame:
+    return df.groupby(dimensoes, dropna=False, observed=True)[COLUNA_CONTAGEM].sum().reset_index()
+
+
+class CuboAgregado:
+    """
+    Contagens pré-calculadas de uma tabela por combinações das suas dimensões mais consultadas.
+
+    O cubo base (contagem por todas as dimensões) é mantido em memória; dele saem os rollups de
+    1 a MAX_DIMENSOES_CUBO dimensões, gravados como tabelas `<tabela>__cubo__<dim>__<dim>` na
+    conexão do motor, junto com o próprio cubo base. Como as contagens são somáveis, uma consulta
+    é respondida pelo menor rollup que contém todas as dimensões que ela usa. Quando os dados mudam apenas por linhas acrescentadas ao final (as dimensões
+    das linhas antigas não mudaram), só as linhas novas são agregadas: as contagens parciais são
+    inseridas nos rollups, que são sempre lidos com SUM, sem regravar as tabelas.
+
+    `rotear` reescreve consultas de contagem (COUNT(*) com filtros e agrupamentos apenas sobre as
+    dimensões) para ler o rollup correspondente em vez de varrer a tabela.
+    """
+
+    def __init__(self, tabela: str, dimensoes: list):
+        self.tabela = tabela
+        self.dimensoes = list(dimensoes)
+        self.tabelas_rollup = {}
+        self._base = None
+        self._hashes = None
+
+    def atualizar(self, conexao, df: pd.DataFrame) -> str:
+        """
+        Atualiza o cubo para o novo conteúdo da tabela (já gravada em `conexao`).
+
+        Returns:
+            'completa', 'incremental' ou 'inalterada'.
+        """
+        hashes = pd.util.hash_pandas_object(df[self.dimensoes], index=False).to_numpy()
+        anteriores = 0 if self._hashes is None else len(self._hashes)
+        if self._base is not None and len(hashes) >= anteriores and np.array_equal(hashes[:anteriores], self._hashes):
+            if len(hashes) == anteriores:
+                modo = "inalterada"
+            else:
+                delta = _contar(df.iloc[anteriores:], self.dimensoes)
+                self._base = _somar(pd.concat([self._base, delta], ignore_index=True), self.dimensoes)
+                self._acrescentar(conexao, delta)
+                modo = "incremental"
+        else:
+            self._base = _contar(df, self.dimensoes)
+            self._materializar(conexao)
+            modo = "completa"
+        self._hashes = hashes
+        return modo
+
+    def _materializar(self, conexao):
+        self.remover(conexao)
+        rollups = {
+            dimensoes: "__".join(dimensoes)
+            for quantidade in range(1, min(MAX_DIMENSOES_CUBO, len(self.dimensoes) - 1) + 1)
+            for dimensoes in combinations(self.dimensoes, quantidade)
+        }
+        rollups[tuple(self.dimensoes)] = "base"
+        for dimensoes, sufixo in rollups.items():
+            nome = f"{self.tabela}{SUFIXO_CUBO}{sufixo}"
+            rollup = _somar(self._base, list(dimensoes))
+            rollup.to_sql(nome, conexao, if_exists="replace", index=False)
+            self.tabelas_rollup[frozenset(dimensoes)] = (nome, len(rollup))
+
+    def _acrescentar(self, conexao, delta):
+        temporaria = f"{self.tabela}{SUFIXO_CUBO}delta"
+        delta.to_sql(temporaria, conexao, if_exists="replace", index=False)
+        try:
+            for dimensoes, (nome, linhas) in self.tabelas_rollup.items():
+                colunas = ", ".join(f'"{d}"' for d in self.dimensoes if d in dimensoes)
+                cursor = conexao.execute(
+                    f'INSERT INTO "{nome}" ({colunas}, "{COLUNA_CONTAGEM}") '
+                    f'SELECT {colunas}, SUM("{COLUNA_CONTAGEM}") FROM "{temporaria}" GROUP BY {colunas}'
+                )
+                self.tabelas_rollup[dimensoes] = (nome, linhas + cursor.rowcount)
+        finally:
+            conexao.execute(f'DROP TABLE IF EXISTS "{temporaria}"')
+
+    def remover(self, conexao):
+        for nome, _ in self.tabelas_rollup.values():
+            conexao.execute(f'DROP TABLE IF EXISTS "{nome}"')
+        self.tabelas_rollup = {}
+
+    def linhas_por_tabela(self) -> dict:
+        return {nome: linhas for nome, linhas in self.tabelas_rollup.values()}
+
+    def rotear(self, query: str):
+        """
+        Returns:
+            Uma tupla (consulta_reescrita, tabela_rollup), ou None se a consulta não puder ser
+            respondida pelo cubo.
+        """
+        mascarada = _mascarar_literais(query)
+        minusculas = mascarada.lower()
+        palavras = set(re.findall(r"[a-z_]\w*", minusculas))
+        if _PALAVRAS_NAO_ROTEAVEIS & palavras or len(re.findall(r"\bselect\b", minusculas)) != 1:
+            return None
+        origem = _RE_FROM.search(mascarada)
+        if origem is None or origem.group(3) or origem.group(1).lower() != self.tabela.lower():
+            return None
+        if not _RE_CONTAGEM.search(mascarada):
+            return None
+
+        permitidos = {self.tabela.lower()} | {alias.strip('"').lower() for alias in _RE_DEFINICAO_ALIAS.findall(mascarada)}
+        if origem.group(2):
+            permitidos.add(origem.group(2).lower())
+        dimensoes = {dimensao.lower(): dimensao for dimensao in self.dimensoes}
+        usadas = set()
+        for match in _RE_IDENTIFICADOR.finditer(_RE_LITERAL.sub(" ", _RE_CONTAGEM.sub(" ", mascarada))):
+            entre_aspas, palavra, chamada = match.groups()
+            nome = (entre_aspas or palavra).lower()
+            if chamada and nome not in _PALAVRAS_PERMITIDAS:
+                if nome not in _FUNCOES_PERMITIDAS:
+                    return None
+            elif nome in dimensoes:
+                usadas.add(dimensoes[nome])
+            elif nome not in permitidos and (entre_aspas or nome not in _PALAVRAS_PERMITIDAS):
+                return None
+
+        if not self.tabelas_rollup:
+            return None
+        nome_rollup = min(
+            (item for dimensoes, item in self.tabelas_rollup.items() if usadas <= dimensoes), key=lambda item: item[1]
+        )[0]
+        return self._reescrever(query, mascarada, origem, nome_rollup), nome_rollup
+
+    def _reescrever(self, query, mascarada, origem, nome_rollup):
+        fim_select = origem.start()
+        partes = []
+        posicao = 0
+        for match in _RE_CONTAGEM.finditer(mascarada):
+            substituto = f'COALESCE(SUM("{COLUNA_CONTAGEM}"), 0)'
+            # Sem alias, a coluna do resultado mantém o nome original (ex.: "COUNT(*)").
+            if match.start() < fim_select and not _RE_ALIAS.match(mascarada, match.end()):
+                substituto += f' AS "{query[match.start():match.end()]}"'
+            partes.extend([query[posicao:match.start()], substituto])
+            posicao = match.end()
+        partes.append(query[posicao:])
+        reescrita = "".join(partes)
+
+        # Troca o nome da tabela (no FROM e em colunas qualificadas), fora dos literais.
+        padrao = re.compile(rf'\b{re.escape(self.tabela)}\b|"{re.escape(self.tabela)}"', re.I)
+        mascarada = _mascarar_literais(reescrita)
+        partes = []
+        posicao = 0
+        for match in padrao.finditer(mascarada):
+            # Sem aspas, para que a estimativa de custo dos guardrails reconheça a tabela e o alias.
+            partes.extend([reescrita[posicao:match.start()], nome_rollup])
+            posicao = match.end()
+        partes.append(reescrita[posicao:])
+        return "".join(partes)
+
+
+def criar_cubo(tabela: str, df: pd.DataFrame):
+    """O cubo configurado em DIMENSOES_CUBO para a tabela, com as dimensões presentes em `df`; None se não houver."""
+    dimensoes = [dimensao for dimensao in DIMENSOES_CUBO.get(tabela, []) if dimensao in df.columns]
+    return CuboAgregado(tabela, dimensoes) if dimensoes else None
@@ -0,0 +1,45 @@
+import json
+
+from langchain_core.messages import SystemMessage, HumanMessage
+
+# Modelo da Together AI usado pelo app e pelo modo em lote (`respostas_em_lote.py`).
+TOGETHER_MODEL_NAME = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
+
+PROMPT_SISTEMA = """
+Você é um assistente especialista em traduzir perguntas em linguagem natural (português) para consultas SQL. 
+Sua única função é gerar um código SQL funcional e otimizado com base no esquema das tabelas e no contexto fornecido. 
+UTILIZE AS INFORMAÇÕES PRESENTES NO CONTEXTO PARA MONTAR A QUERY.
+Siga estas regras estritamente:
+1.  **Formato de Saída Obrigatório:** Sua única resposta deve ser um objeto JSON. O JSON deve conter duas chaves:
+    * `"query"`: Uma string contendo o código SQL gerado.
+    * `"descricao"`: Uma string com uma breve explicação em português do que o código SQL faz.
+    * Exemplo de output: `{"query": "SELECT * FROM Clientes;", "descricao": "Este comando seleciona todas as colunas e registros da tabela 'Clientes'."}`
+    NÃO ADICIONE MAIS NADA além do output definido.
+2.  Use apenas as tabelas e colunas definidas no contexto. Os nomes das tabelas (`ot_consolidada`, `nx_org_group_classified_v2`) são os nomes a serem usados na query.
+3.  **Ignore qualquer `Caminho` ou `Path` (ex: `iceberg.landing_trusted`) mencionado no contexto; use apenas o nome da tabela diretamente na query.**
+4.  Analise a pergunta do usuário para identificar as colunas corretas, filtros (WHERE), agregações (COUNT, GROUP BY) e ordenações (ORDER BY).
+5.  Se a pergunta for ambígua ou se for impossível gerar a consulta com o contexto fornecido, sua única resposta deve ser: `{"query": "ERRO: Impossível gerar a consulta.", "descricao": "A pergunta é ambígua ou não pode ser respondida com o contexto fornecido."}`
+6.  **Buscas de Texto Robustas:** Gere consultas que sejam robustas a variações de digitação e capitalização. Para todas as cláusulas `WHERE` que filtram uma coluna de texto, aplique a função `LOWER()` à coluna e ao valor de busca. Exemplo: `LOWER(coluna) LIKE LOWER('%valor%')`.
+7.  **Colunas de Data:** As datas (ex.: `forms_create_dt`, `forms_updated_dt`, `last_updated`, `completed_on`, `end_date`) ficam no formato `'AAAA-MM-DD HH:MM:SS'`, com frações de segundo e fuso opcionais (ex.: `'2025-05-08 13:17:24.940000+00:00'`), sem o `T` do ISO 8601. Para filtrar por período, compare o início do texto (ex.: `forms_create_dt LIKE '2024-05%'`) ou use as colunas `end_date_year`, `end_date_month` e `end_date_day` quando existirem.
+"""
+
+
+def montar_mensagens_sql(contexto_rag: str, pergunta: str) -> list:
+    """Mensagens da chamada que traduz a pergunta em SQL, a partir do contexto recuperado do RAG."""
+    prompt_final = f"Contexto das Tabelas:\n{contexto_rag}\n\nCom base SOMENTE no contexto acima, traduza a seguinte pergunta para SQL.\n\nPergunta do Usuário:\n{pergunta}"
+    return [SystemMessage(content=PROMPT_SISTEMA), HumanMessage(content=prompt_final)]
+
+
+def ler_resposta_sql(resposta: str):
+    """
+    Interpreta o JSON devolvido pelo LLM, tolerando cercas de código markdown.
+
+    Returns:
+        Uma tupla (sql, descricao).
+
+    Raises:
+        json.JSONDecodeError, AttributeError: se a resposta não for um objeto JSON.
+    """
+    clean_response = resposta.strip().replace("```json", "").replace("```", "")
+    resposta_obj = json.loads(clean_response)
+    return resposta_obj.get("query"), resposta_obj.get("descricao")
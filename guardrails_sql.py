@@ -0,0 +1,189 @@
+import math
+import re
+import time
+
+# --- Limites padrão por consulta ---
+LIMITE_LINHAS_PADRAO = 10_000
+TIMEOUT_PADRAO_SEGUNDOS = 30.0
+# Memória das linhas do resultado já lidas para o Python. Não limita o trabalho interno do SQLite
+# (ordenações, GROUP BY, DISTINCT), que fica contido apenas pela estimativa de custo e pelo timeout.
+LIMITE_MEMORIA_PADRAO_MB = 200
+# Número máximo de combinações de linhas de um loop aninhado sem índice (ex.: junção sem predicado).
+LIMITE_CUSTO_PADRAO = 10_000_000
+# Intervalo, em instruções da VM do SQLite, entre as verificações de timeout.
+PASSOS_VERIFICACAO = 10_000
+
+_PALAVRAS_PROIBIDAS = {
+    "insert", "update", "delete", "drop", "alter", "create", "replace",
+    "attach", "detach", "pragma", "vacuum", "reindex",
+}
+# Palavras proibidas que também nomeiam funções escalares de leitura: permitidas como chamada (`REPLACE(...)`).
+_FUNCOES_PERMITIDAS = {"replace"}
+_RE_PALAVRA = re.compile(r"([a-z_]+)(\s*\()?")
+_RE_LITERAL_OU_COMENTARIO = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.S)
+_RE_LIMIT_FINAL = re.compile(r"\blimit\s+\d+(\s*(,|offset)\s*\d+)?\s*$", re.I)
+_RE_TABELA_ALIAS = re.compile(
+    r"\b(?:from|join)\s+(\w+)(?:\s+(?:as\s+)?(?!on\b|where\b|join\b|inner\b|left\b|cross\b|group\b|order\b|limit\b|using\b|natural\b)(\w+))?"
+    r"|,\s*(\w+)(?:\s+(?:as\s+)?(?!on\b|where\b|join\b|group\b|order\b|limit\b)(\w+))?",
+    re.I,
+)
+_RE_PASSO_PLANO = re.compile(r"^(SCAN|SEARCH) (\w+)")
+
+
+class ConsultaRejeitada(Exception):
+    """A consulta não passou pelas verificações anteriores à execução."""
+
+
+class ConsultaInterrompida(Exception):
+    """A consulta excedeu o tempo permitido ou o limite de memória do resultado e foi cancelada."""
+
+
+def _sem_comentarios(query: str) -> str:
+    """Remove comentários SQL, preservando literais de texto."""
+    return _RE_LITERAL_OU_COMENTARIO.sub(
+        lambda m: " " if m.group(0).startswith(("--", "/*")) else m.group(0), query
+    )
+
+
+def _sem_literais(query: str) -> str:
+    """Substitui literais de texto por '?' para que seu conteúdo não seja analisado como SQL."""
+    return _RE_LITERAL_OU_COMENTARIO.sub(
+        lambda m: " " if m.group(0).startswith(("--", "/*")) else "?", query
+    )
+
+
+def validar_sql(query: str) -> str:
+    """
+    Normaliza e valida o SQL gerado pelo LLM: remove comentários e o ';' final e aceita apenas
+    uma única instrução SELECT/WITH sem comandos que alterem o banco.
+
+    Returns:
+        A consulta normalizada.
+
+    Raises:
+        ConsultaRejeitada: se a consulta não for uma leitura simples.
+    """
+    query = _sem_comentarios(query).strip().rstrip(";").strip()
+    esqueleto = _sem_literais(query)
+    if not query:
+        raise ConsultaRejeitada("a consulta está vazia.")
+    if ";" in esqueleto:
+        raise ConsultaRejeitada("apenas uma instrução SQL por consulta é permitida.")
+    primeira_palavra = esqueleto.split(None, 1)[0].lower()
+    if primeira_palavra not in ("select", "with"):
+        raise ConsultaRejeitada("apenas consultas SELECT são permitidas.")
+    palavras = {
+        palavra for palavra, chamada in _RE_PALAVRA.findall(esqueleto.lower())
+        if not (chamada and palavra in _FUNCOES_PERMITIDAS)
+    }
+    proibidas = _PALAVRAS_PROIBIDAS & palavras
+    if proibidas:
+        raise ConsultaRejeitada(f"comandos não permitidos na consulta: {', '.join(sorted(proibidas))}.")
+    return query
+
+
+def aplicar_limite(query: str, limite_linhas: int) -> str:
+    """
+    Acrescenta `LIMIT limite_linhas + 1` quando a consulta não tem LIMIT no nível externo.
+    A linha excedente só serve para detectar que o resultado foi truncado.
+    """
+    if _RE_LIMIT_FINAL.search(_sem_literais(query)):
+        return query
+    return f"{query}\nLIMIT {limite_linhas + 1}"
+
+
+def tabelas_por_alias(query: str, tabelas) -> dict:
+    """
+    Mapeia, em minúsculas, cada nome ou alias usado após FROM/JOIN/vírgula para a tabela
+    correspondente, considerando apenas as tabelas conhecidas em `tabelas`.
+    """
+    conhecidas = {tabela.lower(): tabela for tabela in tabelas}
+    aliases = {}
+    for grupos in _RE_TABELA_ALIAS.findall(_sem_literais(query)):
+        tabela = (grupos[0] or grupos[2]).lower()
+        alias = (grupos[1] or grupos[3]).lower()
+        if tabela in conhecidas:
+            aliases[tabela] = conhecidas[tabela]
+            if alias:
+                aliases[alias] = conhecidas[tabela]
+    return aliases
+
+
+def estimar_custo(conexao, query: str, linhas_por_tabela: dict):
+    """
+    Estima o custo de uma consulta a partir do `EXPLAIN QUERY PLAN` do SQLite.
+
+    Tabelas varridas por completo (SCAN) no mesmo nível do plano formam um loop aninhado,
+    então seus tamanhos são multiplicados; buscas com índice automático custam a construção
+    do índice (o tamanho da tabela). Aliases desconhecidos (CTEs, subconsultas) assumem o
+    tamanho da maior tabela.
+
+    Returns:
+        Uma tupla (custo_estimado, varreduras_aninhadas), onde varreduras_aninhadas lista os
+        nomes das tabelas/aliases de cada nível com mais de uma varredura completa.
+    """
+    aliases = {alias: linhas_por_tabela[tabela] for alias, tabela in tabelas_por_alias(query, linhas_por_tabela).items()}
+    padrao = max(linhas_por_tabela.values(), default=1)
+
+    niveis = {}
+    for _, pai, _, detalhe in conexao.execute(f"EXPLAIN QUERY PLAN {query}").fetchall():
+        passo = _RE_PASSO_PLANO.match(detalhe)
+        if passo:
+            niveis.setdefault(pai, []).append((passo.group(1), passo.group(2), detalhe))
+
+    custo_total = 0
+    aninhadas = []
+    for passos in niveis.values():
+        # Varreduras de tabelas virtuais (índices de texto FTS5) já usam o próprio índice.
+        varreduras = [nome for tipo, nome, detalhe in passos if tipo == "SCAN" and "VIRTUAL TABLE" not in detalhe]
+        custo = math.prod(aliases.get(nome.lower(), padrao) for nome in varreduras) if varreduras else 0
+        custo += sum(
+            aliases.get(nome.lower(), padrao)
+            for tipo, nome, detalhe in passos
+            if tipo == "SEARCH" and "AUTOMATIC" in detalhe
+        )
+        custo_total += custo
+        if len(varreduras) > 1:
+            aninhadas.append(varreduras)
+    return custo_total, aninhadas
+
+
+def verificar_custo(conexao, query: str, linhas_por_tabela: dict, limite_custo: int = LIMITE_CUSTO_PADRAO) -> int:
+    """
+    Rejeita planos caros demais, tipicamente junções sem predicado (produto cartesiano).
+
+    Returns:
+        O custo estimado, quando aceito.
+
+    Raises:
+        ConsultaRejeitada: se o custo estimado ultrapassar `limite_custo`.
+    """
+    custo, aninhadas = estimar_custo(conexao, query, linhas_por_tabela)
+    if custo > limite_custo:
+        if aninhadas:
+            tabelas = " x ".join(aninhadas[0])
+            raise ConsultaRejeitada(
+                f"junção sem predicado entre {tabelas} (produto cartesiano de ~{custo:,} combinações). "
+                "Adicione uma condição de junção (ON/WHERE)."
+            )
+        raise ConsultaRejeitada(f"custo estimado de ~{custo:,} linhas excede o limite de {limite_custo:,}.")
+    return custo
+
+
+class ControleExecucao:
+    """
+    Progress handler do SQLite que cancela a consulta ao passar do prazo, e contador dos passos
+    da VM executados (uma medida aproximada do trabalho realizado pela consulta).
+    """
+
+    def __init__(self, timeout_segundos: float):
+        self.prazo = time.perf_counter() + timeout_segundos
+        self.passos = 0
+        self.excedeu_tempo = False
+
+    def __call__(self):
+        self.passos += PASSOS_VERIFICACAO
+        if time.perf_counter() > self.prazo:
+            self.excedeu_tempo = True
+            return 1  # Qualquer valor diferente de zero interrompe a consulta no SQLite.
+        return 0
@@ -0,0 +1,181 @@
+import re
+import sqlite3
+import unicodedata
+
+import pandas as pd
+
+from guardrails_sql import tabelas_por_alias
+
+SUFIXO_TABELA_BUSCA = "__busca"
+# Colunas categóricas com até este número de categorias são filtradas por lista de valores (IN),
+# resolvida em Python sobre as categorias, em vez do índice de trigramas.
+MAX_CATEGORIAS_FILTRO_IN = 1000
+# Tokenizador da tabela FTS5; o de trigramas exige SQLite 3.34 ou mais recente.
+TOKENIZADOR_FTS = "trigram"
+
+# LOWER(coluna) LIKE LOWER('%valor%'), LOWER(alias.coluna) LIKE '%valor%' e variações de espaço/caixa,
+# como o PROMPT_SISTEMA instrui o LLM a gerar.
+_RE_BUSCA_TEXTO = re.compile(
+    r"\bLOWER\s*\(\s*(?:(\w+)\s*\.\s*)?(\w+|\"[^\"]+\")\s*\)"
+    r"\s+LIKE\s+"
+    r"(?:LOWER\s*\(\s*'((?:[^']|'')*)'\s*\)|'((?:[^']|'')*)')",
+    re.I,
+)
+
+
+def normalizar_texto(valor) -> str:
+    """Minúsculas e sem acentos, a forma guardada no índice de texto."""
+    texto = unicodedata.normalize("NFKD", str(valor).lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def colunas_de_texto(df: pd.DataFrame) -> list:
+    return [coluna for coluna in df.columns if df[coluna].dtype == object or isinstance(df[coluna].dtype, pd.CategoricalDtype)]
+
+
+def _normalizar_serie(serie: pd.Series) -> pd.Series:
+    # Normaliza cada valor distinto uma única vez; em colunas categóricas, só as categorias.
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = serie.cat.categories
+    else:
+        valores = serie.dropna().unique()
+    return serie.astype(object).map(dict(zip(valores, map(normalizar_texto, valores))))
+
+
+def _padrao_like_para_regex(padrao: str):
+    partes = []
+    for caractere in padrao:
+        if caractere == "%":
+            partes.append(".*")
+        elif caractere == "_":
+            partes.append(".")
+        else:
+            partes.append(re.escape(caractere))
+    return re.compile("".join(partes), re.S)
+
+
+class IndiceTextoTabela:
+    """
+    Estruturas de busca de texto de uma tabela:
+
+    - `valores_categoricos`: para colunas categóricas, os pares (valor, valor normalizado) de cada
+      categoria, usados para transformar o LIKE em `coluna IN (...)` apoiado por um índice comum;
+    - `colunas_fts`: demais colunas de texto, normalizadas na tabela FTS5 `<tabela>__busca`
+      indexada por trigramas.
+    """
+
+    def __init__(self, colunas_fts=None, valores_categoricos=None):
+        self.colunas_fts = set(colunas_fts or ())
+        self.valores_categoricos = dict(valores_categoricos or {})
+
+    def __contains__(self, coluna):
+        return coluna in self.colunas_fts or coluna in self.valores_categoricos
+
+    def valores_que_casam(self, coluna: str, padrao: str) -> list:
+        """Categorias da coluna cujo valor normalizado casa com o padrão LIKE (já normalizado)."""
+        regex = _padrao_like_para_regex(padrao)
+        return [valor for valor, normalizado in self.valores_categoricos[coluna] if regex.fullmatch(normalizado)]
+
+
+def criar_indice_texto(conexao, nome_tabela: str, df: pd.DataFrame) -> IndiceTextoTabela:
+    """
+    Prepara a busca de texto de uma tabela recém-criada por `to_sql` a partir de `df`:
+    índices comuns nas colunas categóricas e a tabela FTS5 `<nome_tabela>__busca`, com uma coluna
+    normalizada (`normalizar_texto`) para cada uma das demais colunas de texto. O rowid de cada
+    linha da tabela FTS5 é o mesmo da tabela base.
+
+    Se o SQLite não tiver o FTS5 ou o tokenizador de trigramas, a tabela de busca não é criada e
+    os filtros nessas colunas continuam como `LOWER(coluna) LIKE`, sem reescrita.
+    """
+    tabela_busca = f'"{nome_tabela}{SUFIXO_TABELA_BUSCA}"'
+    conexao.execute(f"DROP TABLE IF EXISTS {tabela_busca}")
+
+    valores_categoricos = {}
+    colunas = []
+    for coluna in colunas_de_texto(df):
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype) and len(serie.cat.categories) <= MAX_CATEGORIAS_FILTRO_IN:
+            categorias = [str(valor) for valor in serie.cat.categories]
+            valores_categoricos[coluna] = list(zip(categorias, map(normalizar_texto, categorias)))
+            conexao.execute(f'CREATE INDEX IF NOT EXISTS "ix_{nome_tabela}_{coluna}" ON "{nome_tabela}" ("{coluna}")')
+        else:
+            colunas.append(coluna)
+    if not colunas:
+        return IndiceTextoTabela(valores_categoricos=valores_categoricos)
+
+    definicao = ", ".join(f'"{coluna}"' for coluna in colunas)
+    try:
+        conexao.execute(f"CREATE VIRTUAL TABLE {tabela_busca} USING fts5({definicao}, tokenize='{TOKENIZADOR_FTS}', detail=none)")
+    except sqlite3.OperationalError:
+        return IndiceTextoTabela(valores_categoricos=valores_categoricos)
+    normalizadas = pd.DataFrame({coluna: _normalizar_serie(df[coluna]) for coluna in colunas})
+    normalizadas = normalizadas.astype(object).where(normalizadas.notna(), None)
+    marcadores = ", ".join("?" for _ in range(len(colunas) + 1))
+    with conexao:
+        conexao.executemany(
+            f"INSERT INTO {tabela_busca}(rowid, {definicao}) VALUES ({marcadores})",
+            ((rowid, *valores) for rowid, valores in enumerate(normalizadas.itertuples(index=False, name=None), start=1)),
+        )
+    return IndiceTextoTabela(colunas, valores_categoricos)
+
+
+def remover_indice_texto(conexao, nome_tabela: str):
+    conexao.execute(f'DROP TABLE IF EXISTS "{nome_tabela}{SUFIXO_TABELA_BUSCA}"')
+
+
+def _nulo_se_coluna_nula(coluna: str, condicao: str) -> str:
+    return f"CASE WHEN {coluna} IS NULL THEN NULL ELSE {condicao} END"
+
+
+def reescrever_buscas_texto(query: str, indices: dict) -> str:
+    """
+    Reescreve filtros `LOWER(coluna) LIKE LOWER('%valor%')` para usar os índices de texto:
+
+    - colunas categóricas: `coluna IN ('categoria', ...)` com as categorias que casam com o padrão;
+    - demais colunas: `rowid IN (SELECT rowid FROM "<tabela>__busca" WHERE "coluna" LIKE '%valor%')`.
+
+    Em ambos os casos a comparação ignora caixa e acentos. Como o LIKE original, o filtro reescrito
+    vale NULL quando a coluna é NULL (o `rowid IN` e o `IN ()` vazio valeriam falso), para que
+    `NOT LOWER(coluna) LIKE ...` continue sem trazer essas linhas. Colunas sem alias só são reescritas quando
+    pertencem a exatamente uma das tabelas da consulta; filtros que não puderem ser atribuídos a uma
+    tabela indexada ficam inalterados.
+
+    Args:
+        indices (dict): {'nome_da_tabela': IndiceTextoTabela}.
+    """
+    aliases = tabelas_por_alias(query, indices)
+    tabelas_na_consulta = set(aliases.values())
+
+    def substituir(match):
+        alias, coluna, padrao_lower, padrao = match.groups()
+        coluna_sem_aspas = coluna.strip('"')
+        if alias:
+            tabela = aliases.get(alias.lower())
+        else:
+            candidatas = [t for t in tabelas_na_consulta if coluna_sem_aspas in indices[t]]
+            tabela = candidatas[0] if len(candidatas) == 1 else None
+        if tabela is None or coluna_sem_aspas not in indices[tabela]:
+            return match.group(0)
+
+        valor = normalizar_texto((padrao_lower if padrao_lower is not None else padrao).replace("''", "'"))
+        if coluna_sem_aspas in indices[tabela].valores_categoricos:
+            valores = indices[tabela].valores_que_casam(coluna_sem_aspas, valor)
+            lista = ", ".join("'" + v.replace("'", "''") + "'" for v in valores)
+            prefixo = f"{alias}." if alias else ""
+            if not valores:
+                return _nulo_se_coluna_nula(f'{prefixo}"{coluna_sem_aspas}"', "0")
+            return f'{prefixo}"{coluna_sem_aspas}" IN ({lista})'
+
+        valor = valor.replace("'", "''")
+        if not alias:
+            # Sem alias na coluna: usa o alias da tabela na consulta, se houver um único.
+            apelidos = [a for a, t in aliases.items() if t == tabela and a != tabela.lower()]
+            alias = apelidos[0] if len(apelidos) == 1 else f'"{tabela}"'
+        prefixo = f"{alias}."
+        return _nulo_se_coluna_nula(
+            f'{prefixo}"{coluna_sem_aspas}"',
+            f'{prefixo}rowid IN (SELECT rowid FROM "{tabela}{SUFIXO_TABELA_BUSCA}" '
+            f"WHERE \"{coluna_sem_aspas}\" LIKE '{valor}')",
+        )
+
+    return _RE_BUSCA_TEXTO.sub(substituir, query)
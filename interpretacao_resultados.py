@@ -0,0 +1,238 @@
+import math
+
+import pandas as pd
+from langchain_core.messages import SystemMessage, HumanMessage
+
+PROMPT_SISTEMA_INTERPRETADOR = """
+Você vai receber um dataframe que foi convertido em markdown e a pergunta original que o usuário fez.
+Seu objetivo é repassar os itens que foram passados para você de uma forma mais limpa.
+Leia esse dataframe ATENTAMENTE, SEM OMITIR DADOS, e responda a pergunta original do usuário com base nesse dataframe
+
+PONTOS IMPORTANTES:
+1. O usuário precisa de todas as informações que vierem dentro do dataframe, não omita infromações.
+2. Você deve responder a pergunta SOMENTE com os dados que foram fornecidos no dataframe, NÃO CRIE NEM SUPONHA NADA.
+3. Responda SEMPRE em português do Brasil
+4. Tome cuidado para não deixar passar informações importantes que estarão no prompt que você receber
+"""
+PROMPT_SISTEMA_RESUMO = """
+Você vai receber um RESUMO estatístico de um resultado de consulta grande demais para ser enviado por inteiro,
+e a pergunta original que o usuário fez. O resultado completo já está sendo exibido ao usuário em uma tabela.
+
+PONTOS IMPORTANTES:
+1. Responda a pergunta SOMENTE com os números e valores presentes no resumo, NÃO CRIE NEM SUPONHA NADA.
+2. Deixe claro que a resposta se baseia em um resumo (totais, principais grupos e amostra) do resultado completo.
+3. Se o resumo avisar que parte dos dados ficou de fora (grupos agregados, amostra ou resultado limitado), diga isso
+   ao usuário e não trate os valores mostrados como se fossem todos.
+4. Responda SEMPRE em português do Brasil
+"""
+PROMPT_SISTEMA_MAPEAMENTO = """
+Você vai receber um BLOCO de um resultado de consulta muito grande e a pergunta original do usuário.
+Extraia, em português do Brasil e de forma compacta, apenas os fatos e números deste bloco que ajudam a responder
+a pergunta. Não invente nada que não esteja no bloco.
+"""
+PROMPT_SISTEMA_REDUCAO = """
+Você vai receber NOTAS PARCIAIS extraídas de blocos de um resultado de consulta muito grande e a pergunta original
+do usuário. Combine as notas, em português do Brasil e de forma compacta, em uma única nota com os fatos e números
+que ajudam a responder a pergunta. Mantenha os avisos sobre dados que ficaram de fora. Não invente nada.
+"""
+
+# --- Orçamento de tokens ---
+# Estimativa conservadora de caracteres por token para texto em português/markdown.
+CARACTERES_POR_TOKEN = 3.5
+# Orçamento fixo e pequeno para os dados: a latência e o custo da interpretação crescem com o prompt,
+# então resultados maiores vão como resumo (que avisa o que ficou de fora) ou por map_reduce.
+LIMITE_TOKENS_DADOS = 4000
+TOP_K_GRUPOS = 15
+# No modo map_reduce, no máximo este número de blocos é enviado ao LLM; além dele, blocos igualmente
+# espaçados ao longo do resultado, e o prompt avisa quantos ficaram de fora.
+MAX_BLOCOS_MAP_REDUCE = 12
+# Rodadas de combinação das notas parciais até caberem no orçamento; o que ainda sobrar é truncado.
+MAX_ETAPAS_REDUCAO = 3
+LINHAS_AMOSTRA = 10
+# Textos longos (nomes de atividades, descrições) são truncados dentro do resumo.
+MAX_CARACTERES_VALOR = 60
+
+
+def estimar_tokens(texto: str) -> int:
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def estimar_tokens_markdown(df: pd.DataFrame, linhas_amostra: int = 50) -> int:
+    """Estima os tokens de `df.to_markdown()` a partir de uma amostra, sem renderizar a tabela inteira."""
+    if len(df) <= linhas_amostra:
+        return estimar_tokens(df.to_markdown())
+    return math.ceil(estimar_tokens(df.head(linhas_amostra).to_markdown()) * len(df) / linhas_amostra)
+
+
+def _truncar(valor):
+    texto = str(valor)
+    return texto if len(texto) <= MAX_CARACTERES_VALOR else texto[:MAX_CARACTERES_VALOR - 1] + "…"
+
+
+def resumir_dataframe(df: pd.DataFrame, top_k: int = TOP_K_GRUPOS, linhas_amostra: int = LINHAS_AMOSTRA) -> str:
+    """
+    Gera localmente um resumo compacto em markdown de um DataFrame grande:
+    totais, estatísticas das colunas numéricas, principais valores das colunas de texto
+    e uma pequena amostra de linhas. Todas as agregações são vetorizadas no pandas.
+    """
+    partes = [f"Total de registros: {len(df)}", f"Colunas: {', '.join(map(str, df.columns))}"]
+
+    numericas = df.select_dtypes(include="number")
+    dimensoes = df.drop(columns=numericas.columns)
+
+    if len(numericas.columns) == 1 and len(dimensoes.columns) >= 1:
+        # Formato típico de GROUP BY + COUNT/SUM: mostra os maiores grupos e agrega o restante.
+        metrica = numericas.columns[0]
+        ordenado = df.sort_values(metrica, ascending=False)
+        principais = ordenado.head(top_k)
+        partes.append(f"Soma de '{metrica}' em todos os registros: {numericas[metrica].sum()}")
+        partes.append(f"Os {len(principais)} maiores grupos por '{metrica}':\n{principais.to_markdown(index=False)}")
+        restantes = ordenado.iloc[top_k:]
+        if not restantes.empty:
+            partes.append(
+                f"ATENÇÃO: só {len(principais)} de {len(df)} grupos estão listados. Os demais {len(restantes)} "
+                f"grupos, não listados, somam {restantes[metrica].sum()} em '{metrica}'."
+            )
+        return "\n\n".join(partes)
+
+    if not numericas.empty:
+        estatisticas = numericas.agg(["count", "sum", "mean", "min", "max"]).T
+        partes.append(f"Estatísticas das colunas numéricas:\n{estatisticas.to_markdown()}")
+
+    # Com muitas colunas, cada uma recebe menos valores para o resumo continuar compacto.
+    top_k_coluna = max(3, min(top_k, top_k * 6 // max(1, len(dimensoes.columns))))
+    for coluna in dimensoes.columns:
+        serie = dimensoes[coluna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            partes.append(f"'{coluna}': de {serie.min()} a {serie.max()}")
+            continue
+        contagem = serie.value_counts(dropna=False)
+        if len(contagem) > top_k_coluna and len(contagem) > len(serie) / 2:
+            # Identificadores e nomes quase únicos: só a cardinalidade é informativa.
+            partes.append(f"'{coluna}' — {len(contagem)} valores distintos em {len(serie)} registros.")
+            continue
+        principais = contagem.head(top_k_coluna)
+        texto = ", ".join(f"{_truncar(valor)} ({quantidade})" for valor, quantidade in principais.items())
+        outros = len(contagem) - len(principais)
+        sufixo = f" e mais {outros} valores distintos" if outros > 0 else ""
+        partes.append(f"'{coluna}' — {len(contagem)} valores distintos. Mais frequentes: {texto}{sufixo}.")
+
+    # Tabelas largas recebem menos linhas de amostra.
+    linhas_amostra = max(2, min(linhas_amostra, 100 // max(1, len(df.columns))))
+    amostra = df.head(linhas_amostra).apply(lambda coluna: coluna.map(_truncar) if coluna.dtype == object else coluna)
+    partes.append(f"Amostra das primeiras {len(amostra)} de {len(df)} linhas (as demais não estão listadas):\n{amostra.to_markdown()}")
+    return "\n\n".join(partes)
+
+
+def _aviso_truncamento(df: pd.DataFrame) -> str:
+    """Aviso para o prompt quando o resultado foi cortado pelo LIMIT automático da execução."""
+    if not df.attrs.get("estatisticas_execucao", {}).get("truncado"):
+        return ""
+    return (f"ATENÇÃO: a consulta retornou mais registros do que o limite de execução; os dados abaixo contêm apenas "
+            f"os primeiros {len(df)} registros.\n\n")
+
+
+def _prompt_dados(pergunta: str, dados: str) -> str:
+    return f"""**PERGUNTA ORIGINAL DO USUÁRIO:**\n{pergunta}\n\n**DADOS DA CONSULTA:**\n{dados}\n\n
+        Com base apenas nos dados acima, responda à pergunta original do usuário.
+        Fique atento para não deixar de listar TODOS os registros em dados da consulta.
+        Não crie informações que não estão dentro dos dados da consulta."""
+
+
+def _prompt_resumo(pergunta: str, resumo: str) -> str:
+    return f"""**PERGUNTA ORIGINAL DO USUÁRIO:**\n{pergunta}\n\n**RESUMO DO RESULTADO DA CONSULTA:**\n{resumo}\n\n
+        Com base apenas no resumo acima, responda à pergunta original do usuário."""
+
+
+def _blocos(df: pd.DataFrame, limite_tokens: int):
+    """Divide o DataFrame inteiro em blocos consecutivos cujo markdown cabe no orçamento."""
+    tokens_por_linha = max(1, estimar_tokens_markdown(df.head(50)) // max(1, min(50, len(df))))
+    linhas_por_bloco = max(1, limite_tokens // tokens_por_linha)
+    return [df.iloc[inicio:inicio + linhas_por_bloco] for inicio in range(0, len(df), linhas_por_bloco)]
+
+
+def _amostrar_blocos(blocos: list, maximo: int = MAX_BLOCOS_MAP_REDUCE) -> list:
+    """Até `maximo` blocos igualmente espaçados, incluindo o primeiro e o último."""
+    if len(blocos) <= maximo:
+        return blocos
+    if maximo == 1:
+        return blocos[:1]
+    return [blocos[round(i * (len(blocos) - 1) / (maximo - 1))] for i in range(maximo)]
+
+
+def _truncar_texto(texto: str, limite_tokens: int) -> str:
+    maximo = int(limite_tokens * CARACTERES_POR_TOKEN)
+    return texto if len(texto) <= maximo else texto[:maximo - 1] + "…"
+
+
+def _reduzir_notas(llm, pergunta: str, notas: list, limite_tokens: int) -> str:
+    """
+    Combina as notas parciais em rodadas (`llm.batch` sobre grupos que cabem no orçamento) até que
+    todas juntas caibam em `limite_tokens`. Cada grupo reúne ao menos duas notas, então o número
+    de notas cai pela metade a cada rodada; após MAX_ETAPAS_REDUCAO rodadas, o texto é truncado.
+    """
+    for _ in range(MAX_ETAPAS_REDUCAO):
+        if len(notas) <= 1 or estimar_tokens("\n\n".join(notas)) <= limite_tokens:
+            break
+        # Cada nota ocupa no máximo um terço do orçamento, para caberem ao menos duas por grupo.
+        notas = [_truncar_texto(nota, limite_tokens // 3) for nota in notas]
+        grupos, atual = [], []
+        for nota in notas:
+            if atual and estimar_tokens("\n\n".join(atual + [nota])) > limite_tokens:
+                grupos.append(atual)
+                atual = []
+            atual.append(nota)
+        grupos.append(atual)
+        respostas = llm.batch([
+            [SystemMessage(content=PROMPT_SISTEMA_REDUCAO),
+             HumanMessage(content=f"**PERGUNTA ORIGINAL DO USUÁRIO:**\n{pergunta}\n\n**NOTAS PARCIAIS:**\n" + "\n\n".join(grupo))]
+            for grupo in grupos
+        ])
+        notas = [resposta.content for resposta in respostas]
+    return _truncar_texto("\n\n".join(notas), limite_tokens)
+
+
+def preparar_interpretacao(llm, pergunta: str, df: pd.DataFrame, limite_tokens: int = LIMITE_TOKENS_DADOS):
+    """
+    Monta as mensagens da chamada final de interpretação de acordo com o tamanho do resultado.
+
+    - 'completo': o markdown inteiro cabe no orçamento e é enviado sem alterações (comportamento original);
+    - 'resumo': envia um resumo local gerado por `resumir_dataframe`;
+    - 'map_reduce': o próprio resumo excede o orçamento; até MAX_BLOCOS_MAP_REDUCE blocos do resultado
+      (igualmente espaçados, se houver mais) são resumidos pelo LLM em paralelo (`llm.batch`, etapa de
+      mapeamento), e as notas parciais são combinadas em rodadas (`_reduzir_notas`) até caberem no
+      orçamento da chamada final.
+
+    Quando o resultado foi cortado pelo LIMIT da execução, o prompt avisa o modelo.
+
+    Returns:
+        Uma tupla (mensagens, modo, tokens_estimados) onde mensagens vai para `llm.invoke`/`llm.stream`.
+    """
+    aviso = _aviso_truncamento(df)
+    if estimar_tokens_markdown(df) <= limite_tokens:
+        prompt = _prompt_dados(pergunta, aviso + df.to_markdown())
+        return [SystemMessage(content=PROMPT_SISTEMA_INTERPRETADOR), HumanMessage(content=prompt)], "completo", estimar_tokens(prompt)
+
+    resumo = resumir_dataframe(df)
+    if estimar_tokens(resumo) <= limite_tokens:
+        prompt = _prompt_resumo(pergunta, aviso + resumo)
+        return [SystemMessage(content=PROMPT_SISTEMA_RESUMO), HumanMessage(content=prompt)], "resumo", estimar_tokens(prompt)
+
+    todos_blocos = _blocos(df, limite_tokens)
+    blocos = _amostrar_blocos(todos_blocos)
+    respostas = llm.batch([
+        [SystemMessage(content=PROMPT_SISTEMA_MAPEAMENTO),
+         HumanMessage(content=f"**PERGUNTA ORIGINAL DO USUÁRIO:**\n{pergunta}\n\n**BLOCO {numero}:**\n{bloco.to_markdown()}")]
+        for numero, bloco in enumerate(blocos, start=1)
+    ])
+    notas = [
+        f"Bloco {numero} (linhas {bloco.index[0]}–{bloco.index[-1]}): {resposta.content}"
+        for numero, (bloco, resposta) in enumerate(zip(blocos, respostas), start=1)
+    ]
+    cabecalho = aviso + f"Total de registros: {len(df)}\nColunas: {_truncar_texto(', '.join(map(str, df.columns)), limite_tokens // 8)}"
+    if len(blocos) < len(todos_blocos):
+        cabecalho += (f"\n\nATENÇÃO: só {len(blocos)} de {len(todos_blocos)} blocos do resultado, igualmente espaçados, "
+                      f"foram lidos; as notas abaixo não cobrem os demais registros.")
+    notas = _reduzir_notas(llm, pergunta, notas, limite_tokens - estimar_tokens(cabecalho))
+    prompt = _prompt_resumo(pergunta, cabecalho + "\n\n" + notas)
+    return [SystemMessage(content=PROMPT_SISTEMA_RESUMO), HumanMessage(content=prompt)], "map_reduce", estimar_tokens(prompt)
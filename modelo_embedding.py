@@ -0,0 +1,27 @@
+import os
+import threading
+
+NOME_MODELO_EMBEDDING = "intfloat/multilingual-e5-small"
+# Backend opcional do sentence-transformers para inferência em CPU ("onnx" ou "openvino").
+# Vazio usa o backend padrão (torch).
+VARIAVEL_BACKEND = "SEBRAE_EMBEDDING_BACKEND"
+
+_modelo = None
+_lock = threading.Lock()
+
+
+def obter_modelo_embedding():
+    """
+    Retorna o modelo de embedding compartilhado pelo processo, carregando os pesos uma única vez.
+    Usado tanto na criação da base RAG (`populacao_rag`) quanto no retriever e no cache do app.
+    """
+    global _modelo
+    with _lock:
+        if _modelo is None:
+            # Import tardio: torch/transformers só são carregados quando o modelo é de fato necessário.
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            backend = os.environ.get(VARIAVEL_BACKEND, "").strip()
+            model_kwargs = {"backend": backend} if backend else {}
+            _modelo = HuggingFaceEmbeddings(model_name=NOME_MODELO_EMBEDDING, model_kwargs=model_kwargs)
+        return _modelo
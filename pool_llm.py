@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from functools import reduce
+
+from langchain_core.messages import AIMessageChunk
+
+# Limites do pool, ajustáveis por variável de ambiente conforme a cota do provedor do LLM.
+VARIAVEL_MAX_CONCORRENTES = "SEBRAE_LLM_MAX_CONCORRENTES"
+VARIAVEL_MAX_FILA = "SEBRAE_LLM_MAX_FILA"
+MAX_CONCORRENTES_PADRAO = 4
+MAX_FILA_PADRAO = 32
+# Intervalo, em segundos, entre os avisos de posição na fila para quem está aguardando.
+INTERVALO_AVISO_FILA = 0.5
+
+
+class FilaCheia(Exception):
+    """Há pedidos demais aguardando; o novo pedido é recusado em vez de esperar indefinidamente."""
+
+
+def chave_mensagens(mensagens) -> str:
+    """Identifica um pedido pelo tipo e conteúdo de cada mensagem."""
+    conteudo = json.dumps([(m.type, m.content) for m in mensagens], ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class _Chamada:
+    """Estado de uma chamada ao LLM, lido por todas as threads que pediram a mesma coisa."""
+
+    def __init__(self):
+        self.trechos = []
+        self.iniciada = False
+        self.concluida = False
+        self.erro = None
+        self.condicao = threading.Condition()
+
+    def atualizar(self, **campos):
+        with self.condicao:
+            for nome, valor in campos.items():
+                setattr(self, nome, valor)
+            self.condicao.notify_all()
+
+    def adicionar(self, trecho):
+        with self.condicao:
+            self.trechos.append(trecho)
+            self.condicao.notify_all()
+
+    def ler(self, posicao_na_fila, ao_aguardar=None):
+        """Gera os trechos conforme chegam; `ao_aguardar(posicao)` é chamado enquanto a chamada está na fila."""
+        lidos = 0
+        avisou = False
+        while True:
+            with self.condicao:
+                if lidos >= len(self.trechos) and not self.concluida:
+                    self.condicao.wait(INTERVALO_AVISO_FILA)
+                novos = self.trechos[lidos:]
+                iniciada, concluida, erro = self.iniciada, self.concluida, self.erro
+            if ao_aguardar is not None:
+                if not iniciada and not concluida:
+                    ao_aguardar(posicao_na_fila())
+                    avisou = True
+                elif avisou:
+                    ao_aguardar(0)
+                    avisou = False
+            for trecho in novos:
+                yield trecho
+            lidos += len(novos)
+            if concluida and lidos >= len(self.trechos):
+                if erro is not None:
+                    raise erro
+                return
+
+
+class PoolLLM:
+    """
+    Acesso compartilhado ao LLM para todas as sessões do app.
+
+    - No máximo `max_concorrentes` chamadas simultâneas, executadas com `llm.astream` em um event
+      loop asyncio próprio (uma thread), sem ocupar uma thread por chamada em andamento.
+    - Pedidos idênticos em andamento (mesmas mensagens) são coalescidos: todos leem a mesma
+      chamada, trecho a trecho.
+    - Com `max_fila` pedidos aguardando vaga, novos pedidos recebem `FilaCheia`.
+
+    Expõe `stream`, `invoke` e `batch` como o modelo de chat, então pode substituí-lo no pipeline.
+    """
+
+    def __init__(self, llm, max_concorrentes: int = MAX_CONCORRENTES_PADRAO, max_fila: int = MAX_FILA_PADRAO):
+        self.llm = llm
+        self.max_concorrentes = max_concorrentes
+        self.max_fila = max_fila
+        self._loop = asyncio.new_event_loop()
+        self._semaforo = asyncio.Semaphore(max_concorrentes)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="pool-llm", daemon=True)
+        self._thread.start()
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self._fila = []
+        self._executando = 0
+        self.estatisticas = {"pedidos": 0, "chamadas": 0, "coalescidos": 0, "recusados": 0}
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {"em_execucao": self._executando, "na_fila": len(self._fila), "capacidade": self.max_concorrentes,
+                    **self.estatisticas}
+
+    def _posicao(self, chamada):
+        with self._lock:
+            return self._fila.index(chamada) + 1 if chamada in self._fila else 0
+
+    async def _executar(self, chave, chamada, mensagens):
+        try:
+            async with self._semaforo:
+                with self._lock:
+                    self._fila.remove(chamada)
+                    self._executando += 1
+                chamada.atualizar(iniciada=True)
+                try:
+                    if hasattr(self.llm, "astream"):
+                        async for trecho in self.llm.astream(mensagens):
+                            chamada.adicionar(trecho)
+                    else:
+                        for trecho in await asyncio.to_thread(lambda: list(self.llm.stream(mensagens))):
+                            chamada.adicionar(trecho)
+                finally:
+                    with self._lock:
+                        self._executando -= 1
+        except Exception as e:
+            chamada.atualizar(erro=e)
+        finally:
+            with self._lock:
+                if chamada in self._fila:
+                    self._fila.remove(chamada)
+                if self._em_andamento.get(chave) is chamada:
+                    del self._em_andamento[chave]
+            chamada.atualizar(concluida=True)
+
+    def _obter_chamada(self, mensagens):
+        chave = chave_mensagens(mensagens)
+        with self._lock:
+            self.estatisticas["pedidos"] += 1
+            chamada = self._em_andamento.get(chave)
+            if chamada is not None:
+                self.estatisticas["coalescidos"] += 1
+                return chamada
+            if len(self._fila) >= self.max_fila:
+                self.estatisticas["recusados"] += 1
+                raise FilaCheia(f"{len(self._fila)} pedidos já aguardam o modelo de linguagem.")
+            chamada = _Chamada()
+            self._em_andamento[chave] = chamada
+            self._fila.append(chamada)
+            self.estatisticas["chamadas"] += 1
+        asyncio.run_coroutine_threadsafe(self._executar(chave, chamada, mensagens), self._loop)
+        return chamada
+
+    def stream(self, mensagens, ao_aguardar=None):
+        """
+        Os trechos (AIMessageChunk) da resposta, como `llm.stream`. Enquanto o pedido aguarda vaga,
+        `ao_aguardar(posicao)` é chamado periodicamente com a posição na fila, e uma última vez com 0
+        quando a chamada começa.
+
+        Raises:
+            FilaCheia: se a fila já estiver no limite (levantada aqui, antes de iterar).
+        """
+        chamada = self._obter_chamada(mensagens)
+        return chamada.ler(lambda: self._posicao(chamada), ao_aguardar)
+
+    def invoke(self, mensagens, ao_aguardar=None):
+        return reduce(lambda a, b: a + b, self.stream(mensagens, ao_aguardar), AIMessageChunk(content=""))
+
+    def batch(self, lista_mensagens):
+        """
+        As respostas de vários pedidos, na ordem recebida, como `llm.batch`. Os pedidos entram no pool
+        em levas de `max_concorrentes`, que rodam em paralelo sem ocupar a fila das outras sessões.
+
+        Raises:
+            FilaCheia: se a fila já estiver no limite ao enviar uma leva.
+        """
+        respostas = []
+        for inicio in range(0, len(lista_mensagens), self.max_concorrentes):
+            chamadas = [self._obter_chamada(mensagens) for mensagens in lista_mensagens[inicio:inicio + self.max_concorrentes]]
+            respostas.extend(
+                reduce(lambda a, b: a + b, chamada.ler(lambda: 0), AIMessageChunk(content="")) for chamada in chamadas
+            )
+        return respostas
+
+    def fechar(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def criar_pool_llm(llm) -> PoolLLM:
+    """Cria o pool com os limites definidos por SEBRAE_LLM_MAX_CONCORRENTES e SEBRAE_LLM_MAX_FILA."""
+    return PoolLLM(
+        llm,
+        max_concorrentes=int(os.environ.get(VARIAVEL_MAX_CONCORRENTES, MAX_CONCORRENTES_PADRAO)),
+        max_fila=int(os.environ.get(VARIAVEL_MAX_FILA, MAX_FILA_PADRAO)),
+    )
@@ -1,7 +1,65 @@
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from modelo_embedding import NOME_MODELO_EMBEDDING, obter_modelo_embedding
+from recuperador_esquema import IndiceVetorial
+import argparse
+import hashlib
+import json
 import os
+import re
+import shutil
+
+ARQUIVO_HASH = "hash_conteudo.txt"
+DIRETORIO_BASE_PADRAO = "base_vetorial_esquema"
+
+# Colunas usadas para relacionar as duas tabelas; sempre enviadas ao LLM junto com as colunas recuperadas.
+CHAVES_JUNCAO = {
+    "ot_consolidada": ["assessment_id", "forms_number"],
+    "nx_org_group_classified_v2": ["forms_assessment_id", "forms_number"],
+}
+
+# Perguntas e SQL de exemplo, indexados como documentos próprios.
+EXEMPLOS_SQL = [
+    (
+        "Quantas avaliações existem em cada Unidade do Sebrae (UF)?",
+        "SELECT forms_uf, COUNT(*) AS total FROM nx_org_group_classified_v2 GROUP BY forms_uf ORDER BY total DESC",
+        ["nx_org_group_classified_v2"],
+    ),
+    (
+        "Quantos formulários do tipo RAT existem em cada unidade organizacional no estado de São Paulo?",
+        "SELECT forms_org_grupo_name, COUNT(*) AS total FROM nx_org_group_classified_v2 "
+        "WHERE LOWER(flag_ropa_rat) LIKE LOWER('%rat%') AND LOWER(forms_uf) LIKE LOWER('%sp%') "
+        "GROUP BY forms_org_grupo_name ORDER BY total DESC",
+        ["nx_org_group_classified_v2"],
+    ),
+    (
+        "Quantas avaliações foram concluídas em cada ano?",
+        "SELECT end_date_year, COUNT(*) AS total FROM nx_org_group_classified_v2 "
+        "WHERE LOWER(forms_status) LIKE LOWER('%completed%') GROUP BY end_date_year ORDER BY end_date_year",
+        ["nx_org_group_classified_v2"],
+    ),
+    (
+        "Quantas avaliações foram criadas em maio de 2024?",
+        "SELECT COUNT(*) AS total FROM nx_org_group_classified_v2 WHERE forms_create_dt LIKE '2024-05%'",
+        ["nx_org_group_classified_v2"],
+    ),
+    (
+        "Quantas avaliações com risco residual alto existem por unidade organizacional?",
+        "SELECT forms_org_grupo_name, COUNT(*) AS total FROM nx_org_group_classified_v2 "
+        "WHERE LOWER(assessment_risk_level_name) LIKE LOWER('%high%') GROUP BY forms_org_grupo_name ORDER BY total DESC",
+        ["nx_org_group_classified_v2"],
+    ),
+    (
+        "Quantas respostas com risco existem em cada atividade de tratamento de dados?",
+        "SELECT n.forms_name, COUNT(*) AS total FROM ot_consolidada o "
+        "JOIN nx_org_group_classified_v2 n ON o.assessment_id = n.forms_assessment_id "
+        "WHERE o.section_questions_risk_score >= 1 GROUP BY n.forms_name ORDER BY total DESC",
+        ["ot_consolidada", "nx_org_group_classified_v2"],
+    ),
+]
+# `coluna (apelido): descrição`, com o apelido opcional; o apelido vai até o primeiro "):", então
+# pode conter parênteses (ex.: "(Tipo (ex: RAT))").
+_RE_COLUNA = re.compile(r"^\s*-?\s*(\w+)\s*(?:\((.*?)\))?\s*:\s*(.+?)\s*$")
+_RE_CABECALHO = re.compile(r"^\s*(Caminho|Nome da Tabela|Descrição)\s*:\s*(.*?)\s*$")
 
 def criar_documentos_de_conhecimento():
     """
@@ -71,6 +129,7 @@ def criar_documentos_de_conhecimento():
     forms_number (numero atividade): número da atividade de tratamento de dados 
     inventory_processing_activities_id (): id do inventário é se relacionada de maneira aglutinas todas as avaliação de tratamento de dados, testes de balanceamento, relatórios de impacto a proteção de dados, análises do DPO, sobre um respectiva atividade, que pode ser recorrente ou não. Exemplo: Folha de Pagamento do Sebrae/PR, formulário para capção de dados de ujm evento específico. 
     inventory_processing_activities_name (): Nome do inventário é se relacionada de maneira aglutinas todas as avaliação de tratamento de dados, testes de balanceamento, relatórios de impacto a proteção de dados, análises do DPO, sobre um respectiva atividade, que pode ser recorrente ou não. Exemplo: Folha de Pagamento do Sebrae/PR, formulário para capção de dados de ujm evento específico. 
+    inventory_processing_activities_status (status inventario): Status do inventário de dados relacionado à atividade: active (ativo), archived (arquivado) ou NI (não informado) 
     flag_ropa_rat (): Classifica os forms_template_name por versões, ROPA é uma versão antiga já descontinuada e RAT éa versão mais atual das Avaliações de Tratamento de Dados. 
     mitigacao_risco (mitigacao_risco): Descreve o comportamento do risco, comparando o risco inerente (inherent_risk_level_name) e o risco residual (assessment_risk_level_name) com isso é possível identificar a mitigação ou o aumento do risco diante da variável stage_name="monitoramento", somente neste estágio é feito o tratamento do risco. O risco inerente é identificado no início do processo e o risco residual é definido na fase final. Só podendo afirmar sobre mitigação ou aumento do risco diante do estágio de monitoramento. 
     tratamento_risco (comportamento_risco): comparação simples entre o risco inerente () e o risco residual () 
@@ -107,31 +166,107 @@ def criar_documentos_de_conhecimento():
     print(f"{len(documentos)} documentos criados.")
     return documentos
 
-def criar_base_de_conhecimento_rag(documentos, nome_diretorio_db="base_chroma_db"):
+def criar_documentos_por_coluna(documentos_tabela=None):
+    """
+    Divide os esquemas de `criar_documentos_de_conhecimento` em documentos menores para a recuperação:
+    um cabeçalho por tabela (tipo 'tabela'), um documento por coluna (tipo 'coluna') e um por exemplo
+    de pergunta/SQL (tipo 'exemplo'). Todos carregam a tabela nos metadados.
+    """
+    if documentos_tabela is None:
+        documentos_tabela = criar_documentos_de_conhecimento()
+
+    documentos = []
+    for doc in documentos_tabela:
+        cabecalho = {}
+        colunas = []
+        for linha in doc.page_content.splitlines():
+            campo = _RE_CABECALHO.match(linha)
+            coluna = _RE_COLUNA.match(linha)
+            if campo:
+                cabecalho[campo.group(1)] = campo.group(2)
+            elif coluna:
+                colunas.append(coluna.groups())
+        tabela = cabecalho.get("Nome da Tabela")
+        if not tabela:
+            continue
+
+        documentos.append(Document(
+            page_content=f"Tabela {tabela}: {cabecalho.get('Descrição', '')}",
+            metadata={"fonte": doc.metadata.get("fonte"), "tipo": "tabela", "tabela": tabela},
+        ))
+        for nome, apelido, descricao in colunas:
+            texto_apelido = f" ({apelido})" if apelido else ""
+            documentos.append(Document(
+                page_content=f"{nome}{texto_apelido}: {descricao}",
+                metadata={
+                    "fonte": doc.metadata.get("fonte"), "tipo": "coluna", "tabela": tabela, "coluna": nome,
+                    "chave_juncao": nome in CHAVES_JUNCAO.get(tabela, []),
+                },
+            ))
+
+    for numero, (pergunta, sql, tabelas) in enumerate(EXEMPLOS_SQL, start=1):
+        documentos.append(Document(
+            page_content=f"Pergunta: {pergunta}\nSQL: {sql}",
+            metadata={"fonte": f"exemplo_sql_{numero}", "tipo": "exemplo", "tabela": ",".join(tabelas)},
+        ))
+    print(f"{len(documentos)} documentos por coluna/exemplo criados.")
+    return documentos
+
+def hash_documentos(documentos):
     """
-    Função atualizada para usar ChromaDB.
+    Hash do conteúdo que define a base: texto e metadados dos documentos e o modelo de embedding.
+    """
+    sha = hashlib.sha256(NOME_MODELO_EMBEDDING.encode())
+    for doc in documentos:
+        sha.update(doc.page_content.encode())
+        sha.update(json.dumps(doc.metadata, sort_keys=True).encode())
+    return sha.hexdigest()
+
+def base_de_conhecimento_atualizada(documentos, nome_diretorio_db=DIRETORIO_BASE_PADRAO):
+    """
+    Verifica se já existe uma base pré-construída em `nome_diretorio_db` para exatamente estes documentos.
+    """
+    caminho_hash = os.path.join(nome_diretorio_db, ARQUIVO_HASH)
+    if not os.path.exists(caminho_hash):
+        return False
+    with open(caminho_hash, encoding="utf-8") as f:
+        return f.read().strip() == hash_documentos(documentos)
+
+def criar_base_de_conhecimento_rag(documentos, nome_diretorio_db=DIRETORIO_BASE_PADRAO):
+    """
+    Calcula os embeddings dos documentos (normalmente os de `criar_documentos_por_coluna`) e grava o
+    índice vetorial em `nome_diretorio_db`, junto com o hash do conteúdo usado por
+    `base_de_conhecimento_atualizada`.
     """
     try:
         print("Inicializando o modelo de embedding...")
-        modelo_embedding = HuggingFaceEmbeddings(model_name="intfloat/multilingual-e5-small")
-
-        print(f"Criando e persistindo o banco de dados Chroma na pasta '{nome_diretorio_db}'...")
-        # O ChromaDB cria e persiste os dados no diretório especificado de uma só vez.
-        db_vetorial = Chroma.from_documents(
-            documents=documentos,
-            embedding=modelo_embedding,
-            persist_directory=nome_diretorio_db  # <--- MUDANÇA AQUI
-        )
-        
-        print("\nBase de conhecimento criada com ChromaDB e salva com sucesso!")
-        return db_vetorial
+        modelo_embedding = obter_modelo_embedding()
+
+        print(f"Criando e persistindo o índice vetorial na pasta '{nome_diretorio_db}'...")
+        shutil.rmtree(nome_diretorio_db, ignore_errors=True)
+        indice = IndiceVetorial.construir(documentos, modelo_embedding)
+        indice.salvar(nome_diretorio_db)
+        with open(os.path.join(nome_diretorio_db, ARQUIVO_HASH), "w", encoding="utf-8") as f:
+            f.write(hash_documentos(documentos))
+
+        print("\nBase de conhecimento criada e salva com sucesso!")
+        return indice
 
     except Exception as e:
-        print(f"Ocorreu um erro ao criar a base de conhecimento com ChromaDB: {e}")
+        print(f"Ocorreu um erro ao criar a base de conhecimento: {e}")
         return None
 
-# --- Bloco de Execução Principal ---
+# Pré-constrói o índice fora do app (ex.: no build do container):
+#   python populacao_rag.py [--diretorio base_vetorial_esquema] [--forcar]
 if __name__ == "__main__":
-    documentos_base = criar_documentos_de_conhecimento()
+    parser = argparse.ArgumentParser(description="Cria a base de conhecimento RAG (índice vetorial) antecipadamente.")
+    parser.add_argument("--diretorio", default=DIRETORIO_BASE_PADRAO, help="Diretório onde o índice será persistido.")
+    parser.add_argument("--forcar", action="store_true", help="Recria a base mesmo que o hash do conteúdo não tenha mudado.")
+    args = parser.parse_args()
+
+    documentos_base = criar_documentos_por_coluna()
     if documentos_base:
-        criar_base_de_conhecimento_rag(documentos_base)
\ No newline at end of file
+        if not args.forcar and base_de_conhecimento_atualizada(documentos_base, args.diretorio):
+            print(f"A base em '{args.diretorio}' já corresponde ao conteúdo atual. Nada a fazer.")
+        else:
+            criar_base_de_conhecimento_rag(documentos_base, nome_diretorio_db=args.diretorio)
\ No newline at end of file
@@ -0,0 +1,145 @@
+import json
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Prefixos esperados pelos modelos E5 para diferenciar consultas de passagens.
+PREFIXO_CONSULTA = "query: "
+PREFIXO_DOCUMENTO = "passage: "
+ARQUIVO_EMBEDDINGS = "embeddings.npy"
+ARQUIVO_DOCUMENTOS = "documentos.json"
+
+K_COLUNAS_PADRAO = 8
+K_EXEMPLOS_PADRAO = 2
+
+
+def _normalizar_linhas(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+class IndiceVetorial:
+    """
+    Índice vetorial em processo: uma matriz NumPy de embeddings normalizados e a lista de documentos.
+    A busca é um produto matricial seguido de `argpartition`, em lote para várias consultas.
+    Persistido como `embeddings.npy` (aberto com memory-map) e `documentos.json`.
+    """
+
+    def __init__(self, matriz, documentos):
+        self.matriz = matriz
+        self.documentos = documentos
+
+    @classmethod
+    def construir(cls, documentos, modelo_embedding):
+        textos = [PREFIXO_DOCUMENTO + doc.page_content for doc in documentos]
+        matriz = np.asarray(modelo_embedding.embed_documents(textos), dtype=np.float32)
+        return cls(_normalizar_linhas(matriz), documentos)
+
+    def salvar(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        np.save(os.path.join(diretorio, ARQUIVO_EMBEDDINGS), self.matriz)
+        with open(os.path.join(diretorio, ARQUIVO_DOCUMENTOS), "w", encoding="utf-8") as f:
+            json.dump([{"page_content": d.page_content, "metadata": d.metadata} for d in self.documentos], f, ensure_ascii=False)
+
+    @classmethod
+    def carregar(cls, diretorio):
+        matriz = np.load(os.path.join(diretorio, ARQUIVO_EMBEDDINGS), mmap_mode="r")
+        with open(os.path.join(diretorio, ARQUIVO_DOCUMENTOS), encoding="utf-8") as f:
+            documentos = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in json.load(f)]
+        return cls(matriz, documentos)
+
+    def similaridades(self, vetores):
+        """Matriz (consultas x documentos) de similaridade de cosseno."""
+        vetores = _normalizar_linhas(np.atleast_2d(np.asarray(vetores, dtype=np.float32)))
+        return vetores @ self.matriz.T
+
+
+class RecuperadorEsquema:
+    """
+    Retriever sobre os documentos de `populacao_rag.criar_documentos_por_coluna`.
+
+    Para cada pergunta devolve apenas as `k_colunas` colunas mais relevantes, o cabeçalho de cada
+    tabela envolvida, as chaves de junção dessas tabelas e os `k_exemplos` exemplos de SQL mais
+    próximos. Expõe `invoke`, como os retrievers do LangChain, e `invoke_lote` para várias perguntas
+    com um único cálculo de embeddings.
+    """
+
+    def __init__(self, indice, modelo_embedding, k_colunas=K_COLUNAS_PADRAO, k_exemplos=K_EXEMPLOS_PADRAO):
+        self.indice = indice
+        self.modelo_embedding = modelo_embedding
+        self.k_colunas = k_colunas
+        self.k_exemplos = k_exemplos
+
+        tipos = np.array([doc.metadata.get("tipo") for doc in indice.documentos])
+        self._posicoes_colunas = np.flatnonzero(tipos == "coluna")
+        self._posicoes_exemplos = np.flatnonzero(tipos == "exemplo")
+        self._cabecalhos = {doc.metadata["tabela"]: doc for doc in indice.documentos if doc.metadata.get("tipo") == "tabela"}
+        self._chaves = {}
+        for doc in indice.documentos:
+            if doc.metadata.get("chave_juncao"):
+                self._chaves.setdefault(doc.metadata["tabela"], []).append(doc)
+
+    def invoke(self, pergunta):
+        return self.invoke_lote([pergunta])[0]
+
+    def invoke_lote(self, perguntas):
+        vetores = self.modelo_embedding.embed_documents([PREFIXO_CONSULTA + p for p in perguntas])
+        similaridades = self.indice.similaridades(vetores)
+        return [self._selecionar(linha) for linha in similaridades]
+
+    def _top_k(self, linha, posicoes, k):
+        if len(posicoes) == 0 or k <= 0:
+            return []
+        pontuacoes = linha[posicoes]
+        k = min(k, len(posicoes))
+        melhores = np.argpartition(-pontuacoes, k - 1)[:k]
+        return [int(posicoes[i]) for i in melhores[np.argsort(-pontuacoes[melhores])]]
+
+    def _selecionar(self, linha):
+        documentos = self.indice.documentos
+        colunas = [documentos[i] for i in self._top_k(linha, self._posicoes_colunas, self.k_colunas)]
+        exemplos = [documentos[i] for i in self._top_k(linha, self._posicoes_exemplos, self.k_exemplos)]
+
+        tabelas = []
+        for doc in colunas:
+            if doc.metadata["tabela"] not in tabelas:
+                tabelas.append(doc.metadata["tabela"])
+
+        selecionados = []
+        for tabela in tabelas:
+            if tabela in self._cabecalhos:
+                selecionados.append(self._cabecalhos[tabela])
+            da_tabela = [doc for doc in colunas if doc.metadata["tabela"] == tabela]
+            nomes = {doc.metadata["coluna"] for doc in da_tabela}
+            chaves = [doc for doc in self._chaves.get(tabela, []) if doc.metadata["coluna"] not in nomes]
+            selecionados.extend(da_tabela + chaves)
+        return selecionados + exemplos
+
+
+def formatar_contexto(documentos):
+    """
+    Monta o contexto do prompt agrupando as colunas sob o cabeçalho de sua tabela,
+    seguido dos exemplos de SQL. Documentos sem tipo (ex.: esquemas inteiros) entram como estão.
+    """
+    blocos = []
+    tabela_atual = None
+    exemplos = []
+    for doc in documentos:
+        tipo = doc.metadata.get("tipo")
+        if tipo == "tabela":
+            tabela_atual = doc.metadata["tabela"]
+            blocos.append(f"---\n{doc.page_content}\nColunas relevantes:")
+        elif tipo == "coluna":
+            if doc.metadata["tabela"] != tabela_atual:
+                tabela_atual = doc.metadata["tabela"]
+                blocos.append(f"---\nTabela {tabela_atual}\nColunas relevantes:")
+            blocos.append(f"- {doc.page_content}")
+        elif tipo == "exemplo":
+            exemplos.append(doc.page_content)
+        else:
+            blocos.append(f"---\nFonte: {doc.metadata.get('fonte', 'desconhecida')}\nConteúdo:\n{doc.page_content}")
+    if exemplos:
+        blocos.append("---\nExemplos:\n" + "\n\n".join(exemplos))
+    return "\n".join(blocos) + "\n"
@@ -0,0 +1,363 @@
+"""
+Modo em lote: responde um arquivo de perguntas (CSV ou JSONL) sem a interface, com o mesmo fluxo
+do app — contexto do RAG, prompt de `geracao_sql` e execução no backend de consulta.
+
+- Perguntas repetidas (mesmo texto normalizado) geram uma única chamada ao LLM, e os embeddings de
+  todas as perguntas pendentes são calculados em uma única passada (`invoke_lote`).
+- As chamadas ao LLM (inclusive as de mapeamento e combinação da interpretação) rodam em paralelo
+  pelo `PoolLLM`, espaçadas para respeitar --chamadas-por-minuto.
+- SQLs idênticos (ignorando espaços fora dos literais e o `;` final) são executados uma única vez,
+  com o texto original do primeiro.
+- Cada etapa concluída é gravada em um checkpoint JSONL ao lado da saída; rodar de novo o mesmo
+  comando retoma de onde parou. Falhas de rede/API não entram no checkpoint e são refeitas.
+
+A saída (Parquet ou JSONL, pela extensão) tem uma linha por pergunta: id, pergunta, sql, descricao,
+linhas, resultado (os registros em JSON), mensagem, erro e, com --interpretar, a interpretação.
+
+Uso (a partir da raiz do projeto, com TOGETHER_API_KEY definida):
+    python respostas_em_lote.py perguntas.csv --saida respostas.parquet [--coluna pergunta]
+        [--interpretar] [--chamadas-por-minuto 60]
+"""
+from aquecimento import usar_sqlite_recente
+
+# Como no app: o índice de texto do motor precisa do SQLite mais recente do pysqlite3.
+usar_sqlite_recente()
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import StringIO
+
+import pandas as pd
+
+from backends_consulta import criar_backend
+from cache_respostas import normalizar_pergunta
+from geracao_sql import TOGETHER_MODEL_NAME, ler_resposta_sql, montar_mensagens_sql
+from interpretacao_resultados import preparar_interpretacao
+from populacao_rag import (
+    DIRETORIO_BASE_PADRAO, base_de_conhecimento_atualizada, criar_base_de_conhecimento_rag, criar_documentos_por_coluna,
+)
+from recuperador_esquema import formatar_contexto
+from telemetria import Telemetria
+
+DADOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+CHAMADAS_POR_MINUTO_PADRAO = 60
+SUFIXO_CHECKPOINT = ".checkpoint.jsonl"
+COLUNAS_SAIDA = ["id", "pergunta", "sql", "descricao", "linhas", "resultado", "mensagem", "erro", "interpretacao"]
+
+
+class LimiteTaxa:
+    """Espaça as chamadas de todas as threads para no máximo `chamadas_por_minuto` (0 = sem limite)."""
+
+    def __init__(self, chamadas_por_minuto: float):
+        self.intervalo = 60.0 / chamadas_por_minuto if chamadas_por_minuto > 0 else 0.0
+        self._proxima = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if self.intervalo <= 0:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            horario = max(agora, self._proxima)
+            self._proxima = horario + self.intervalo
+        time.sleep(max(0.0, horario - agora))
+
+
+class LLMComLimite:
+    """
+    Repassa os pedidos de `batch` ao LLM, cada um depois de uma vaga do `LimiteTaxa`. Usado nas
+    chamadas de mapeamento e combinação de `preparar_interpretacao`.
+    """
+
+    def __init__(self, llm, limite: LimiteTaxa):
+        self.llm = llm
+        self.limite = limite
+
+    def _invocar(self, mensagens):
+        self.limite.aguardar()
+        return self.llm.invoke(mensagens)
+
+    def batch(self, lista_mensagens):
+        trabalhadores = max(1, min(len(lista_mensagens), getattr(self.llm, "max_concorrentes", 4)))
+        with ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="lote-llm") as executor:
+            return list(executor.map(self._invocar, lista_mensagens))
+
+
+class Checkpoint:
+    """
+    Arquivo JSONL com uma linha por etapa concluída ({'id', 'etapa', ...campos}). Ao carregar, as
+    linhas de cada pergunta são combinadas na ordem em que foram gravadas.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def carregar(self) -> dict:
+        estado = defaultdict(dict)
+        if os.path.exists(self.caminho):
+            with open(self.caminho, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue  # Última linha cortada por uma interrupção no meio da gravação.
+                    estado[registro["id"]].update(registro)
+        return estado
+
+    def gravar(self, registro: dict):
+        with self._lock, open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+
+    def remover(self):
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+
+def ler_perguntas(caminho: str, coluna: str = "pergunta") -> list:
+    """
+    Lê as perguntas de um CSV ou JSONL. O id de cada pergunta vem da coluna 'id', se existir, ou da
+    posição no arquivo; perguntas vazias são ignoradas.
+    """
+    if caminho.lower().endswith((".jsonl", ".json")):
+        df = pd.read_json(caminho, lines=True, dtype=False)
+    else:
+        df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    if coluna not in df.columns:
+        raise ValueError(f"O arquivo '{caminho}' não tem a coluna '{coluna}'. Colunas: {', '.join(map(str, df.columns))}.")
+    ids = df["id"].astype(str) if "id" in df.columns else pd.Series(range(1, len(df) + 1), index=df.index).astype(str)
+    return [
+        {"id": id_pergunta, "pergunta": str(pergunta).strip()}
+        for id_pergunta, pergunta in zip(ids, df[coluna])
+        if pd.notna(pergunta) and str(pergunta).strip()
+    ]
+
+
+def normalizar_sql(sql: str) -> str:
+    """
+    Chave de deduplicação: espaços colapsados fora dos literais de texto e sem o `;` final. Serve
+    apenas para comparar consultas; o SQL executado é sempre o texto original.
+    """
+    partes = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";"))
+    return "".join(parte if indice % 2 else re.sub(r"\s+", " ", parte) for indice, parte in enumerate(partes)).strip()
+
+
+def gerar_sql(llm, limite, pergunta, documentos, telemetria):
+    """
+    O SQL para a pergunta, como no app. Respostas inválidas do modelo viram {'erro'}; falhas na
+    chamada (rede, API) são propagadas para não serem gravadas no checkpoint.
+    """
+    limite.aguardar()
+    with telemetria.etapa("geracao_sql") as registro:
+        resposta = llm.invoke(montar_mensagens_sql(formatar_contexto(documentos), pergunta))
+        uso = resposta.usage_metadata or {}
+        registro["tokens_prompt"] = uso.get("input_tokens", 0)
+        registro["tokens_resposta"] = uso.get("output_tokens", 0)
+    try:
+        sql, descricao = ler_resposta_sql(resposta.content)
+    except (json.JSONDecodeError, AttributeError):
+        return {"erro": f"O LLM retornou uma resposta em formato inválido: {resposta.content[:200]}"}
+    if not sql or "ERRO:" in sql:
+        return {"erro": "O modelo não conseguiu gerar uma consulta SQL válida para a pergunta.", "descricao": descricao}
+    return {"sql": sql.strip(), "descricao": descricao}
+
+
+def interpretar(llm, limite, pergunta, df_resultado, telemetria):
+    with telemetria.etapa("interpretacao") as registro:
+        mensagens, registro["modo"], _ = preparar_interpretacao(LLMComLimite(llm, limite), pergunta, df_resultado)
+        limite.aguardar()
+        return {"interpretacao": llm.invoke(mensagens).content}
+
+
+def _executar_em_paralelo(llm, tarefas, funcao, etapa, concluir, transitorias):
+    """
+    Executa `funcao(*argumentos)` para cada (ids, argumentos) com tantas threads quanto vagas no LLM.
+    O resultado (um dict de campos) é gravado na `etapa` de cada id; exceções marcam os ids como
+    falhas transitórias.
+    """
+    trabalhadores = max(1, getattr(llm, "max_concorrentes", 4))
+    with ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="lote") as executor:
+        futuros = {executor.submit(funcao, *argumentos): ids for ids, argumentos in tarefas}
+        for futuro in as_completed(futuros):
+            for id_pergunta in futuros[futuro]:
+                try:
+                    concluir(etapa, futuro.result(), id_pergunta)
+                except Exception as e:
+                    transitorias[id_pergunta] = f"Falha na chamada ao LLM: {e}"
+
+
+def responder_lote(perguntas, retriever, llm, backend, checkpoint, limite, interpretar_resultados=False,
+                   telemetria=None, informar=print):
+    """
+    Responde as perguntas em três fases (SQL, execução, interpretação), pulando o que o checkpoint
+    já registra.
+
+    Returns:
+        Uma tupla (registros, falhas_transitorias): um dict por pergunta, na ordem de entrada, e o
+        número de perguntas que falharam por erro na chamada ao LLM e serão refeitas na próxima execução.
+    """
+    telemetria = telemetria or Telemetria()
+    estado = checkpoint.carregar()
+    transitorias = {}
+    for pergunta in perguntas:
+        estado[pergunta["id"]].update({"id": pergunta["id"], "pergunta": pergunta["pergunta"]})
+
+    def concluir(etapa, campos, id_pergunta):
+        registro = {"id": id_pergunta, "etapa": etapa, **campos}
+        checkpoint.gravar(registro)
+        estado[id_pergunta].update(registro)
+
+    # 1. Contexto (um único cálculo de embeddings) e geração do SQL em paralelo, uma vez por pergunta distinta.
+    pendentes = defaultdict(list)
+    for pergunta in perguntas:
+        if "sql" not in estado[pergunta["id"]] and "erro" not in estado[pergunta["id"]]:
+            pendentes[normalizar_pergunta(pergunta["pergunta"])].append(pergunta)
+    if pendentes:
+        informar(f"Gerando SQL para {len(pendentes)} perguntas distintas "
+                 f"({sum(map(len, pendentes.values()))} de {len(perguntas)} pendentes)...")
+        grupos = list(pendentes.values())
+        with telemetria.etapa("busca_contexto") as registro:
+            contextos = retriever.invoke_lote([grupo[0]["pergunta"] for grupo in grupos])
+            registro["documentos"] = sum(len(documentos) for documentos in contextos)
+        tarefas = [
+            ([p["id"] for p in grupo], (llm, limite, grupo[0]["pergunta"], documentos, telemetria))
+            for grupo, documentos in zip(grupos, contextos)
+        ]
+        _executar_em_paralelo(llm, tarefas, gerar_sql, "sql", concluir, transitorias)
+
+    # 2. Execução, uma vez por SQL distinto (pela chave de `normalizar_sql`), com o texto do primeiro.
+    consultas = {}
+    for pergunta in perguntas:
+        registro = estado[pergunta["id"]]
+        if "sql" in registro and "mensagem" not in registro:
+            consultas.setdefault(normalizar_sql(registro["sql"]), (registro["sql"], []))[1].append(pergunta["id"])
+    if consultas:
+        total = sum(len(ids) for _, ids in consultas.values())
+        informar(f"Executando {len(consultas)} consultas distintas para {total} perguntas...")
+    resultados = {}
+    for chave, (sql, ids) in consultas.items():
+        with telemetria.etapa("execucao_sql", backend=backend.nome) as registro:
+            df_resultado, mensagem = backend.executar(sql)
+            registro["linhas_retornadas"] = len(df_resultado) if df_resultado is not None else 0
+        resultados[chave] = df_resultado
+        campos = {"mensagem": mensagem, "linhas": None, "resultado": None}
+        if df_resultado is not None:
+            campos["linhas"] = len(df_resultado)
+            campos["resultado"] = df_resultado.to_json(orient="records", force_ascii=False, date_format="iso")
+        else:
+            campos["erro"] = mensagem
+        for id_pergunta in ids:
+            concluir("execucao", campos, id_pergunta)
+
+    # 3. Interpretação opcional dos resultados não vazios, uma vez por pergunta distinta e SQL.
+    if interpretar_resultados:
+        pendentes = defaultdict(list)
+        for pergunta in perguntas:
+            registro = estado[pergunta["id"]]
+            if registro.get("linhas") and "interpretacao" not in registro:
+                pendentes[(normalizar_pergunta(pergunta["pergunta"]), normalizar_sql(registro["sql"]))].append(pergunta)
+        tarefas = []
+        for (_, chave), grupo in pendentes.items():
+            df_resultado = resultados.get(chave)
+            if df_resultado is None:
+                df_resultado = pd.read_json(StringIO(estado[grupo[0]["id"]]["resultado"]), orient="records")
+            tarefas.append(([p["id"] for p in grupo], (llm, limite, grupo[0]["pergunta"], df_resultado, telemetria)))
+        if tarefas:
+            informar(f"Interpretando {len(tarefas)} resultados distintos...")
+        _executar_em_paralelo(llm, tarefas, interpretar, "interpretacao", concluir, transitorias)
+
+    registros = []
+    for pergunta in perguntas:
+        registro = {coluna: estado[pergunta["id"]].get(coluna) for coluna in COLUNAS_SAIDA}
+        if pergunta["id"] in transitorias:
+            registro["erro"] = transitorias[pergunta["id"]]
+        registros.append(registro)
+    return registros, len(transitorias)
+
+
+def gravar_saida(registros, caminho: str):
+    """Grava os registros em Parquet (extensão .parquet) ou JSONL (demais)."""
+    df = pd.DataFrame(registros, columns=COLUNAS_SAIDA)
+    if caminho.lower().endswith(".parquet"):
+        df.to_parquet(caminho, index=False)
+    else:
+        df.to_json(caminho, orient="records", lines=True, force_ascii=False)
+
+
+def _criar_retriever(diretorio_base):
+    from modelo_embedding import obter_modelo_embedding
+    from recuperador_esquema import IndiceVetorial, RecuperadorEsquema
+
+    documentos = criar_documentos_por_coluna()
+    if not base_de_conhecimento_atualizada(documentos, diretorio_base):
+        criar_base_de_conhecimento_rag(documentos, nome_diretorio_db=diretorio_base)
+    return RecuperadorEsquema(IndiceVetorial.carregar(diretorio_base), obter_modelo_embedding())
+
+
+def _criar_llm():
+    from langchain_together import ChatTogether
+
+    from pool_llm import criar_pool_llm
+
+    # A chave vem da variável de ambiente TOGETHER_API_KEY.
+    return criar_pool_llm(ChatTogether(model=TOGETHER_MODEL_NAME, temperature=0.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", help="CSV ou JSONL com as perguntas")
+    parser.add_argument("--saida", required=True, help="arquivo .parquet ou .jsonl com as respostas")
+    parser.add_argument("--coluna", default="pergunta", help="coluna (ou chave) com o texto das perguntas")
+    parser.add_argument("--interpretar", action="store_true", help="também gera a interpretação de cada resultado")
+    parser.add_argument("--chamadas-por-minuto", type=float, default=CHAMADAS_POR_MINUTO_PADRAO,
+                        help="limite de chamadas ao LLM por minuto (0 = sem limite)")
+    parser.add_argument("--dados", default=DADOS_DIR)
+    parser.add_argument("--diretorio-base", default=DIRETORIO_BASE_PADRAO)
+    args = parser.parse_args()
+
+    try:
+        perguntas = ler_perguntas(args.entrada, args.coluna)
+    except (OSError, ValueError) as e:
+        raise SystemExit(str(e))
+    if not perguntas:
+        raise SystemExit(f"Nenhuma pergunta encontrada em '{args.entrada}'.")
+
+    backend = criar_backend(args.dados)
+    pronto, mensagem = backend.preparar()
+    if not pronto:
+        raise SystemExit(mensagem)
+    retriever = _criar_retriever(args.diretorio_base)
+    llm = _criar_llm()
+
+    checkpoint = Checkpoint(args.saida + SUFIXO_CHECKPOINT)
+    telemetria = Telemetria()
+    inicio = time.perf_counter()
+    try:
+        registros, falhas_transitorias = responder_lote(
+            perguntas, retriever, llm, backend, checkpoint, LimiteTaxa(args.chamadas_por_minuto),
+            args.interpretar, telemetria,
+        )
+    finally:
+        llm.fechar()
+    gravar_saida(registros, args.saida)
+
+    com_resultado = sum(1 for r in registros if r["linhas"] is not None)
+    print(f"\n{len(registros)} perguntas em {time.perf_counter() - inicio:.1f} s: {com_resultado} com resultado, "
+          f"{len(registros) - com_resultado} sem. Respostas gravadas em '{args.saida}'.")
+    print(telemetria.resumo_por_etapa().to_string(index=False))
+    if falhas_transitorias:
+        print(f"{falhas_transitorias} perguntas falharam na chamada ao LLM; rode o mesmo comando novamente para "
+              f"refazê-las (checkpoint em '{checkpoint.caminho}').")
+        raise SystemExit(1)
+    checkpoint.remover()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import importlib.util
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Exportador do OpenTelemetry: "nenhum" (padrão, só estatísticas em processo), "console", "arquivo" ou "otlp".
+VARIAVEL_EXPORTADOR = "SEBRAE_TELEMETRIA"
+VARIAVEL_ARQUIVO = "SEBRAE_TELEMETRIA_ARQUIVO"
+ARQUIVO_PADRAO = os.path.join(".telemetria", "telemetria.jsonl")
+NOME_SERVICO = "sebrae-texto-sql"
+# Amostras mantidas por etapa para o cálculo de p50/p95.
+JANELA_AMOSTRAS = 500
+INTERVALO_EXPORTACAO_METRICAS_MS = 60_000
+# O SDK do OpenTelemetry é opcional: sem ele, spans e métricas ficam apenas nas estatísticas em processo.
+OTEL_DISPONIVEL = importlib.util.find_spec("opentelemetry") is not None and importlib.util.find_spec("opentelemetry.sdk") is not None
+
+# Atributos das etapas somados por etapa e enviados aos contadores: chave -> (instrumento, tipo).
+CONTADORES = {
+    "tokens_prompt": ("tokens", "prompt"),
+    "tokens_resposta": ("tokens", "resposta"),
+    "custo_estimado": ("custo_estimado", "sql"),
+    "linhas_retornadas": ("linhas", "retornadas"),
+    # Estimativa pelos planos (EXPLAIN), em linhas; a latência medida das consultas roteadas aos
+    # cubos fica na etapa 'execucao_sql_cubo' (`registrar_duracao`).
+    "custo_evitado_estimado_cubo": ("custo_evitado_estimado", "cubo"),
+}
+
+
+class Telemetria:
+    """
+    Spans e contadores por etapa do pipeline da pergunta (busca de contexto, geração do SQL,
+    leitura do JSON, execução, preparo e chamada de interpretação).
+
+    Cada `etapa` mede a latência e aceita atributos (tokens, custo estimado e linhas retornadas, modo...).
+    Os valores ficam numa janela em memória, usada pelo painel do app (`resumo_por_etapa`), e,
+    com o SDK instalado e um exportador configurado, são enviados ao OpenTelemetry como spans,
+    um histograma de duração e contadores.
+    """
+
+    def __init__(self, exportador: str = "nenhum", caminho_arquivo: str = ARQUIVO_PADRAO):
+        self._lock = threading.Lock()
+        self._latencias = defaultdict(lambda: deque(maxlen=JANELA_AMOSTRAS))
+        self._totais = defaultdict(lambda: defaultdict(float))
+        self._cache = defaultdict(lambda: {"acertos": 0, "falhas": 0})
+        self._tracer = None
+        self._instrumentos = None
+        self.exportador = exportador if OTEL_DISPONIVEL else "nenhum"
+        if self.exportador != "nenhum":
+            self._configurar_opentelemetry(self.exportador, caminho_arquivo)
+
+    def _configurar_opentelemetry(self, exportador, caminho_arquivo):
+        from opentelemetry import metrics, trace
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if exportador == "otlp":
+            # Endpoint e cabeçalhos vêm das variáveis padrão OTEL_EXPORTER_OTLP_*.
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            exportador_spans, exportador_metricas = OTLPSpanExporter(), OTLPMetricExporter()
+        elif exportador in ("console", "arquivo"):
+            if exportador == "arquivo":
+                os.makedirs(os.path.dirname(caminho_arquivo) or ".", exist_ok=True)
+                saida = open(caminho_arquivo, "a", encoding="utf-8")
+            else:
+                import sys
+                saida = sys.stdout
+            # Uma linha JSON por span/lote de métricas, fácil de processar offline.
+            exportador_spans = ConsoleSpanExporter(out=saida, formatter=lambda span: span.to_json(indent=None) + os.linesep)
+            exportador_metricas = ConsoleMetricExporter(out=saida, formatter=lambda dados: dados.to_json(indent=None) + os.linesep)
+        else:
+            raise ValueError(f"Exportador de telemetria desconhecido: '{exportador}'. Use 'nenhum', 'console', 'arquivo' ou 'otlp'.")
+
+        recurso = Resource.create({"service.name": NOME_SERVICO})
+        provedor_traces = TracerProvider(resource=recurso)
+        provedor_traces.add_span_processor(BatchSpanProcessor(exportador_spans))
+        leitor = PeriodicExportingMetricReader(exportador_metricas, export_interval_millis=INTERVALO_EXPORTACAO_METRICAS_MS)
+        provedor_metricas = MeterProvider(resource=recurso, metric_readers=[leitor])
+        trace.set_tracer_provider(provedor_traces)
+        metrics.set_meter_provider(provedor_metricas)
+
+        self._tracer = trace.get_tracer(__name__)
+        medidor = metrics.get_meter(__name__)
+        self._instrumentos = {
+            "duracao": medidor.create_histogram("sebrae.etapa.duracao", unit="ms", description="Latência de cada etapa do pipeline"),
+            "tokens": medidor.create_counter("sebrae.llm.tokens", description="Tokens enviados e recebidos do LLM"),
+            "linhas": medidor.create_counter("sebrae.sql.linhas", description="Linhas retornadas pelas consultas"),
+            "custo_estimado": medidor.create_counter("sebrae.sql.custo_estimado", description="Custo estimado (linhas) dos planos das consultas executadas"),
+            "cache": medidor.create_counter("sebrae.cache.consultas", description="Consultas ao cache de respostas"),
+            "custo_evitado_estimado": medidor.create_counter(
+                "sebrae.cubo.custo_evitado_estimado",
+                description="Estimativa, pelo custo dos planos (linhas, não tempo), do custo evitado pelos agregados pré-calculados",
+            ),
+        }
+
+    @contextmanager
+    def etapa(self, nome: str, tempos: dict = None, **atributos):
+        """
+        Mede uma etapa. O bloco recebe o dicionário de registro, onde pode acrescentar atributos
+        (ex.: `registro["tokens_prompt"] = 812`); `latencia_ms` é preenchida na saída.
+        Com `tempos`, o registro também fica em `tempos[nome]` (a tabela de tempos da pergunta).
+
+        O span é criado sem virar o span corrente, para que a etapa possa envolver geradores
+        consumidos aos poucos (streaming).
+        """
+        registro = dict(atributos)
+        if tempos is not None:
+            tempos[nome] = registro
+        span = self._tracer.start_span(nome) if self._tracer is not None else None
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        except Exception as e:
+            registro["erro"] = type(e).__name__
+            raise
+        finally:
+            registro["latencia_ms"] = (time.perf_counter() - inicio) * 1000
+            self._registrar(nome, registro)
+            if span is not None:
+                span.set_attributes({chave: valor for chave, valor in registro.items() if isinstance(valor, (str, bool, int, float))})
+                span.end()
+
+    @contextmanager
+    def pergunta(self, pergunta: str, tempos: dict = None):
+        """Span raiz de uma pergunta; as etapas abertas dentro dele ficam como filhas. Registrado como 'total'."""
+        if self._tracer is None:
+            with self.etapa("total", tempos) as registro:
+                yield registro
+            return
+        with self._tracer.start_as_current_span("pergunta", attributes={"pergunta": pergunta}):
+            with self.etapa("total", tempos) as registro:
+                yield registro
+
+    def registrar_cache(self, nivel: str, acerto: bool):
+        """
+        Conta uma consulta ao nível `nivel` do cache de respostas ('sql', 'resultado', 'interpretacao')
+        ou aos agregados pré-calculados do motor ('cubo').
+        """
+        with self._lock:
+            self._cache[nivel]["acertos" if acerto else "falhas"] += 1
+        if self._instrumentos is not None:
+            self._instrumentos["cache"].add(1, {"nivel": nivel, "resultado": "acerto" if acerto else "falha"})
+
+    def registrar_partida(self, nome: str, latencia_ms: float):
+        """
+        Registra um marco da partida do processo medido fora de uma `etapa`, como o tempo até a
+        primeira tela ('partida_primeira_tela') ou até o app poder responder ('partida_interativa').
+        """
+        self.registrar_duracao(nome, latencia_ms)
+
+    def registrar_duracao(self, nome: str, latencia_ms: float):
+        """
+        Registra sob `nome` uma duração já medida, com os mesmos percentis de uma `etapa`. Usado,
+        por exemplo, para separar as execuções SQL respondidas pelos cubos ('execucao_sql_cubo')
+        das que leram a tabela ('execucao_sql_tabela').
+        """
+        self._registrar(nome, {"latencia_ms": latencia_ms})
+
+    def _registrar(self, nome, registro):
+        with self._lock:
+            self._latencias[nome].append(registro["latencia_ms"])
+            totais = self._totais[nome]
+            totais["chamadas"] += 1
+            for chave in CONTADORES:
+                if chave in registro:
+                    totais[chave] += registro[chave]
+        if self._instrumentos is not None:
+            self._instrumentos["duracao"].record(registro["latencia_ms"], {"etapa": nome})
+            for chave, (instrumento, tipo) in CONTADORES.items():
+                if chave in registro:
+                    self._instrumentos[instrumento].add(registro[chave], {"etapa": nome, "tipo": tipo})
+
+    def possui_registros(self) -> bool:
+        with self._lock:
+            return bool(self._latencias)
+
+    def resumo_por_etapa(self):
+        """Chamadas, p50/p95 da latência (sobre as últimas JANELA_AMOSTRAS) e totais dos CONTADORES por etapa."""
+        # Import tardio: numpy e pandas não são necessários para registrar, só para o painel.
+        import numpy as np
+        import pandas as pd
+
+        with self._lock:
+            linhas = []
+            for nome, latencias in self._latencias.items():
+                amostras = np.fromiter(latencias, dtype=float)
+                p50, p95 = np.percentile(amostras, [50, 95])
+                linha = {"etapa": nome, "chamadas": int(self._totais[nome]["chamadas"]),
+                         "p50 (ms)": round(p50, 2), "p95 (ms)": round(p95, 2)}
+                for chave in CONTADORES:
+                    linha[chave] = int(self._totais[nome].get(chave, 0))
+                linhas.append(linha)
+        return pd.DataFrame(linhas, columns=["etapa", "chamadas", "p50 (ms)", "p95 (ms)", *CONTADORES])
+
+    def resumo_cache(self):
+        import pandas as pd
+
+        with self._lock:
+            linhas = [
+                {"nível": nivel, "acertos": c["acertos"], "falhas": c["falhas"],
+                 "taxa de acerto": round(c["acertos"] / (c["acertos"] + c["falhas"]), 3)}
+                for nivel, c in self._cache.items()
+            ]
+        return pd.DataFrame(linhas, columns=["nível", "acertos", "falhas", "taxa de acerto"])
+
+
+_telemetria = None
+_lock_telemetria = threading.Lock()
+
+
+def obter_telemetria() -> Telemetria:
+    """Telemetria única do processo, com o exportador definido por SEBRAE_TELEMETRIA."""
+    global _telemetria
+    with _lock_telemetria:
+        if _telemetria is None:
+            _telemetria = Telemetria(
+                os.environ.get(VARIAVEL_EXPORTADOR, "nenhum").strip().lower() or "nenhum",
+                os.environ.get(VARIAVEL_ARQUIVO, ARQUIVO_PADRAO),
+            )
+        return _telemetria
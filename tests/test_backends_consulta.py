@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+import pytest
+
+from backends_consulta import BackendSQLRemoto, criar_catalogo_sqlite_emulado
+
+TABELA = "nx_org_group_classified_v2"
+CSV_AMOSTRA = os.path.join(os.path.dirname(__file__), "dados", f"{TABELA}.csv")
+
+
+@pytest.fixture
+def catalogo(tmp_path):
+    """Fábrica de conexões para um SQLite com a amostra do CSV, contando as conexões abertas."""
+    dados = pd.read_csv(CSV_AMOSTRA, sep=";")
+    fabrica = criar_catalogo_sqlite_emulado({TABELA: dados}, str(tmp_path / "catalogo.db"))
+    abertas = []
+
+    def fabrica_contada():
+        abertas.append(fabrica())
+        return abertas[-1]
+
+    return fabrica_contada, abertas, dados
+
+
+def test_remoto_le_o_resultado_em_paginas_com_tipos_arrow(catalogo):
+    fabrica, abertas, dados = catalogo
+    backend = BackendSQLRemoto(fabrica, tamanho_pagina=7)
+    assert backend.preparar()[0]
+
+    resultado, mensagem = backend.executar(f"SELECT forms_number, forms_uf FROM {TABELA} ORDER BY forms_number")
+
+    assert "60 registros" in mensagem
+    assert resultado.attrs["estatisticas_execucao"]["paginas"] == 9
+    assert all(isinstance(tipo, pd.ArrowDtype) for tipo in resultado.dtypes)
+    esperado = dados[["forms_number", "forms_uf"]].sort_values("forms_number").reset_index(drop=True)
+    pd.testing.assert_frame_equal(resultado, esperado.convert_dtypes(dtype_backend="pyarrow"))
+    # preparar e executar reaproveitam a mesma conexão do pool.
+    assert len(abertas) == 1
+
+
+def test_remoto_aplica_limite_de_linhas(catalogo):
+    backend = BackendSQLRemoto(catalogo[0], tipos_arrow=False)
+
+    resultado, mensagem = backend.executar(f"SELECT * FROM {TABELA}", limite_linhas=10)
+
+    assert len(resultado) == 10 and resultado.attrs["estatisticas_execucao"]["truncado"]
+    assert "limitado aos primeiros 10 registros" in mensagem
+
+
+def test_remoto_interrompe_consulta_apos_o_timeout(catalogo):
+    resultado, mensagem = BackendSQLRemoto(catalogo[0]).executar(f"SELECT * FROM {TABELA}", timeout_segundos=0)
+
+    assert resultado is None and mensagem.startswith("Consulta interrompida")
+
+
+def test_remoto_rejeita_sql_que_nao_e_leitura(catalogo):
+    resultado, mensagem = BackendSQLRemoto(catalogo[0]).executar(f"DELETE FROM {TABELA}")
+
+    assert resultado is None and mensagem.startswith("Consulta rejeitada")
@@ -0,0 +1,78 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from cache_respostas import CacheRespostas, _sha, extrair_literais, extrair_termos
+
+
+def _embedding_sem_digitos(texto):
+    """Embedding de teste que ignora os dígitos: perguntas que diferem só no ano ficam idênticas."""
+    vetor = np.zeros(64, dtype=np.float32)
+    for caractere in texto:
+        if not caractere.isdigit():
+            vetor[ord(caractere) % 64] += 1
+    return vetor
+
+
+def _cache(tmp_path):
+    cache = CacheRespostas(str(tmp_path / "respostas.db"), funcao_embedding=_embedding_sem_digitos)
+    cache.definir_versao_dados("v1")
+    return cache
+
+
+def test_extrair_literais():
+    assert extrair_literais("quantas avaliacoes em 2023 com status 'completed'") == ["2023", "completed"]
+
+
+def test_extrair_termos_ignora_palavras_vazias():
+    assert extrair_termos("quantos formularios em sp com risco alto") == ["alto", "formularios", "quantos", "risco", "sp"]
+
+
+def test_busca_semantica_rejeita_pergunta_com_outro_literal(tmp_path):
+    cache = _cache(tmp_path)
+    cache.salvar_sql("Quantas avaliações foram concluídas em 2023?", "SELECT ... end_date_year = 2023", "")
+
+    assert cache.buscar_sql("Quantas avaliações foram concluídas em 2024?") is None
+
+
+def test_busca_semantica_aceita_pergunta_com_os_mesmos_literais(tmp_path):
+    cache = _cache(tmp_path)
+    cache.salvar_sql("Quantas avaliações foram concluídas em 2023?", "SELECT ... end_date_year = 2023", "")
+
+    entrada = cache.buscar_sql("Quantas avaliacoes foram concluidas, em 2023?")
+    assert entrada is not None and entrada["tipo"] == "semantica"
+    assert entrada["sql"] == "SELECT ... end_date_year = 2023"
+
+
+def test_busca_semantica_rejeita_pergunta_com_outra_palavra(tmp_path):
+    # Embedding que considera todas as perguntas idênticas: só a checagem das palavras as distingue.
+    cache = CacheRespostas(str(tmp_path / "respostas.db"), funcao_embedding=lambda texto: np.ones(8, dtype=np.float32))
+    cache.definir_versao_dados("v1")
+    cache.salvar_sql("Quantos formulários existem em SP?", "SELECT ... forms_uf = 'SP'", "")
+
+    assert cache.buscar_sql("Quantos formulários existem em RJ?") is None
+    assert cache.buscar_sql("Quantos formularios existem no SP")["tipo"] == "semantica"
+
+
+def test_resultado_volta_do_cache_em_parquet(tmp_path):
+    cache = _cache(tmp_path)
+    df = pd.DataFrame({
+        "forms_uf": pd.Categorical(["SP", "RJ", None]),
+        "total": [3, 2, 1],
+        "end_date": pd.to_datetime(["2024-01-02", "2024-02-03", None]),
+    })
+    cache.salvar_resultado("SELECT 1", df)
+
+    pd.testing.assert_frame_equal(cache.buscar_resultado("SELECT 1"), df)
+    assert cache.buscar_resultado("SELECT 2") is None
+
+
+def test_resultado_gravado_em_pickle_vale_como_ausente(tmp_path):
+    # Entradas gravadas antes da troca para Parquet não são desserializadas com pickle.
+    cache = _cache(tmp_path)
+    buffer = io.BytesIO()
+    pd.DataFrame({"total": [1]}).to_pickle(buffer)
+    cache._gravar("resultados", {"chave": _sha("SELECT 1", "v1"), "dados": buffer.getvalue()})
+
+    assert cache.buscar_resultado("SELECT 1") is None
@@ -0,0 +1,155 @@
+import os
+import shutil
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from csv_query_engine import MotorConsultaSQL, load_csv_data
+from cubos_agregados import CuboAgregado, criar_cubo
+from indice_texto import criar_indice_texto, reescrever_buscas_texto
+
+TABELA = "nx_org_group_classified_v2"
+# Amostra de 60 linhas do CSV de `dados`, com o mesmo cabeçalho.
+CSV_AMOSTRA = os.path.join(os.path.dirname(__file__), "dados", f"{TABELA}.csv")
+
+CONSULTAS_CONTAGEM = [
+    f"SELECT COUNT(*) FROM {TABELA} WHERE forms_uf = 'SP'",
+    f"SELECT forms_uf, COUNT(*) AS total FROM {TABELA} GROUP BY forms_uf ORDER BY forms_uf",
+    f"SELECT forms_status, end_date_year, COUNT(*) AS total FROM {TABELA} "
+    f"GROUP BY forms_status, end_date_year ORDER BY forms_status, end_date_year",
+    f"SELECT COUNT(*) AS total FROM {TABELA} WHERE LOWER(forms_org_grupo_name) LIKE '%sebrae%'",
+]
+
+
+@pytest.fixture
+def pasta_dados(tmp_path):
+    shutil.copy(CSV_AMOSTRA, tmp_path)
+    return str(tmp_path)
+
+
+def _gravar_linhas(pasta, quantidade):
+    """Regrava o CSV da pasta com as primeiras `quantidade` linhas da amostra."""
+    pd.read_csv(CSV_AMOSTRA, sep=";").head(quantidade).to_csv(os.path.join(pasta, f"{TABELA}.csv"), sep=";", index=False)
+
+
+def _carregar(pasta, **kwargs):
+    dataframes, mensagem = load_csv_data(pasta, **kwargs)
+    assert dataframes is not None, mensagem
+    return dataframes
+
+
+def _datas_em_utc(df):
+    # O Parquet devolve o fuso fixo como datetime.timezone em vez de pytz: o instante é o mesmo.
+    df = df.copy()
+    for coluna in df.select_dtypes("datetimetz").columns:
+        df[coluna] = df[coluna].dt.tz_convert("UTC")
+    return df
+
+
+def test_cache_parquet_devolve_o_mesmo_que_a_carga_direta(pasta_dados):
+    primeira = _carregar(pasta_dados)[TABELA]
+    do_cache = _carregar(pasta_dados)[TABELA]
+    direta = _carregar(pasta_dados, usar_cache=False)[TABELA]
+
+    assert primeira.attrs["estatisticas_carga"]["origem"] == "csv"
+    assert do_cache.attrs["estatisticas_carga"]["origem"] == "cache"
+    pd.testing.assert_frame_equal(_datas_em_utc(do_cache), _datas_em_utc(direta))
+
+
+@pytest.mark.parametrize("query", CONSULTAS_CONTAGEM)
+def test_contagem_roteada_pelo_cubo_igual_a_da_tabela(pasta_dados, query):
+    dataframes = _carregar(pasta_dados)
+
+    roteado, estatisticas = MotorConsultaSQL().executar(query, dataframes)
+    sem_cubo, _ = MotorConsultaSQL(usar_cubos=False).executar(query, dataframes)
+
+    assert estatisticas["cubo"] is not None
+    pd.testing.assert_frame_equal(roteado, sem_cubo, check_dtype=False)
+
+
+def test_acrescimo_de_linhas_atualiza_cache_motor_e_cubo(pasta_dados):
+    _gravar_linhas(pasta_dados, 40)
+    motor = MotorConsultaSQL()
+    motor.executar(CONSULTAS_CONTAGEM[1], _carregar(pasta_dados))
+
+    _gravar_linhas(pasta_dados, 60)
+    dataframes = _carregar(pasta_dados)
+    assert dataframes[TABELA].attrs["estatisticas_carga"]["origem"] == "csv"
+    assert len(_carregar(pasta_dados)[TABELA]) == 60
+
+    for query in CONSULTAS_CONTAGEM:
+        obtido, _ = motor.executar(query, dataframes)
+        esperado, _ = MotorConsultaSQL(usar_cubos=False).executar(query, dataframes)
+        pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+
+
+def test_cubo_agrega_so_as_linhas_acrescentadas(pasta_dados):
+    df = _carregar(pasta_dados)[TABELA]
+    conexao = sqlite3.connect(":memory:")
+    cubo = criar_cubo(TABELA, df)
+
+    assert cubo.atualizar(conexao, df.head(40)) == "completa"
+    assert cubo.atualizar(conexao, df) == "incremental"
+    assert cubo.atualizar(conexao, df) == "inalterada"
+    nome_rollup, _ = cubo.tabelas_rollup[frozenset({"forms_uf"})]
+    contagens = pd.read_sql(
+        f"SELECT COALESCE(forms_uf, '') AS forms_uf, SUM(contagem_cubo) AS total FROM \"{nome_rollup}\" GROUP BY 1",
+        conexao,
+    ).set_index("forms_uf")["total"]
+    assert contagens.to_dict() == df["forms_uf"].astype(object).fillna("").value_counts().to_dict()
+
+
+@pytest.mark.parametrize("filtro", [
+    "LOWER(forms_name) LIKE LOWER('%dados%')",
+    "LOWER(primary_record_name) LIKE '%sebrae%'",
+    "LOWER(forms_uf) LIKE '%p%'",
+    "LOWER(forms_status) LIKE LOWER('%REVIEW%')",
+])
+def test_filtro_de_texto_reescrito_devolve_as_mesmas_linhas(pasta_dados, filtro):
+    df = _carregar(pasta_dados)[TABELA]
+    conexao = sqlite3.connect(":memory:")
+    df.to_sql(TABELA, conexao, index=False)
+    indices = {TABELA: criar_indice_texto(conexao, TABELA, df)}
+    query = f"SELECT forms_assessment_id FROM {TABELA} WHERE {filtro} ORDER BY forms_assessment_id"
+
+    reescrita = reescrever_buscas_texto(query, indices)
+
+    assert reescrita != query
+    original = conexao.execute(query).fetchall()
+    assert original and conexao.execute(reescrita).fetchall() == original
+
+
+def test_mudanca_de_esquema_entre_sincronizacoes_recria_o_cubo(pasta_dados):
+    df = _carregar(pasta_dados)[TABELA]
+    sem_forms_uf = df.drop(columns=["forms_uf"])
+    motor = MotorConsultaSQL()
+    motor.executar(CONSULTAS_CONTAGEM[1], {TABELA: df})
+
+    query = f"SELECT forms_status, COUNT(*) AS total FROM {TABELA} GROUP BY forms_status ORDER BY forms_status"
+    obtido, estatisticas = motor.executar(query, {TABELA: sem_forms_uf})
+    esperado, _ = MotorConsultaSQL(usar_cubos=False).executar(query, {TABELA: sem_forms_uf})
+
+    assert estatisticas["cubo"] is not None
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+    # A coluna removida não pode ser respondida pelo rollup antigo.
+    with pytest.raises(sqlite3.OperationalError):
+        motor.executar(CONSULTAS_CONTAGEM[0], {TABELA: sem_forms_uf})
+
+
+def test_falha_ao_atualizar_o_cubo_nao_deixa_a_tabela_como_sincronizada(pasta_dados, monkeypatch):
+    dataframes = _carregar(pasta_dados)
+    motor = MotorConsultaSQL()
+
+    def falhar(self, conexao, df):
+        raise MemoryError("sem memória para o cubo")
+
+    with monkeypatch.context() as contexto:
+        contexto.setattr(CuboAgregado, "atualizar", falhar)
+        with pytest.raises(MemoryError):
+            motor.executar(CONSULTAS_CONTAGEM[0], dataframes)
+
+    obtido, estatisticas = motor.executar(CONSULTAS_CONTAGEM[0], dataframes)
+    esperado, _ = MotorConsultaSQL(usar_cubos=False).executar(CONSULTAS_CONTAGEM[0], dataframes)
+    assert estatisticas["cubo"] is not None
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
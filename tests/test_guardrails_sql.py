@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+from guardrails_sql import (
+    PASSOS_VERIFICACAO, ConsultaRejeitada, ControleExecucao, aplicar_limite, validar_sql, verificar_custo,
+)
+
+
+@pytest.mark.parametrize("query", [
+    "DELETE FROM formularios",
+    "UPDATE formularios SET forms_uf = 'SP'",
+    "INSERT INTO formularios VALUES (1)",
+    "DROP TABLE formularios",
+    "CREATE TABLE copia AS SELECT * FROM formularios",
+    "REPLACE INTO formularios VALUES (1)",
+    "WITH f AS (SELECT 1) REPLACE INTO formularios SELECT * FROM f",
+    "PRAGMA table_info(formularios)",
+    "SELECT * FROM formularios; DROP TABLE formularios",
+    "SELECT 1; SELECT 2",
+    "",
+])
+def test_validar_sql_rejeita_o_que_nao_e_uma_unica_leitura(query):
+    with pytest.raises(ConsultaRejeitada):
+        validar_sql(query)
+
+
+@pytest.mark.parametrize("query, esperada", [
+    ("SELECT REPLACE(forms_uf, 'S', 'X') FROM formularios;", "SELECT REPLACE(forms_uf, 'S', 'X') FROM formularios"),
+    ("SELECT * FROM formularios WHERE forms_name = 'delete; drop'", None),
+    ("-- comentário\nWITH f AS (SELECT 1 AS x) SELECT x FROM f", "WITH f AS (SELECT 1 AS x) SELECT x FROM f"),
+])
+def test_validar_sql_aceita_leituras(query, esperada):
+    assert validar_sql(query) == (esperada or query)
+
+
+def test_aplicar_limite_acrescenta_limit_quando_nao_ha():
+    assert aplicar_limite("SELECT * FROM formularios", 100) == "SELECT * FROM formularios\nLIMIT 101"
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM formularios LIMIT 5",
+    "SELECT * FROM formularios LIMIT 5 OFFSET 10",
+])
+def test_aplicar_limite_mantem_limit_existente(query):
+    assert aplicar_limite(query, 100) == query
+
+
+def test_aplicar_limite_ignora_limit_dentro_de_literal():
+    query = "SELECT * FROM formularios WHERE forms_name = 'limit 5'"
+    assert aplicar_limite(query, 100).endswith("LIMIT 101")
+
+
+def _conexao_com_tabelas(linhas):
+    conexao = sqlite3.connect(":memory:")
+    for tabela in ("formularios", "atividades"):
+        conexao.execute(f"CREATE TABLE {tabela} (id INTEGER, nome TEXT)")
+    return conexao, {"formularios": linhas, "atividades": linhas}
+
+
+def test_verificar_custo_rejeita_produto_cartesiano():
+    conexao, linhas = _conexao_com_tabelas(10_000)
+
+    with pytest.raises(ConsultaRejeitada, match="produto cartesiano"):
+        verificar_custo(conexao, "SELECT * FROM formularios f, atividades a", linhas, limite_custo=1_000_000)
+
+
+def test_verificar_custo_aceita_juncao_com_predicado():
+    conexao, linhas = _conexao_com_tabelas(10_000)
+    query = "SELECT * FROM formularios f JOIN atividades a ON a.id = f.id"
+
+    assert verificar_custo(conexao, query, linhas, limite_custo=1_000_000) <= 1_000_000
+
+
+def test_controle_execucao_interrompe_consulta_apos_o_timeout():
+    conexao = sqlite3.connect(":memory:")
+    controle = ControleExecucao(timeout_segundos=0.05)
+    conexao.set_progress_handler(controle, PASSOS_VERIFICACAO)
+    infinita = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+
+    with pytest.raises(sqlite3.OperationalError, match="interrupted"):
+        conexao.execute(infinita).fetchall()
+    assert controle.excedeu_tempo and controle.passos > 0
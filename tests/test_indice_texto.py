@@ -0,0 +1,58 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import indice_texto
+from csv_query_engine import MotorConsultaSQL
+from indice_texto import criar_indice_texto, reescrever_buscas_texto
+
+CONSULTA = "SELECT nome FROM atividades WHERE LOWER(nome) LIKE LOWER('%risco%') ORDER BY nome"
+
+
+def _atividades():
+    return pd.DataFrame({
+        "nome": ["Análise de Risco", "Cadastro de clientes", "Risco operacional", None, "Folha de pagamento"],
+        "uf": pd.Categorical(["SP", "RJ", "SP", "MG", None]),
+    })
+
+
+def test_sem_fts5_de_trigramas_a_busca_fica_sem_reescrita(monkeypatch):
+    # Um tokenizador inexistente provoca o mesmo OperationalError de um SQLite sem FTS5 ou trigramas.
+    monkeypatch.setattr(indice_texto, "TOKENIZADOR_FTS", "inexistente")
+    conexao = sqlite3.connect(":memory:")
+    df = _atividades()
+    df.to_sql("atividades", conexao, index=False)
+
+    indice = criar_indice_texto(conexao, "atividades", df)
+
+    assert "nome" not in indice and "uf" in indice
+    assert reescrever_buscas_texto(CONSULTA, {"atividades": indice}) == CONSULTA
+
+
+def test_sem_fts5_de_trigramas_o_motor_continua_executando(monkeypatch):
+    monkeypatch.setattr(indice_texto, "TOKENIZADOR_FTS", "inexistente")
+
+    resultado, _ = MotorConsultaSQL(usar_cubos=False).executar(CONSULTA, {"atividades": _atividades()})
+
+    assert resultado["nome"].tolist() == ["Análise de Risco", "Risco operacional"]
+
+
+@pytest.mark.parametrize("filtro", [
+    "NOT LOWER(nome) LIKE LOWER('%risco%')",
+    "NOT LOWER(a.nome) LIKE '%risco%'",
+    "NOT LOWER(uf) LIKE '%sp%'",
+    "NOT LOWER(uf) LIKE '%nenhuma%'",
+    "(LOWER(nome) LIKE '%risco%') IS NULL",
+])
+def test_reescrita_preserva_nulos_sob_negacao(filtro):
+    conexao = sqlite3.connect(":memory:")
+    df = _atividades()
+    df.to_sql("atividades", conexao, index=False)
+    indices = {"atividades": criar_indice_texto(conexao, "atividades", df)}
+    query = f"SELECT a.nome, a.uf FROM atividades a WHERE {filtro} ORDER BY a.rowid"
+
+    reescrita = reescrever_buscas_texto(query, indices)
+
+    assert reescrita != query
+    assert conexao.execute(reescrita).fetchall() == conexao.execute(query).fetchall()
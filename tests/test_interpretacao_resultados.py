@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from interpretacao_resultados import (
+    LIMITE_TOKENS_DADOS, MAX_BLOCOS_MAP_REDUCE, _prompt_resumo, estimar_tokens, preparar_interpretacao,
+)
+
+
+class _LLMContador:
+    """Responde a cada pedido com `tamanho_resposta` caracteres e conta os pedidos."""
+
+    def __init__(self, tamanho_resposta):
+        self.tamanho_resposta = tamanho_resposta
+        self.chamadas = 0
+
+    def batch(self, lista_mensagens):
+        self.chamadas += len(lista_mensagens)
+        return [SimpleNamespace(content="n" * self.tamanho_resposta) for _ in lista_mensagens]
+
+
+def _resultado_largo(colunas, linhas=10_000):
+    gerador = np.random.default_rng(0)
+    nomes = [f"Atividade de tratamento de dados número {i}" for i in range(1000)]
+    return pd.DataFrame({
+        f"coluna_{i}": gerador.choice(nomes, linhas) if i % 2 else gerador.integers(0, 10**6, linhas)
+        for i in range(colunas)
+    })
+
+
+@pytest.mark.parametrize("colunas", [80, 120])
+@pytest.mark.parametrize("tamanho_resposta", [200, 6000])
+def test_map_reduce_limita_chamadas_e_o_prompt_final(colunas, tamanho_resposta):
+    llm = _LLMContador(tamanho_resposta)
+    pergunta = "Liste as atividades de tratamento"
+
+    mensagens, modo, tokens = preparar_interpretacao(llm, pergunta, _resultado_largo(colunas))
+
+    assert modo == "map_reduce"
+    # Os blocos do mapeamento mais, no máximo, uma rodada de combinação por metade das notas.
+    assert llm.chamadas <= 2 * MAX_BLOCOS_MAP_REDUCE
+    assert tokens <= LIMITE_TOKENS_DADOS + estimar_tokens(_prompt_resumo(pergunta, ""))
+    assert "ATENÇÃO: só 12 de" in mensagens[-1].content
@@ -0,0 +1,33 @@
+from langchain_core.documents import Document
+
+from csv_query_engine import COLUNAS_CATEGORICAS, COLUNAS_DATA, COLUNAS_NUMERICAS
+from populacao_rag import criar_documentos_por_coluna
+
+
+def _colunas_documentadas(documentos):
+    return {doc.metadata["coluna"] for doc in documentos if doc.metadata["tipo"] == "coluna"}
+
+
+def test_toda_coluna_do_esquema_de_ingestao_tem_documento():
+    documentadas = _colunas_documentadas(criar_documentos_por_coluna())
+
+    assert set(COLUNAS_DATA + COLUNAS_NUMERICAS + COLUNAS_CATEGORICAS) <= documentadas
+
+
+def test_coluna_com_parenteses_aninhados_ou_sem_apelido():
+    esquema = Document(page_content="""
+    Nome da Tabela: t
+    Descrição: Tabela de teste.
+
+    Colunas:
+    - tipo (Tipo (ex: ROPA, RAT)): Versão do formulário (ex: RAT).
+    - impacto: Impacto caso o risco ocorra.
+    """, metadata={"fonte": "teste"})
+
+    colunas = {doc.metadata["coluna"]: doc.page_content for doc in criar_documentos_por_coluna([esquema])
+               if doc.metadata["tipo"] == "coluna"}
+
+    assert colunas == {
+        "tipo": "tipo (Tipo (ex: ROPA, RAT)): Versão do formulário (ex: RAT).",
+        "impacto": "impacto: Impacto caso o risco ocorra.",
+    }
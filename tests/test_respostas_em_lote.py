@@ -0,0 +1,108 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from respostas_em_lote import Checkpoint, LimiteTaxa, interpretar, normalizar_sql, responder_lote
+from telemetria import Telemetria
+
+
+class _Retriever:
+    def invoke_lote(self, perguntas):
+        return [[] for _ in perguntas]
+
+
+class _LLMSQL:
+    """Devolve, para cada pergunta, o SQL de `respostas` cuja chave aparece no prompt."""
+
+    max_concorrentes = 1
+
+    def __init__(self, respostas):
+        self.respostas = respostas
+
+    def invoke(self, mensagens):
+        prompt = mensagens[-1].content
+        sql = next(sql for pergunta, sql in self.respostas.items() if pergunta in prompt)
+        return SimpleNamespace(content=json.dumps({"query": sql, "descricao": "contagem"}), usage_metadata={})
+
+
+class _Backend:
+    nome = "teste"
+
+    def __init__(self):
+        self.executados = []
+
+    def executar(self, sql):
+        self.executados.append(sql)
+        return pd.DataFrame({"total": [1]}), "ok"
+
+
+class _LimiteContador(LimiteTaxa):
+    def __init__(self):
+        super().__init__(0)
+        self.vagas = 0
+        self._contador = threading.Lock()
+
+    def aguardar(self):
+        with self._contador:
+            self.vagas += 1
+
+
+class _LLMInterpretacao:
+    max_concorrentes = 4
+
+    def __init__(self):
+        self.chamadas = 0
+        self._contador = threading.Lock()
+
+    def invoke(self, mensagens):
+        with self._contador:
+            self.chamadas += 1
+        return SimpleNamespace(content="n" * 200)
+
+
+def test_normalizar_sql_preserva_espacos_dos_literais():
+    assert normalizar_sql("SELECT  *\n FROM t WHERE nome = 'A  B' ;") == "SELECT * FROM t WHERE nome = 'A  B'"
+    assert normalizar_sql("SELECT * FROM t WHERE nome = 'A  B'") != normalizar_sql("SELECT * FROM t WHERE nome = 'A B'")
+
+
+def test_consultas_equivalentes_executam_o_sql_original_uma_vez(tmp_path):
+    llm = _LLMSQL({
+        "Quantas empresas": "SELECT COUNT(*) FROM t WHERE nome = 'A  B';",
+        "Total de empresas": "SELECT  COUNT(*)\nFROM t WHERE nome = 'A  B'",
+        "Contagem simples": "SELECT COUNT(*) FROM t WHERE nome = 'A B'",
+    })
+    perguntas = [
+        {"id": "1", "pergunta": "Quantas empresas há?"},
+        {"id": "2", "pergunta": "Total de empresas?"},
+        {"id": "3", "pergunta": "Contagem simples?"},
+    ]
+    backend = _Backend()
+
+    registros, falhas = responder_lote(perguntas, _Retriever(), llm, backend,
+                                       Checkpoint(str(tmp_path / "checkpoint.jsonl")), LimiteTaxa(0),
+                                       informar=lambda _: None)
+
+    assert falhas == 0
+    assert backend.executados == [
+        "SELECT COUNT(*) FROM t WHERE nome = 'A  B';",
+        "SELECT COUNT(*) FROM t WHERE nome = 'A B'",
+    ]
+    assert [registro["linhas"] for registro in registros] == [1, 1, 1]
+
+
+def test_interpretacao_map_reduce_passa_pelo_limite_de_taxa():
+    gerador = np.random.default_rng(0)
+    nomes = [f"Atividade de tratamento de dados número {i}" for i in range(1000)]
+    df_resultado = pd.DataFrame({
+        f"coluna_{i}": gerador.choice(nomes, 10_000) if i % 2 else gerador.integers(0, 10**6, 10_000)
+        for i in range(80)
+    })
+    llm, limite, telemetria = _LLMInterpretacao(), _LimiteContador(), Telemetria()
+
+    interpretar(llm, limite, "Liste as atividades de tratamento", df_resultado, telemetria)
+
+    assert llm.chamadas > 1
+    assert limite.vagas == llm.chamadas
@@ -0,0 +1,30 @@
+"""
+Código executado nos processos do `BackendCSVProcessos`: cada processo mantém sua própria cópia
+dos CSVs e seu próprio motor SQLite residente, e executa as consultas sem disputar o GIL do app.
+"""
+from aquecimento import usar_sqlite_recente
+
+# Processos novos (spawn) ainda não passaram pela troca feita no app; o índice de texto precisa
+# do SQLite mais recente do pysqlite3, quando instalado.
+usar_sqlite_recente()
+
+from backends_consulta import BackendCSVLocal
+
+_backend = None
+
+
+def inicializar(pasta_dados: str):
+    """Initializer do pool: carrega os dados e prepara o motor antes da primeira consulta."""
+    global _backend
+    _backend = BackendCSVLocal(pasta_dados)
+    _backend.preparar()
+
+
+def preparar():
+    """Recarrega os CSVs se tiverem mudado. Returns: Uma tupla (pronto, mensagem)."""
+    return _backend.preparar()
+
+
+def executar_consulta(query: str, limite_linhas: int, timeout_segundos: float):
+    # `executar` recarrega os CSVs se tiverem mudado desde a última consulta.
+    return _backend.executar(query, limite_linhas=limite_linhas, timeout_segundos=timeout_segundos)